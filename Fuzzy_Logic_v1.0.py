@@ -1,78 +1,97 @@
 import sys
 import logging
 import numpy as np
-import skfuzzy as fuzz
-from skfuzzy import control as ctrl
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QGridLayout, QHBoxLayout,
-    QLabel, QLineEdit, QPushButton, QTextEdit, QMessageBox, QDialog,
+    QLabel, QLineEdit, QPushButton, QTextEdit, QPlainTextEdit, QMessageBox, QDialog,
     QDialogButtonBox, QSpinBox, QDoubleSpinBox, QFrame, QCheckBox, QScrollArea, QFileDialog,
-    QGroupBox, QFormLayout
+    QGroupBox, QFormLayout, QComboBox
 )
 from PyQt6.QtGui import QFont
-from PyQt6.QtCore import QTimer, pyqtSignal, Qt, QSettings
-from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.backends.backend_qtagg import NavigationToolbar2QT as NavigationToolbar
-from matplotlib.figure import Figure
-import matplotlib.pyplot as plt
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal, Qt, QSettings
 import copy
 import time
-import json
 import os
+import threading
 from datetime import datetime
-from snap7.client import Client
-from snap7.util import get_real, set_real
+from fuzzy_engine import CompiledSurfaceCache, ConfigWriter, PLCManager, ControlEngine, FuzzyPIDController, LogBuffer, ADAPTATION_MODES, OPT_AGGR_RANGE, OPT_PREC_RANGE, minmax_decimate, get_default_fuzzy_settings, optimized_default_settings, load_config_file
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+def _matplotlib_qt():
+    # matplotlib Qt arka ucu (~1 sn) yalnızca ilk grafik kurulurken yüklenir
+    from matplotlib.backends.backend_qtagg import FigureCanvasQTAgg as FigureCanvas
+    from matplotlib.backends.backend_qtagg import NavigationToolbar2QT as NavigationToolbar
+    from matplotlib.figure import Figure
+    return FigureCanvas, NavigationToolbar, Figure
+
 class StaticFuzzyPlot(QWidget):
+    # Eksen süslemeleri bir kez kurulur; update_plot yalnızca üyelik noktaları gerçekten değiştiğinde kalıcı çizgilerin verisini günceller
+    COLORS = {'NH': 'red', 'NL': 'orange', 'Z': 'green', 'PL': 'cyan', 'PH': 'blue'}
     def __init__(self, settings, parent=None):
         super().__init__(parent)
         self.setMinimumHeight(200)
+        self.canvas = None; self.settings = settings; self.lines = {}; self.points_key = None
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0,0,0,0)
+
+    def paintEvent(self, event):
+        # Tuval ilk boyamadan sonra kurulur; pencere matplotlib yüklenmeden ekrana gelir
+        super().paintEvent(event)
+        if self.canvas is None: QTimer.singleShot(0, self.build_canvas)
+
+    def build_canvas(self):
+        if self.canvas is not None: return
+        FigureCanvas, _, Figure = _matplotlib_qt()
         fig = Figure(figsize=(4, 3), dpi=72)
         fig.tight_layout(pad=2.5)
         self.canvas = FigureCanvas(fig)
         self.ax = fig.add_subplot(111)
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(0,0,0,0)
-        layout.addWidget(self.canvas)
-        self.update_plot(settings)
-
-    def update_plot(self, settings):
-        self.ax.clear()
-        all_points = [p for points_list in settings['points'].values() for p in points_list]
-        max_abs_val = max(abs(p) for p in all_points) if all_points else 5
-        universe_max = np.ceil(max_abs_val) + 1
-        colors = {'NH': 'red', 'NL': 'orange', 'Z': 'green', 'PL': 'cyan', 'PH': 'blue'}
-        for name, points in settings['points'].items():
-            self.ax.plot([points[0], points[1], points[2]], [0, 1, 0], color=colors.get(name, 'black'), label=name)
-        self.ax.set_xlim(-universe_max, universe_max)
         self.ax.set_ylim(-0.1, 1.2)
         self.ax.set_title("Anlık Girdi Fonksiyonları", fontsize=10)
         self.ax.set_xlabel("Fark", fontsize=8)
         self.ax.set_ylabel("Üyelik", fontsize=8)
         self.ax.tick_params(axis='both', which='major', labelsize=7)
         self.ax.grid(True, linestyle='--', linewidth='0.5')
-        self.ax.legend(fontsize=7)
-        self.canvas.draw()
+        self.layout().addWidget(self.canvas)
+        self.update_plot(self.settings)
+
+    def update_plot(self, settings):
+        self.settings = settings
+        if self.canvas is None: return
+        key = tuple((name, tuple(float(p) for p in points)) for name, points in settings['points'].items())
+        if key == self.points_key: return
+        if self.points_key is None or [name for name, _ in key] != [name for name, _ in self.points_key]:
+            # Terim kümesi değişti: çizgiler ve lejant yeniden kurulur
+            for line in self.lines.values(): line.remove()
+            self.lines = {name: self.ax.plot([], [], color=self.COLORS.get(name, 'black'), label=name)[0] for name, _ in key}
+            self.ax.legend(fontsize=7)
+        for name, points in key: self.lines[name].set_data([points[0], points[1], points[2]], [0, 1, 0])
+        all_points = [p for _, points in key for p in points]
+        universe_max = np.ceil(max(abs(p) for p in all_points) if all_points else 5) + 1
+        self.ax.set_xlim(-universe_max, universe_max)
+        self.points_key = key; self.canvas.draw_idle()
 
 class InteractiveFuzzyPlot(QWidget):
+    # Eksenler, ızgara ve lejant yalnızca plot_membership_functions'ta kurulur; çizgi ve alan etiketleri kalıcı artist'lerdir.
+    # Sürükleme sırasında taşınan çizgi "animated" yapılır, arka plan bir kez saklanır ve her harekette yalnızca o çizgi ile etiketi çizilip blit edilir.
     settingsChanged = pyqtSignal(dict)
     def __init__(self, settings, parent=None):
-        super().__init__(parent); self.settings = settings; self.selected_point = None
+        super().__init__(parent); self.settings = settings; self.selected_point = None; self.lines = {}; self.area_texts = {}; self.background = None
+        FigureCanvas, NavigationToolbar, Figure = _matplotlib_qt()
         fig = Figure(figsize=(8, 4)); self.canvas = FigureCanvas(fig); self.ax = fig.add_subplot(111)
         self.toolbar = NavigationToolbar(self.canvas, self); layout = QVBoxLayout(self)
         layout.addWidget(self.toolbar); layout.addWidget(self.canvas); self.plot_membership_functions()
         self.canvas.mpl_connect('button_press_event', self.on_press); self.canvas.mpl_connect('motion_notify_event', self.on_motion); self.canvas.mpl_connect('button_release_event', self.on_release)
+        self.canvas.mpl_connect('draw_event', self.on_draw)
     def plot_membership_functions(self):
         xlim = self.ax.get_xlim(); ylim = self.ax.get_ylim()
-        self.ax.clear()
+        self.ax.clear(); self.lines = {}; self.area_texts = {}
         is_zoomed = len(self.toolbar._nav_stack) > 1; universe_max = self.settings.get('universe_max', 20)
         colors = {'NH': 'red', 'NL': 'orange', 'Z': 'green', 'PL': 'cyan', 'PH': 'blue'}
         for name, points in self.settings['points'].items():
-            self.ax.plot([points[0], points[1], points[2]], [0, 1, 0], marker='o', color=colors.get(name, 'black'), label=name, markersize=8)
-            try:
-                area = 0.5 * (abs(points[2] - points[0])) * 1.0; self.ax.text(points[1], 1.05, f'Alan: {area:.2f}', ha='center', va='bottom', fontsize=8)
+            self.lines[name], = self.ax.plot([points[0], points[1], points[2]], [0, 1, 0], marker='o', color=colors.get(name, 'black'), label=name, markersize=8)
+            try: self.area_texts[name] = self.ax.text(points[1], 1.05, self.area_label(points), ha='center', va='bottom', fontsize=8)
             except Exception: pass
         if not is_zoomed: self.ax.set_xlim(-universe_max, universe_max); self.ax.set_ylim(-0.1, 1.2)
         else: self.ax.set_xlim(xlim); self.ax.set_ylim(ylim)
@@ -80,17 +99,32 @@ class InteractiveFuzzyPlot(QWidget):
         self.ax.minorticks_on(); self.ax.grid(which='major', linestyle='-', linewidth='0.5'); self.ax.grid(which='minor', linestyle=':', linewidth='0.5')
         handles, labels = self.ax.get_legend_handles_labels(); by_label = dict(zip(labels, handles))
         self.ax.legend(by_label.values(), by_label.keys()); self.canvas.draw_idle()
+    @staticmethod
+    def area_label(points): return f'Alan: {0.5 * (abs(points[2] - points[0])) * 1.0:.2f}'
+    def dragged_artists(self):
+        if not self.selected_point: return []
+        name = self.selected_point[0]
+        return [artist for artist in (self.lines.get(name), self.area_texts.get(name)) if artist is not None]
     def find_closest_point(self, event):
-        min_dist = float('inf'); closest_point = None
+        # Tüm köşeler tek bir transData.transform çağrısıyla piksel uzayına çevrilir
         if event.xdata is None or event.ydata is None: return None
-        for name, points in self.settings['points'].items():
-            for i, (px, py) in enumerate(zip(points, [0, 1, 0])):
-                dist = np.sqrt((event.x - self.ax.transData.transform((px, py))[0])**2 + (event.y - self.ax.transData.transform((px, py))[1])**2)
-                if dist < 10 and dist < min_dist: min_dist = dist; closest_point = (name, i)
-        return closest_point
+        keys = [(name, i) for name in self.settings['points'] for i in range(3)]
+        if not keys: return None
+        vertices = np.array([(self.settings['points'][name][i], (0, 1, 0)[i]) for name, i in keys], dtype=float)
+        pixels = self.ax.transData.transform(vertices); dist = np.hypot(pixels[:, 0] - event.x, pixels[:, 1] - event.y)
+        best = int(np.argmin(dist))
+        return keys[best] if dist[best] < 10 else None
     def on_press(self, event):
         if self.toolbar.mode: return
         self.selected_point = self.find_closest_point(event)
+        if self.selected_point:
+            # Taşınan artist'ler arka plandan çıkarılır; tam çizim on_draw içinde arka planı saklar
+            for artist in self.dragged_artists(): artist.set_animated(True)
+            self.canvas.draw()
+    def on_draw(self, event):
+        if not self.selected_point: return
+        self.background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        for artist in self.dragged_artists(): self.ax.draw_artist(artist)
     def on_motion(self, event):
         if self.selected_point and event.xdata is not None:
             name, idx = self.selected_point; new_x = event.xdata; points = self.settings['points'][name]
@@ -98,12 +132,21 @@ class InteractiveFuzzyPlot(QWidget):
             if idx == 2 and new_x <= points[1]: new_x = points[1] + 0.1
             if idx == 1 and (new_x <= points[0] or new_x >= points[2]): return
             if name == 'Z' and idx == 1: return
-            self.settings['points'][name][idx] = new_x; self.plot_membership_functions()
+            self.settings['points'][name][idx] = new_x
+            self.lines[name].set_xdata([points[0], points[1], points[2]])
+            text = self.area_texts.get(name)
+            if text is not None: text.set_x(points[1]); text.set_text(self.area_label(points))
+            if self.background is None: self.canvas.draw(); return
+            self.canvas.restore_region(self.background)
+            for artist in self.dragged_artists(): self.ax.draw_artist(artist)
+            self.canvas.blit(self.canvas.figure.bbox)
     def on_release(self, event):
-        if self.selected_point: self.selected_point = None; self.settingsChanged.emit(self.settings)
+        if self.selected_point:
+            for artist in self.dragged_artists(): artist.set_animated(False)
+            self.selected_point = None; self.background = None; self.canvas.draw_idle(); self.settingsChanged.emit(self.settings)
 
 class FuzzyGraphSettingsDialog(QDialog):
-    settingsApplied = pyqtSignal(dict)
+    settingsApplied = pyqtSignal(dict); settingsPreview = pyqtSignal(dict)
     def __init__(self, current_settings, parent_settings, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Grafiksel Bulanık Mantık Ayarları")
@@ -131,8 +174,8 @@ class FuzzyGraphSettingsDialog(QDialog):
         opt_layout.addWidget(QLabel("Min Seviye:"), 0, 0); opt_layout.addWidget(self.min_level_spin, 0, 1)
         opt_layout.addWidget(QLabel("Max Seviye:"), 0, 2); opt_layout.addWidget(self.max_level_spin, 0, 3)
         opt_layout.addWidget(QLabel("Set Seviye:"), 1, 0); opt_layout.addWidget(self.set_level_spin, 1, 1)
-        self.aggressiveness_spin = QDoubleSpinBox(); self.aggressiveness_spin.setRange(0.5, 5.0); self.aggressiveness_spin.setSingleStep(0.1)
-        self.precision_spin = QDoubleSpinBox(); self.precision_spin.setRange(0.5, 3.0); self.precision_spin.setSingleStep(0.1)
+        self.aggressiveness_spin = QDoubleSpinBox(); self.aggressiveness_spin.setRange(*OPT_AGGR_RANGE); self.aggressiveness_spin.setDecimals(3); self.aggressiveness_spin.setSingleStep(0.1)
+        self.precision_spin = QDoubleSpinBox(); self.precision_spin.setRange(*OPT_PREC_RANGE); self.precision_spin.setDecimals(3); self.precision_spin.setSingleStep(0.1)
         opt_layout.addWidget(QLabel("Agresiflik (>1 Daha Hızlı):"), 2, 0); opt_layout.addWidget(self.aggressiveness_spin, 2, 1)
         opt_layout.addWidget(QLabel("Hassasiyet (>1 Daha Hassas):"), 2, 2); opt_layout.addWidget(self.precision_spin, 2, 3)
         self.scale_spinbox = QSpinBox(); self.scale_spinbox.setRange(5, 500)
@@ -177,40 +220,21 @@ class FuzzyGraphSettingsDialog(QDialog):
         min_l,max_l,set_l=self.min_level_spin.value(),self.max_level_spin.value(),self.set_level_spin.value()
         if not (min_l <= set_l <= max_l): QMessageBox.warning(self,"Hata","Set Seviyesi, Min ve Max Seviye arasında olmalıdır."); return
         
-        agg_factor=self.aggressiveness_spin.value();prec_factor=self.precision_spin.value();prec_multiplier=1.0/prec_factor
         total_range=max_l-min_l if max_l>min_l else 1;max_pos_error=set_l-min_l;max_neg_error=set_l-max_l;new_max_universe=max(abs(max_pos_error),abs(max_neg_error),1.0);self.scale_spinbox.setValue(int(np.ceil(new_max_universe)))
-        
-        z_width=(total_range*0.05)*prec_multiplier
-        
-        agg_multiplier = 1.0 / agg_factor
-        pl_peak=(max_pos_error*0.4)*agg_multiplier; pl_end=(max_pos_error*0.8)*agg_multiplier
-        ph_start=(max_pos_error*0.7)*agg_multiplier
-        nl_peak=(max_neg_error*0.4)*agg_multiplier; nl_end=(max_neg_error*0.8)*agg_multiplier
-        nh_start=(max_neg_error*0.7)*agg_multiplier
-        
-        pl_peak=max(pl_peak,z_width+0.01); nl_peak=min(nl_peak,-z_width-0.01)
-        
-        new_points={'Z':[-z_width,0,z_width],'PL':[z_width,pl_peak,pl_end],'PH':[ph_start,max_pos_error,max_pos_error],'NL':[nl_end,nl_peak,-z_width],'NH':[max_neg_error,max_neg_error,nh_start]}
+        # Motorla aynı hesap; config'de ayarlanmış (tuner.py) opt_ratios / opt_rules varsa onlar kullanılır
+        new_points, optimized_rules = optimized_default_settings(dict(self.final_settings, opt_aggr=self.aggressiveness_spin.value(), opt_prec=self.precision_spin.value()), min_l, max_l, set_l)
         self.final_settings['points']=new_points;self.final_settings['universe_max']=int(np.ceil(new_max_universe));self.final_settings['control_range']=total_range
-        
-        valves = self.final_settings.get('valves', []); fill_valve = valves[0]['name'] if len(valves) > 0 else None; drain_valve = valves[1]['name'] if len(valves) > 1 else None
-        raw_rules = { 'PH_P':{'fill':1.0,'drain':0},'PH_Z':{'fill':0.9,'drain':0},'PH_N':{'fill':0.7,'drain':0},'PL_P':{'fill':0.6,'drain':0},'PL_Z':{'fill':0.3,'drain':0},'PL_N':{'fill':0.1,'drain':0},'Z_P':{'fill':0.15,'drain':0},'Z_Z':{'fill':0,'drain':0},'Z_N':{'fill':0,'drain':0.15},'NL_P':{'fill':0,'drain':0.1},'NL_Z':{'fill':0,'drain':0.3},'NL_N':{'fill':0,'drain':0.6},'NH_P':{'fill':0,'drain':0.7},'NH_Z':{'fill':0,'drain':0.9},'NH_N':{'fill':1.0,'drain':1.0},}
-        optimized_rules = {}
-        for key, vals in raw_rules.items():
-            rule_entry = {}
-            if fill_valve: rule_entry[fill_valve] = vals['fill']
-            if drain_valve: rule_entry[drain_valve] = vals['drain']
-            optimized_rules[key] = rule_entry
         self.final_settings['outputs'] = optimized_rules
-        self.plot_widget.settings = self.final_settings; self.plot_widget.plot_membership_functions();QMessageBox.information(self,"Başarılı","Giriş grafiği ve kural tablosu optimize edildi.")
+        self.plot_widget.settings = self.final_settings; self.plot_widget.plot_membership_functions(); self.settingsPreview.emit(self.final_settings)
+        QMessageBox.information(self,"Başarılı","Giriş grafiği ve kural tablosu optimize edildi.")
 
     def update_plot_scale(self,new_max_value):
         old_max_value=self.final_settings.get('universe_max',new_max_value)
         if new_max_value<old_max_value and old_max_value !=0:
             scaling_factor=new_max_value/old_max_value
             for name in self.final_settings['points']:self.final_settings['points'][name]=[p*scaling_factor for p in self.final_settings['points'][name]]
-        self.final_settings['universe_max']=new_max_value; self.plot_widget.settings = self.final_settings; self.plot_widget.plot_membership_functions()
-    def on_plot_settings_changed(self,new_settings):self.final_settings=copy.deepcopy(new_settings)
+        self.final_settings['universe_max']=new_max_value; self.plot_widget.settings = self.final_settings; self.plot_widget.plot_membership_functions(); self.settingsPreview.emit(self.final_settings)
+    def on_plot_settings_changed(self,new_settings):self.final_settings=copy.deepcopy(new_settings); self.settingsPreview.emit(self.final_settings)
 
 class ValveSettingsDialog(QDialog):
     def __init__(self, valves, parent=None):
@@ -240,6 +264,7 @@ class ValveSettingsDialog(QDialog):
         self.valves = new_valves; self.accept()
 
 class RuleSettingsDialog(QDialog):
+    rulesEdited = pyqtSignal(dict)
     def __init__(self, current_settings, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Vana Açıklık Oranları (0-1 Skalası)"); self.setMinimumWidth(800)
@@ -256,51 +281,200 @@ class RuleSettingsDialog(QDialog):
                     valve_name = valve['name']; cell_layout.addWidget(QLabel(f"{valve_name}:"))
                     spinbox = QDoubleSpinBox(); spinbox.setRange(0.0, 1.0); spinbox.setDecimals(2); spinbox.setSingleStep(0.05)
                     spinbox.setValue(rule_outputs.get(valve_name, 0.0)); cell_layout.addWidget(spinbox); self.widgets[key][valve_name] = spinbox
+                    spinbox.valueChanged.connect(self.emit_preview)
                 layout.addWidget(cell_widget, i + 2, j + 2)
         button_box = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel); button_box.accepted.connect(self.save_and_accept); button_box.rejected.connect(self.reject); layout.addWidget(button_box, len(self.delta_labels) + 2, 0, 1, len(self.input_labels) + 2)
-    def save_and_accept(self):
+    def collect_outputs(self, settings):
         for key, valve_widgets in self.widgets.items():
-            if key not in self.final_settings['outputs']: self.final_settings['outputs'][key] = {}
-            for valve_name, spinbox in valve_widgets.items(): self.final_settings['outputs'][key][valve_name] = spinbox.value()
+            if key not in settings['outputs']: settings['outputs'][key] = {}
+            for valve_name, spinbox in valve_widgets.items(): settings['outputs'][key][valve_name] = spinbox.value()
+        return settings
+    def emit_preview(self): self.rulesEdited.emit(self.collect_outputs(copy.deepcopy(self.final_settings)))
+    def save_and_accept(self):
+        self.collect_outputs(self.final_settings)
         self.accept()
 
-class FuzzyPIDController:
-    def __init__(self, s):
-        umax = s.get('universe_max', 100); p_conf = {n: list(pts) for n, pts in s['points'].items()}; valves_conf = s.get('valves', [])
-        p_conf['NH'][0] = -umax; p_conf['PH'][2] = umax
-        self.error_antecedent = ctrl.Antecedent(np.arange(-umax, umax + 0.5, 0.5), 'error'); [self.error_antecedent.__setitem__(n, fuzz.trimf(self.error_antecedent.universe, p)) for n, p in p_conf.items()]
-        delta_umax = umax / 4; delta_error = ctrl.Antecedent(np.arange(-delta_umax, delta_umax + 0.1, 0.1), 'delta_error')
-        delta_error['N'] = fuzz.trimf(delta_error.universe, [-delta_umax, -delta_umax, 0]); delta_error['Z'] = fuzz.trimf(delta_error.universe, [-delta_umax * 0.2, 0, delta_umax * 0.2]); delta_error['P'] = fuzz.trimf(delta_error.universe, [0, delta_umax, delta_umax])
-        self.consequents = {}
-        for valve in valves_conf:
-            self.consequents[valve['name']] = ctrl.Consequent(np.arange(0, 1.01, 0.01), valve['name'])
-        rules = []; output_values = s.get('outputs', {})
-        for err_label in ['NH', 'NL', 'Z', 'PL', 'PH']:
-            for delta_label in ['N', 'Z', 'P']:
-                key = f"{err_label}_{delta_label}"; rule_outputs = output_values.get(key, {})
-                consequent_tuple = []
-                for valve_name, consequent_obj in self.consequents.items():
-                    val = rule_outputs.get(valve_name, 0.0); consequent_obj[key] = fuzz.trimf(consequent_obj.universe, [val - 0.01, val, val + 0.01]); consequent_tuple.append(consequent_obj[key])
-                if consequent_tuple: rule = ctrl.Rule(self.error_antecedent[err_label] & delta_error[delta_label], tuple(consequent_tuple)); rules.append(rule)
-        self.simulation = ctrl.ControlSystemSimulation(ctrl.ControlSystem(rules))
-    def compute(self, current_error, delta_error_val):
-        try: self.simulation.input['error'] = current_error; self.simulation.input['delta_error'] = delta_error_val; self.simulation.compute(); return self.simulation.output
-        except Exception as ex: logging.error(f"Hesaplama hatası: {ex}"); return {name: 0.0 for name in self.consequents.keys()}
-
-class PLCManager:
-    def __init__(self): self.client=Client(); self.is_connected=False
-    def connect(self,ip,r,s):
-        try: self.client.connect(ip,r,s); self.is_connected = self.client.get_connected()
-        except Exception as e: self.is_connected=False; logging.error(f"PLC hata: {e}"); return False, f"Hata: {e}"
-        return (True, "Başarılı.") if self.is_connected else (False, "Bağlantı kurulamadı.")
-    def disconnect(self):
-        if self.is_connected: self.client.disconnect(); self.is_connected=False; logging.info("PLC bağlantısı kesildi.")
-    def read_real(self,d,o):
-        try: return get_real(self.client.db_read(d,o,4),0)
-        except Exception as e: logging.error(f"Okuma hatası (DB{d},Off{o}): {e}"); raise
-    def write_real(self,d,o,v):
-        try: data=bytearray(4); set_real(data,0,v); self.client.db_write(d,o,data)
-        except Exception as e: logging.error(f"Yazma hatası (DB{d},Off{o}): {e}"); raise
+class DiagnosticsDialog(QDialog):
+    def __init__(self, timings, output_writer=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Döngü Zamanlama Tanılama"); self.setMinimumSize(640, 420); self.timings = timings; self.output_writer = output_writer
+        layout = QVBoxLayout(self); self.report_view = QTextEdit(); self.report_view.setReadOnly(True)
+        self.report_view.setFont(QFont("Monospace")); self.report_view.setLineWrapMode(QTextEdit.LineWrapMode.NoWrap); layout.addWidget(self.report_view)
+        button_layout = QHBoxLayout(); btn_dump = QPushButton("Dosyaya Kaydet..."); btn_reset = QPushButton("Sıfırla"); btn_close = QPushButton("Kapat")
+        btn_dump.clicked.connect(self.dump_to_file); btn_reset.clicked.connect(self.reset_timings); btn_close.clicked.connect(self.close)
+        button_layout.addWidget(btn_dump); button_layout.addWidget(btn_reset); button_layout.addStretch(); button_layout.addWidget(btn_close); layout.addLayout(button_layout)
+        self.refresh_timer = QTimer(self); self.refresh_timer.timeout.connect(self.refresh)
+    def showEvent(self, event): self.refresh(); self.refresh_timer.start(1000); super().showEvent(event)
+    def hideEvent(self, event): self.refresh_timer.stop(); super().hideEvent(event)
+    def refresh(self): self.report_view.setPlainText(self.timings.format_report() + (f"\n{self.output_writer.format_stats()}" if self.output_writer else ""))
+    def reset_timings(self):
+        self.timings.reset()
+        if self.output_writer: self.output_writer.reset_stats()
+        self.refresh()
+    def dump_to_file(self):
+        default_name = f"cycle_timings_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.json"
+        filePath, _ = QFileDialog.getSaveFileName(self, "Zamanlama Raporunu Kaydet", os.path.join(os.path.dirname(os.path.abspath(__file__)), default_name), "JSON Files (*.json)")
+        if filePath:
+            try: self.timings.dump(filePath, {'valve_writes': self.output_writer.stats()} if self.output_writer else None)
+            except Exception as e: QMessageBox.critical(self, "Kayıt Hatası", f"Rapor kaydedilemedi:\n{e}")
+
+class TrendDialog(QDialog):
+    # SP/PV, vana çıkışları ve adaptasyon modu trendi; veri engine.trend halkasından okunur, uzun pencerelerde min/max seyreltilir.
+    # Eksenler yalnızca pencere, boyut, ölçek veya vana listesi değişince tam çizilir; diğer yenilemelerde kayıtlı arka plan
+    # geri yüklenip yalnızca çizgiler çizilir (blitting).
+    WINDOWS = [("1 dk", 60), ("10 dk", 600), ("1 saat", 3600), ("8 saat", 28800), ("24 saat", 86400)]
+    def __init__(self, engine, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Trend Grafiği"); self.setMinimumSize(800, 560); self.engine = engine
+        self.canvas = None; self.background = None; self.valve_lines = {}; self.valve_names = None; self.window_key = None
+        layout = QVBoxLayout(self); top = QHBoxLayout()
+        self.window_combo = QComboBox()
+        for label, seconds in self.WINDOWS: self.window_combo.addItem(label, seconds)
+        self.window_combo.currentIndexChanged.connect(self.refresh)
+        self.status_label = QLabel("-"); self.status_label.setFont(QFont("Monospace"))
+        top.addWidget(QLabel("Pencere:")); top.addWidget(self.window_combo); top.addSpacing(20); top.addWidget(self.status_label, 1); layout.addLayout(top)
+        self.refresh_timer = QTimer(self); self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.canvas is None: self.build_canvas()
+        self.refresh(); self.refresh_timer.start(500)
+    def hideEvent(self, event): self.refresh_timer.stop(); super().hideEvent(event)
+
+    def build_canvas(self):
+        FigureCanvas, _, Figure = _matplotlib_qt()
+        fig = Figure(figsize=(8, 5), dpi=72); self.canvas = FigureCanvas(fig)
+        self.ax_level, self.ax_valve, self.ax_mode = fig.subplots(3, 1, sharex=True, gridspec_kw={'height_ratios': [3, 2, 1]})
+        self.sp_line, = self.ax_level.plot([], [], color='gray', linestyle='--', label="SP", animated=True, antialiased=False)
+        self.pv_line, = self.ax_level.plot([], [], color='blue', label="PV", animated=True, antialiased=False)
+        self.mode_line, = self.ax_mode.plot([], [], color='purple', drawstyle='steps-post', animated=True, antialiased=False)
+        self.ax_level.set_ylabel("Seviye", fontsize=8); self.ax_level.legend(fontsize=7, loc='upper left'); self.ax_valve.set_ylabel("Vana", fontsize=8)
+        self.ax_mode.set_ylim(-0.5, len(ADAPTATION_MODES) - 0.5); self.ax_mode.set_yticks(range(len(ADAPTATION_MODES))); self.ax_mode.set_yticklabels(ADAPTATION_MODES, fontsize=5)
+        for ax in (self.ax_level, self.ax_valve, self.ax_mode): ax.tick_params(axis='both', which='major', labelsize=7); ax.grid(True, linestyle='--', linewidth='0.5')
+        fig.subplots_adjust(left=0.2, right=0.98, top=0.97, bottom=0.08, hspace=0.15)
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.layout().addWidget(self.canvas, 1)
+
+    def animated_lines(self): return [self.sp_line, self.pv_line, self.mode_line] + list(self.valve_lines.values())
+
+    def on_draw(self, event):
+        # Tam çizimden (boyut değişimi dahil) sonra arka planı sakla ve çizgileri aynı tampona çiz; ekrana Qt boyaması taşır
+        self.background = self.canvas.copy_from_bbox(self.canvas.figure.bbox)
+        for line in self.animated_lines(): line.axes.draw_artist(line)
+
+    def refresh(self):
+        if self.canvas is None: return
+        seconds = self.window_combo.currentData(); data = self.engine.trend.window(seconds); full = False
+        if (seconds, self.canvas.width()) != self.window_key:
+            # Zaman ekseni şimdiye göredir (sağ kenar 0); uzun pencerelerde dakika/saat birimi
+            scale, unit = (1, "sn") if seconds <= 600 else (60, "dk") if seconds <= 3600 else (3600, "saat")
+            self.scale = scale; self.ax_mode.set_xlim(-seconds / scale, 0); self.ax_mode.set_xlabel(f"Zaman ({unit})", fontsize=8)
+            self.window_key = (seconds, self.canvas.width()); full = True
+        if data['valve_names'] != self.valve_names:
+            for line in self.valve_lines.values(): line.remove()
+            colors = ['green', 'red', 'orange', 'cyan', 'brown', 'magenta']
+            self.valve_lines = {name: self.ax_valve.plot([], [], color=colors[i % len(colors)], label=name, animated=True, antialiased=False)[0] for i, name in enumerate(data['valve_names'])}
+            if self.valve_lines: self.ax_valve.legend(fontsize=7, loc='upper left')
+            valves = self.engine.fuzzy_settings.get('valves', []); top = max([v.get('max_out', 10.0) for v in valves] or [10.0])
+            self.ax_valve.set_ylim(min([v.get('min_out', 0.0) for v in valves] or [0.0]) - 0.05 * top, top * 1.05)
+            self.valve_names = data['valve_names']; full = True
+        t = data['t']
+        if len(t):
+            x = (t - t[-1]) / self.scale; buckets = max(self.canvas.width(), 100)
+            sp = data['set_level']; pv = data['actual_level']
+            self.sp_line.set_data(*minmax_decimate(x, sp, buckets)); self.pv_line.set_data(*minmax_decimate(x, pv, buckets))
+            self.mode_line.set_data(*minmax_decimate(x, data['mode'].astype(float), buckets))
+            for j, (name, line) in enumerate(self.valve_lines.items()): line.set_data(*minmax_decimate(x, data['outputs'][:, j], buckets))
+            # Seviye ekseni yalnızca veri sınırların dışına çıkınca veya aralığın çok altında kalınca yeniden ölçeklenir
+            lo = float(np.nanmin([np.nanmin(sp), np.nanmin(pv)])); hi = float(np.nanmax([np.nanmax(sp), np.nanmax(pv)])); y0, y1 = self.ax_level.get_ylim()
+            span = max(hi - lo, 0.1)
+            if lo < y0 or hi > y1 or span < 0.25 * (y1 - y0): self.ax_level.set_ylim(lo - 0.1 * span, hi + 0.1 * span); full = True
+            mode = ADAPTATION_MODES[data['mode'][-1]] if data['mode'][-1] >= 0 else "-"
+            self.status_label.setText(f"SP {sp[-1]:.3f}   PV {pv[-1]:.3f}   E {data['error'][-1]:+.3f}   Mod {mode}   ({len(t)} örnek)")
+        if full or self.background is None: self.canvas.draw(); return
+        self.canvas.restore_region(self.background)
+        for line in self.animated_lines(): line.axes.draw_artist(line)
+        self.canvas.blit(self.canvas.figure.bbox)
+
+class ControlSurfaceDialog(QDialog):
+    # Seçili vananın error x delta_error kontrol yüzeyi. Yüzey önizleme denetleyicisiyle tek bir toplu compute_many çağrısında hesaplanır;
+    # kural/nokta düzenlemeleri set_settings ile gelir, ardışık değişiklikler tek bir yeniden hesaplamada birleştirilir.
+    # Önizleme denetleyicisi canlı denetleyiciden ayrıdır; kaydedilmemiş düzenlemeler kontrolü etkilemez.
+    def __init__(self, settings, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Kontrol Yüzeyi"); self.setMinimumSize(640, 560)
+        self.settings = copy.deepcopy(settings); self.controller = None; self.grid = None; self.canvas = None; self.operating_point = None
+        layout = QVBoxLayout(self); top = QHBoxLayout()
+        self.valve_combo = QComboBox(); self.valve_combo.currentIndexChanged.connect(self.redraw)
+        self.resolution_spin = QSpinBox(); self.resolution_spin.setRange(20, 400); self.resolution_spin.setSingleStep(20); self.resolution_spin.setValue(200)
+        self.resolution_spin.valueChanged.connect(self.schedule_refresh)
+        self.status_label = QLabel("-"); self.status_label.setFont(QFont("Monospace"))
+        top.addWidget(QLabel("Vana:")); top.addWidget(self.valve_combo); top.addSpacing(20); top.addWidget(QLabel("Çözünürlük:")); top.addWidget(self.resolution_spin)
+        top.addSpacing(20); top.addWidget(self.status_label, 1); layout.addLayout(top)
+        self.refresh_timer = QTimer(self); self.refresh_timer.setSingleShot(True); self.refresh_timer.setInterval(50); self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.canvas is None: self.build_canvas()
+        self.schedule_refresh()
+
+    def build_canvas(self):
+        FigureCanvas, _, Figure = _matplotlib_qt()
+        fig = Figure(figsize=(6, 5), dpi=72); self.canvas = FigureCanvas(fig); self.ax = fig.add_subplot(111)
+        self.image = self.ax.imshow(np.zeros((2, 2)), origin='lower', aspect='auto', cmap='viridis', vmin=0.0, vmax=1.0, interpolation='nearest')
+        fig.colorbar(self.image, ax=self.ax, label="Vana açıklığı (0-1)")
+        self.term_lines = []; self.marker, = self.ax.plot([], [], marker='o', color='red', markeredgecolor='white', linestyle='')
+        self.ax.set_xlabel("Fark (error)", fontsize=8); self.ax.set_ylabel("Fark değişimi (dE)", fontsize=8); self.ax.tick_params(axis='both', which='major', labelsize=7)
+        self.layout().addWidget(self.canvas, 1)
+
+    def set_settings(self, settings):
+        self.settings = copy.deepcopy(settings); self.schedule_refresh()
+
+    def schedule_refresh(self):
+        if self.isVisible(): self.refresh_timer.start()
+
+    def set_operating_point(self, error, delta_error):
+        self.operating_point = (error, delta_error)
+        if self.canvas is None or self.grid is None or not self.isVisible(): return
+        self.marker.set_data([error], [delta_error]); self.canvas.draw_idle()
+
+    def refresh(self):
+        if self.canvas is None: return
+        # Yüzey her zaman kesin motorla hesaplanır; derlenmiş moddaki enterpolasyon tablosu yerine çıkarımın kendisi gösterilir
+        s = dict(self.settings, compiled=False); start = time.perf_counter()
+        try:
+            if self.controller is None: self.controller = FuzzyPIDController(s)
+            else: self.controller.update_settings(s)
+            self.grid = self.controller.evaluate_grid(self.resolution_spin.value())
+        except Exception as e: self.status_label.setText(f"Geçersiz ayar: {e}"); return
+        elapsed = time.perf_counter() - start; names = self.controller.valve_names
+        if [self.valve_combo.itemText(i) for i in range(self.valve_combo.count())] != names:
+            current = self.valve_combo.currentText(); self.valve_combo.blockSignals(True); self.valve_combo.clear(); self.valve_combo.addItems(names)
+            if current in names: self.valve_combo.setCurrentText(current)
+            self.valve_combo.blockSignals(False)
+        n = self.resolution_spin.value()
+        self.status_label.setText(f"{n}x{n} = {n * n} nokta, {elapsed * 1000:.0f} ms ({self.controller.engine})")
+        self.redraw()
+
+    def redraw(self):
+        if self.canvas is None or self.grid is None: return
+        error_axis, delta_axis, table = self.grid; col = self.valve_combo.currentIndex()
+        if col < 0 or col >= table.shape[2]: return
+        # imshow satırları dikey eksendir: tablo [error, delta] -> [delta, error]
+        self.image.set_data(table[:, :, col].T); self.image.set_extent((error_axis[0], error_axis[-1], delta_axis[0], delta_axis[-1]))
+        self.ax.set_xlim(error_axis[0], error_axis[-1]); self.ax.set_ylim(delta_axis[0], delta_axis[-1])
+        for line in self.term_lines: line.remove()
+        # Hata terimlerinin tepe noktaları yüzeyin kural bölgelerine yön verir
+        self.term_lines = [self.ax.axvline(points[1], color='white', linestyle=':', linewidth=0.8) for points in self.settings['points'].values()]
+        self.ax.set_title(f"Kontrol Yüzeyi: {self.valve_combo.currentText()}", fontsize=10)
+        if self.operating_point is not None: self.marker.set_data([self.operating_point[0]], [self.operating_point[1]])
+        self.canvas.draw_idle()
+
+class EngineSignals(QObject):
+    # ControlEngine geri çağrılarını GUI iş parçacığına kuyruklanmış (queued) sinyaller olarak taşır; log satırları LogBuffer üzerinden gelir
+    snapshot = pyqtSignal(dict)
+    fault = pyqtSignal(str, str)
+    settings_changed = pyqtSignal()
 
 class MainWindow(QMainWindow):
     fuzzy_settings_updated = pyqtSignal(dict)
@@ -310,38 +484,44 @@ class MainWindow(QMainWindow):
         self.setMinimumSize(1024, 768)
         self.settings = QSettings("MyCompany", "FuzzyPIDTankControl_Advanced_v5") # Versiyon güncellendi
         self.config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json")
-        self.plc_manager = PLCManager(); self.fuzzy_settings = {}; self.last_error = 0.0
-        self.valve_addr_inputs = {}; self.valve_output_labels = {}
-        self.best_performance_score = 0.0; self.best_fuzzy_points = None
+        self.plc_manager = PLCManager()
+        self.surface_cache = CompiledSurfaceCache()
+        self.valve_addr_inputs = {}; self.valve_output_labels = {}; self.label_state = {}
+        self.best_performance_score = 0.0
+        self.log_buffer = LogBuffer(self.settings.value("log/max_lines", 5000, type=int))
 
-        # --- Temel Durum Değişkenleri ---
-        self.current_set_level = 0.0; self.current_actual_level = 0.0; self.current_error = 0.0
-        
-        # --- Gelişmiş Adaptasyon Durum Değişkenleri (STATE MACHINE) ---
-        self.adaptation_mode = "IDLE"           # Current state: IDLE, STABLE, SETTLE, DISTURBANCE_WAIT, POST_DISTURBANCE_OBSERVE, AGGRESSIVE_CORRECTION, PRECISION_OBSERVE, FINE_TUNE, STABLE_LOCKED
-        self.adaptation_mode_end_time = 0.0     # Timer for states
-        self.adaptation_mode_storage = {}       # Dictionary to pass data between states (e.g., pre-aggressive gain)
-        self.is_adapted = False                 # Flag to indicate successful adaptation
-        self.is_in_fine_tune_observation = False # Sub-state for FINE_TUNE
-        self.last_adaptation_info = {}          
-        self.gain_adaptation_multipliers = {}
-        self.frozen_fuzzy_outputs = {}
-        self.locked_stable_outputs = {}        
-        self.drift_correction_timer = 0.0
-        self.drift_adjustment_values = {}
-        self.INITIAL_SETTLING_TIMEOUT = 60
-        self.graph_dialog = None
+        # --- Kontrol motoru (adaptasyon durum makinesi ayrı iş parçacığında çalışır) ---
+        self.engine = ControlEngine(self.plc_manager, cache=self.surface_cache)
+        self.engine_signals = EngineSignals(self)
+        self.engine_signals.snapshot.connect(self.on_engine_snapshot)
+        self.engine_signals.fault.connect(self.on_engine_fault); self.engine_signals.settings_changed.connect(self.on_engine_settings_changed)
+        self.engine.on_log = self.log_buffer.append; self.engine.on_snapshot = self.engine_signals.snapshot.emit
+        self.engine.on_fault = self.engine_signals.fault.emit; self.engine.on_settings_changed = self.engine_signals.settings_changed.emit
+        self.graph_dialog = None; self.diagnostics_dialog = None; self.trend_dialog = None; self.surface_dialog = None
         
         self.setup_ui()
-        self.control_timer = QTimer(self); self.control_timer.timeout.connect(self.run_control_cycle)
-        self.plc_read_timer = QTimer(self); self.plc_read_timer.timeout.connect(self.read_and_update_ui)
+        # Loglar satır satır değil, ~10 Hz'de toplu olarak widget'a aktarılır
+        self.log_flush_timer = QTimer(self); self.log_flush_timer.timeout.connect(self.flush_log); self.log_flush_timer.start(100)
         self.disturbance_countdown_timer = QTimer(self); self.disturbance_countdown_timer.timeout.connect(self.update_countdown_label)
         
-        self.load_settings()
-        if self.best_fuzzy_points: self.fuzzy_settings['points'] = copy.deepcopy(self.best_fuzzy_points)
-        else: self.best_fuzzy_points = copy.deepcopy(self.fuzzy_settings['points'])
-        self.rebuild_dynamic_ui(); self.fuzzy_controller = FuzzyPIDController(self.fuzzy_settings)
+        self.load_settings(); self.saved_ui_values = self.ui_setting_values()
+        if self.fuzzy_settings.get('persist_surface_cache', True): self.surface_cache.directory = os.path.join(os.path.dirname(self.config_path), "controller_cache")
+        if self.engine.best_fuzzy_points: self.fuzzy_settings['points'] = copy.deepcopy(self.engine.best_fuzzy_points)
+        else: self.engine.best_fuzzy_points = copy.deepcopy(self.fuzzy_settings['points'])
+        self.rebuild_dynamic_ui()
+        self.connect_engine_params(); self.sync_engine_params()
         self.static_plot_widget.update_plot(self.fuzzy_settings)
+        # Denetleyici (skfuzzy importu + kurulum, ~1 sn) arka planda kurulur; pencere beklemeden açılır
+        threading.Thread(target=self.engine.ensure_controller, name="ControllerBuild", daemon=True).start()
+
+    @property
+    def fuzzy_controller(self): return self.engine.ensure_controller()
+
+    @property
+    def fuzzy_settings(self): return self.engine.fuzzy_settings
+
+    @fuzzy_settings.setter
+    def fuzzy_settings(self, s): self.engine.fuzzy_settings = s
 
     def setup_ui(self):
         main_widget = QWidget()
@@ -385,7 +565,7 @@ class MainWindow(QMainWindow):
         left_panel_layout.addWidget(self.learning_enabled_checkbox)
         static_plot_group = QGroupBox("Girdi Fonksiyonları Önizleme")
         static_plot_layout = QVBoxLayout(static_plot_group)
-        self.static_plot_widget = StaticFuzzyPlot(self.get_default_fuzzy_settings())
+        self.static_plot_widget = StaticFuzzyPlot(get_default_fuzzy_settings())
         static_plot_layout.addWidget(self.static_plot_widget)
         left_panel_layout.addWidget(static_plot_group)
         left_panel_layout.addStretch()
@@ -429,10 +609,13 @@ class MainWindow(QMainWindow):
         self.btn_rule_settings = QPushButton("Kural Tablosu Ayarları"); self.btn_rule_settings.clicked.connect(self.open_rule_settings)
         self.btn_valve_settings = QPushButton("Vana Ayarları"); self.btn_valve_settings.clicked.connect(self.open_valve_settings)
         self.btn_save_as = QPushButton("Ayarları Farklı Kaydet..."); self.btn_save_as.clicked.connect(self.save_settings_as)
+        self.btn_diagnostics = QPushButton("Zamanlama Tanılama"); self.btn_diagnostics.clicked.connect(self.open_diagnostics)
+        self.btn_trend = QPushButton("Trend Grafiği"); self.btn_trend.clicked.connect(self.open_trend)
+        self.btn_surface = QPushButton("Kontrol Yüzeyi"); self.btn_surface.clicked.connect(self.open_control_surface)
         self.btn_start_stop.setMinimumHeight(70)
         font = self.btn_start_stop.font(); font.setPointSize(14); self.btn_start_stop.setFont(font)
         buttons_layout.addWidget(self.btn_start_stop, 0, 0, 1, 2)
-        small_buttons = [self.btn_fuzzy_settings, self.btn_rule_settings, self.btn_valve_settings, self.btn_save_as]
+        small_buttons = [self.btn_fuzzy_settings, self.btn_rule_settings, self.btn_valve_settings, self.btn_save_as, self.btn_diagnostics, self.btn_trend, self.btn_surface]
         for i, btn in enumerate(small_buttons):
             btn.setMinimumHeight(50)
             buttons_layout.addWidget(btn, (i // 2) + 1, i % 2)
@@ -465,12 +648,24 @@ class MainWindow(QMainWindow):
         self.fine_tune_interval_spin = QDoubleSpinBox(); self.fine_tune_interval_spin.setRange(1.0, 300.0); self.fine_tune_interval_spin.setSingleStep(1.0)
         self.fine_tune_aggr_spin = QDoubleSpinBox(); self.fine_tune_aggr_spin.setRange(0.01, 1.0); self.fine_tune_aggr_spin.setSingleStep(0.01); self.fine_tune_aggr_spin.setDecimals(3)
         self.drift_threshold_spin = QDoubleSpinBox(); self.drift_threshold_spin.setRange(0.01, 0.5); self.drift_threshold_spin.setSingleStep(0.01); self.drift_threshold_spin.setDecimals(3)
+        self.stability_window_spin = QSpinBox(); self.stability_window_spin.setRange(2, 1000)
+        self.stability_threshold_spin = QDoubleSpinBox(); self.stability_threshold_spin.setRange(0.0001, 1.0); self.stability_threshold_spin.setSingleStep(0.0005); self.stability_threshold_spin.setDecimals(4)
+        # Uyarlamalı döngü hızı kontrol başlatılırken okunur
+        self.adaptive_rate_checkbox = QCheckBox("Uyarlamalı Döngü Hızı")
+        self.period_min_spin = QDoubleSpinBox(); self.period_min_spin.setRange(0.05, 5.0); self.period_min_spin.setSingleStep(0.05)
+        self.period_max_spin = QDoubleSpinBox(); self.period_max_spin.setRange(0.1, 30.0); self.period_max_spin.setSingleStep(0.5)
+        self.period_locked_spin = QDoubleSpinBox(); self.period_locked_spin.setRange(0.0, 30.0); self.period_locked_spin.setSingleStep(0.5); self.period_locked_spin.setToolTip("0: kilitli modda uzun periyot kapalı")
 
         adapt_layout.addRow("Bozucu Etken Eşiği (|Fark| >):", self.disturbance_threshold_spin)
         adapt_layout.addRow("Bozucu Etken Tepki Gecikmesi (sn):", self.disturbance_delay_spin)
         adapt_layout.addRow("Gözlem Süresi (sn):", self.fine_tune_interval_spin)
         adapt_layout.addRow("Normal Ayar Agresifliği (0.01-1.0):", self.fine_tune_aggr_spin)
         adapt_layout.addRow("Drift Düzeltme Eşiği (|Fark| >):", self.drift_threshold_spin)
+        adapt_layout.addRow("Kararlılık Penceresi (döngü):", self.stability_window_spin)
+        adapt_layout.addRow("Kararlılık Eşiği (STDEV <):", self.stability_threshold_spin)
+        adapt_layout.addRow(self.adaptive_rate_checkbox)
+        adapt_layout.addRow("Döngü Periyodu Min / Max (sn):", self.period_min_spin); adapt_layout.addRow("", self.period_max_spin)
+        adapt_layout.addRow("Kilitli Mod Periyodu (sn):", self.period_locked_spin)
         
         main_adapt_layout.addWidget(form_widget)
         
@@ -501,28 +696,34 @@ class MainWindow(QMainWindow):
         top_layout.addWidget(right_panel, 1)
         log_group = QGroupBox("Loglar")
         log_layout = QVBoxLayout(log_group)
-        self.log_output = QTextEdit(); self.log_output.setReadOnly(True)
+        log_controls = QHBoxLayout()
+        self.log_cycle_lines_checkbox = QCheckBox("Döngü satırları"); self.log_cycle_lines_checkbox.setChecked(self.settings.value("log/cycle_lines", True, type=bool)); self.log_cycle_lines_checkbox.toggled.connect(self.apply_log_settings)
+        self.log_max_lines_spin = QSpinBox(); self.log_max_lines_spin.setRange(100, 1000000); self.log_max_lines_spin.setSingleStep(1000); self.log_max_lines_spin.setValue(self.log_buffer.max_lines); self.log_max_lines_spin.valueChanged.connect(self.apply_log_settings)
+        self.btn_log_file = QPushButton("Dosyaya Yaz..."); self.btn_log_file.setCheckable(True); self.btn_log_file.clicked.connect(self.toggle_log_file)
+        log_controls.addWidget(self.log_cycle_lines_checkbox); log_controls.addStretch(); log_controls.addWidget(QLabel("Satır sınırı:")); log_controls.addWidget(self.log_max_lines_spin); log_controls.addWidget(self.btn_log_file)
+        log_layout.addLayout(log_controls)
+        self.log_output = QPlainTextEdit(); self.log_output.setReadOnly(True); self.log_output.setMaximumBlockCount(self.log_buffer.max_lines)
         log_layout.addWidget(self.log_output)
+        self.apply_log_settings()
+        log_file = self.settings.value("log/file_path", "", type=str)
+        if log_file: self.set_log_file(log_file)
         main_layout.addLayout(top_layout, 0) # Üst panelin dikeyde büyümemesini sağlar
         main_layout.addWidget(log_group, 1) # Log alanına tüm boş alanı verir
     def toggle_adaptation_settings(self):
         is_hidden = self.toggle_adapt_settings_button.isChecked()
         self.adapt_group.setVisible(not is_hidden)
         self.toggle_adapt_settings_button.setText("Göster ▼" if is_hidden else "Gizle ▲")    
-    def get_default_fuzzy_settings(self):
-        default_valves = [{'name': 'Dolum Vanası', 'min_out': 0.0, 'max_out': 10.0, 'offset': 4},{'name': 'Boşaltma Vanası', 'min_out': 0.0, 'max_out': 10.0, 'offset': 12}]
-        default_rules = { 'NH_N': {'Dolum Vanası': 0.0, 'Boşaltma Vanası': 1.0} }
-        return {'universe_max':5,'control_range':5.0,'opt_min':0,'opt_max':5,'opt_set':3.3, 'opt_aggr':4.0, 'opt_prec':2.0, 'points':{'NH':[-5,-5,-2.5],'NL':[-3.5,-1.5,-0.1],'Z':[-0.5,0,0.5],'PL':[0.1,1.5,3.5],'PH':[2.5,5,5]}, 'valves': default_valves, 'outputs': default_rules}
-
     def rebuild_dynamic_ui(self):
         while self.valve_addr_layout.rowCount() > 0: self.valve_addr_layout.removeRow(0)
         while self.valve_output_layout.count(): self.valve_output_layout.takeAt(0).widget().deleteLater()
+        for label in self.valve_output_labels.values(): self.label_state.pop(label, None)
         self.valve_addr_inputs.clear(); self.valve_output_labels.clear()
         valves = self.fuzzy_settings.get('valves', [])
-        self.gain_adaptation_multipliers.clear()
+        with self.engine.lock:
+            self.engine.gain_adaptation_multipliers.clear()
+            for valve_data in valves: self.engine.gain_adaptation_multipliers[valve_data['name']] = 1.0
         for i, valve_data in enumerate(valves):
             name = valve_data['name']
-            self.gain_adaptation_multipliers[name] = 1.0
             addr_input = QLineEdit(str(valve_data.get('offset', '')))
             addr_input.textChanged.connect(lambda text, n=name: self.update_valve_offset(n, text))
             self.valve_addr_layout.addRow(f"{name} Adresi:", addr_input)
@@ -555,22 +756,27 @@ class MainWindow(QMainWindow):
         self.precision_threshold_spin.setValue(self.settings.value("adaptation/precision_threshold", 0.05, type=float))
         self.precision_aggr_spin.setValue(self.settings.value("adaptation/precision_aggressiveness", 0.01, type=float))
         self.drift_threshold_spin.setValue(self.settings.value("adaptation/drift_threshold", 0.02, type=float))
-        if os.path.exists(self.config_path):
-            try:
-                with open(self.config_path, 'r') as f:
-                    self.fuzzy_settings = json.load(f)
-                    self.log("config.json dosyasından ayarlar başarıyla yüklendi.")
-                    self.best_performance_score = self.fuzzy_settings.get("best_performance_score", 0.0)
-                    self.best_fuzzy_points = self.fuzzy_settings.get("best_fuzzy_points", None)
-                    loaded_multipliers = self.fuzzy_settings.get('gain_multipliers', {})
-                    if loaded_multipliers:
-                         self.gain_adaptation_multipliers.update(loaded_multipliers)
-                         self.is_adapted = True
-                    
-                    #self.lbl_best_performance.setText(f"En İyi Performans:\n{self.best_performance_score:.2f} E/s" if self.best_performance_score > 0 else "En İyi Performans:\nN/A")
-                    return
-            except Exception as e:
-                self.log(f"config.json okuma hatası: {e}. Varsayılan ayarlar kullanılacak.")
+        self.stability_window_spin.setValue(self.settings.value("adaptation/stability_window", 20, type=int))
+        self.stability_threshold_spin.setValue(self.settings.value("adaptation/stability_threshold", 0.003, type=float))
+        self.adaptive_rate_checkbox.setChecked(self.settings.value("control/adaptive_rate", False, type=bool))
+        self.period_min_spin.setValue(self.settings.value("control/period_min", 0.25, type=float)); self.period_max_spin.setValue(self.settings.value("control/period_max", 1.0, type=float))
+        self.period_locked_spin.setValue(self.settings.value("control/period_locked", 2.0, type=float))
+        # Supervisor ve replay ile aynı yükleyici: geçersiz bir dosya denetleyici kurulurken değil burada reddedilir, hata GUI loguna düşer
+        self.fuzzy_settings = get_default_fuzzy_settings(); loaded = load_config_file(self.config_path, defaults=False, on_error=self.log)
+        # Yüklenen içerik "son yazılan" kabul edilir; değişiklik olmadan kapatmak dosyayı yeniden yazmaz
+        self.config_writer = ConfigWriter(self.config_path, self.engine.config_snapshot, written=copy.deepcopy(loaded))
+        self.config_writer.on_log = self.log_buffer.append; self.config_writer.on_error = lambda e: self.log_buffer.append(f"Ayarları dosyaya kaydetme hatası: {e}")
+        if loaded is not None:
+            self.fuzzy_settings = loaded
+            self.log("config.json dosyasından ayarlar başarıyla yüklendi.")
+            self.best_performance_score = self.fuzzy_settings.get("best_performance_score", 0.0)
+            self.engine.best_fuzzy_points = self.fuzzy_settings.get("best_fuzzy_points", None)
+            loaded_multipliers = self.fuzzy_settings.get('gain_multipliers', {})
+            if loaded_multipliers:
+                 self.engine.gain_adaptation_multipliers.update(loaded_multipliers)
+                 self.engine.is_adapted = True
+            #self.lbl_best_performance.setText(f"En İyi Performans:\n{self.best_performance_score:.2f} E/s" if self.best_performance_score > 0 else "En İyi Performans:\nN/A")
+            return
         geometry = self.settings.value("window/geometry")
         if geometry:
             self.restoreGeometry(geometry)
@@ -579,19 +785,11 @@ class MainWindow(QMainWindow):
         is_hidden = self.settings.value("ui/adapt_settings_hidden", False, type=bool)
         self.toggle_adapt_settings_button.setChecked(is_hidden)
         self.toggle_adaptation_settings() # Durumu uygula
-        
-        if not os.path.exists(self.config_path):
-             self.fuzzy_settings = self.get_default_fuzzy_settings()
-    
+
+
     def save_settings_to_file(self, file_path):
         try:
-            temp_settings = copy.deepcopy(self.fuzzy_settings)
-            temp_settings['best_performance_score'] = self.best_performance_score
-            temp_settings['best_fuzzy_points'] = self.best_fuzzy_points
-            temp_settings['gain_multipliers'] = self.gain_adaptation_multipliers
-            
-            with open(file_path, 'w') as f:
-                json.dump(temp_settings, f, indent=4)
+            self.engine.save_config(file_path, extra=self.config_extra())
             self.log(f"Ayarlar başarıyla {os.path.basename(file_path)} dosyasına kaydedildi.")
             return True
         except Exception as e:
@@ -607,55 +805,50 @@ class MainWindow(QMainWindow):
         if filePath:
             self.save_settings_to_file(filePath)
 
-    def save_settings(self):
-        self.settings.setValue("plc/ip",self.ip_input.text());self.settings.setValue("plc/rack",self.rack_input.text());self.settings.setValue("plc/slot",self.slot_input.text());self.settings.setValue("plc/db",self.db_num_input.text());self.settings.setValue("addr/set_level",self.set_level_addr_input.text());self.settings.setValue("addr/levelmeter",self.levelmeter_addr_input.text());self.settings.setValue("ui/set_level_value",self.set_level_value_spin.value());
+    def ui_setting_values(self):
+        return {
+            "plc/ip": self.ip_input.text(), "plc/rack": self.rack_input.text(), "plc/slot": self.slot_input.text(), "plc/db": self.db_num_input.text(),
+            "addr/set_level": self.set_level_addr_input.text(), "addr/levelmeter": self.levelmeter_addr_input.text(), "ui/set_level_value": self.set_level_value_spin.value(),
+            "adaptation/disturbance_threshold": self.disturbance_threshold_spin.value(), "adaptation/disturbance_delay": self.disturbance_delay_spin.value(),
+            "adaptation/fine_tune_interval": self.fine_tune_interval_spin.value(), "adaptation/fine_tune_aggressiveness": self.fine_tune_aggr_spin.value(),
+            "adaptation/precision_threshold": self.precision_threshold_spin.value(), "adaptation/precision_aggressiveness": self.precision_aggr_spin.value(),
+            "adaptation/drift_threshold": self.drift_threshold_spin.value(), "adaptation/stability_window": self.stability_window_spin.value(),
+            "adaptation/stability_threshold": self.stability_threshold_spin.value(),
+            "control/adaptive_rate": self.adaptive_rate_checkbox.isChecked(), "control/period_min": self.period_min_spin.value(), "control/period_max": self.period_max_spin.value(), "control/period_locked": self.period_locked_spin.value(),
+        }
 
-        self.settings.setValue("adaptation/disturbance_threshold", self.disturbance_threshold_spin.value())
-        self.settings.setValue("adaptation/disturbance_delay", self.disturbance_delay_spin.value())
-        self.settings.setValue("adaptation/fine_tune_interval", self.fine_tune_interval_spin.value())
-        self.settings.setValue("adaptation/fine_tune_aggressiveness", self.fine_tune_aggr_spin.value())
-        self.settings.setValue("adaptation/precision_threshold", self.precision_threshold_spin.value())
-        self.settings.setValue("adaptation/precision_aggressiveness", self.precision_aggr_spin.value())
-        self.settings.setValue("adaptation/drift_threshold", self.drift_threshold_spin.value())
-        self.save_settings_to_file(self.config_path)
+    def config_extra(self):
+        return {'best_performance_score': self.best_performance_score, 'plc': {'ip': self.ip_input.text(), 'rack': self.rack_input.text(), 'slot': self.slot_input.text()}}
+
+    def save_settings(self):
+        # QSettings'e yalnızca son kayıttan beri değişen anahtarlar yazılır. config.json GUI iş parçacığında yazılmaz:
+        # ConfigWriter art arda gelen istekleri birleştirip arka planda, atomik olarak ve yalnızca içerik değiştiyse kaydeder.
+        for key, value in self.ui_setting_values().items():
+            if self.saved_ui_values.get(key) != value: self.settings.setValue(key, value); self.saved_ui_values[key] = value
+        self.config_writer.mark_dirty(extra=self.config_extra())
 
     def write_set_level_to_plc(self):
         if not self.plc_manager.is_connected: QMessageBox.warning(self,"Bağlantı Yok","Önce PLC'ye bağlanın."); return
-        try:
-            self.cancel_disturbance_adaptation() 
-            db=int(self.db_num_input.text()); set_addr=int(self.set_level_addr_input.text()); value=self.set_level_value_spin.value()
-            level_addr = int(self.levelmeter_addr_input.text())
-            current_level = self.plc_manager.read_real(db, level_addr)
-            initial_error = value - current_level
-            
-            if abs(value - self.current_set_level) > 0.001:
-                if abs(initial_error) > 0.01:
-                    self.adaptation_mode = "SETTLE"
-                    self.adaptation_mode_end_time = time.time() + self.INITIAL_SETTLING_TIMEOUT
-                    self.log(f"Set değeri değişti. Başlangıç Hatası: {initial_error:.2f}. Oturma ölçümü (SETTLE modu) başladı.")
-                else:
-                    self.log("Yeni set değeri gönderildi, ancak fark çok küçük. Ayar sıfırlanmadı.")
-
-            self.current_set_level = value
-            self.plc_manager.write_real(db,set_addr,value)
-            self.log(f"PLC'ye yeni set seviyesi: {value} (DB{db}, Off:{set_addr})")
+        try: self.engine.write_set_level(self.set_level_value_spin.value())
         except Exception as e: QMessageBox.critical(self,"Hata",f"Set seviyesi gönderilemedi/okunamadı:\n{e}")
 
     def open_valve_settings(self):
         dialog = ValveSettingsDialog(self.fuzzy_settings.get('valves', []), self)
         if dialog.exec():
-            old_names = [v['name'] for v in self.fuzzy_settings['valves']]; new_valves = dialog.valves; new_names = [v['name'] for v in new_valves]
+            new_settings = copy.deepcopy(self.fuzzy_settings)
+            old_names = [v['name'] for v in new_settings['valves']]; new_valves = dialog.valves; new_names = [v['name'] for v in new_valves]
             if old_names != new_names:
-                for rule in self.fuzzy_settings['outputs'].values():
+                for rule in new_settings['outputs'].values():
                     for old_name, new_name in zip(old_names, new_names):
                         if old_name in rule: rule[new_name] = rule.pop(old_name)
-            self.fuzzy_settings['valves'] = new_valves
-            self.log("Vana konfigürasyonu güncellendi."); self.rebuild_dynamic_ui(); self.fuzzy_controller = FuzzyPIDController(self.fuzzy_settings); self.save_settings()
+            new_settings['valves'] = new_valves
+            # Vana satırları, yeni denetleyici devreye girince on_engine_settings_changed içinde yeniden kurulur
+            self.engine.submit_fuzzy_settings(new_settings); self.log("Vana konfigürasyonu güncellendi.")
 
     def open_fuzzy_graph_settings(self):
         if self.graph_dialog is None or not self.graph_dialog.isVisible():
             self.graph_dialog = FuzzyGraphSettingsDialog(self.fuzzy_settings, self.settings, self)
-            self.graph_dialog.settingsApplied.connect(self.on_graph_settings_applied)
+            self.graph_dialog.settingsApplied.connect(self.on_graph_settings_applied); self.graph_dialog.settingsPreview.connect(self.preview_surface)
             self.fuzzy_settings_updated.connect(self.graph_dialog.update_from_parent)
             self.graph_dialog.finished.connect(self.on_graph_dialog_finished)
             self.graph_dialog.show()
@@ -668,7 +861,7 @@ class MainWindow(QMainWindow):
                 self.graph_dialog.settingsApplied.disconnect(self.on_graph_settings_applied)
                 self.fuzzy_settings_updated.disconnect(self.graph_dialog.update_from_parent)
             except (TypeError, RuntimeError): pass
-        self.graph_dialog = None
+        self.graph_dialog = None; self.preview_surface(self.fuzzy_settings)
 
     def on_graph_settings_applied(self, new_settings):
         if new_settings != self.fuzzy_settings:
@@ -677,18 +870,21 @@ class MainWindow(QMainWindow):
                 self.settings.setValue("dialog/opt_max", self.graph_dialog.max_level_spin.value())
                 self.settings.setValue("dialog/opt_set", self.graph_dialog.set_level_spin.value())
             try:
-                test_controller = FuzzyPIDController(new_settings); self.fuzzy_settings = new_settings; self.fuzzy_controller = test_controller
-                self.best_fuzzy_points = copy.deepcopy(self.fuzzy_settings['points'])
+                # Denetleyici arka planda kurulur ve döngü sınırında geçilir; kayıt ve grafikler geçişte (on_engine_settings_changed) güncellenir
+                self.engine.submit_fuzzy_settings(new_settings, best_points=new_settings['points'])
+                self.sync_engine_params()
                 #self.best_performance_score = 0.0; self.lbl_best_performance.setText("En İyi Performans:\nN/A")
-                self.log("Grafik ayarları güncellendi. Öğrenme hafızası sıfırlandı."); self.save_settings()
-                self.static_plot_widget.update_plot(self.fuzzy_settings)
+                self.log("Grafik ayarları güncellendi. Öğrenme hafızası sıfırlandı.")
             except Exception as e: self.log(f"Geçersiz ayar: {e}");QMessageBox.warning(self,"Hata",f"Geçersiz ayar: {e}")
             
     def open_rule_settings(self):
-        dialog=RuleSettingsDialog(self.fuzzy_settings,self)
+        dialog=RuleSettingsDialog(self.fuzzy_settings,self); dialog.rulesEdited.connect(self.preview_surface)
         if dialog.exec():
             new_settings=dialog.final_settings
-            if new_settings !=self.fuzzy_settings:self.fuzzy_settings=new_settings;self.fuzzy_controller=FuzzyPIDController(self.fuzzy_settings);self.log(f"Kural tablosu güncellendi.");self.save_settings()
+            if new_settings !=self.fuzzy_settings:
+                self.engine.submit_fuzzy_settings(new_settings); self.log(f"Kural tablosu güncellendi.")
+        # İptal edilen düzenlemelerin önizlemesi geri alınır
+        else: self.preview_surface(self.fuzzy_settings)
     
     def closeEvent(self, event):
         self.save_settings() # Diğer ayarları kaydetmeye devam eder
@@ -696,415 +892,138 @@ class MainWindow(QMainWindow):
         # --- YENİ: Pencere geometrisini ve UI durumunu kaydet ---
         self.settings.setValue("window/geometry", self.saveGeometry())
         self.settings.setValue("ui/adapt_settings_hidden", self.toggle_adapt_settings_button.isChecked())
+        self.settings.setValue("log/cycle_lines", self.log_cycle_lines_checkbox.isChecked()); self.settings.setValue("log/max_lines", self.log_max_lines_spin.value())
         
-        self.plc_manager.disconnect()
+        # Arka planda kurulmakta olan denetleyici (ve ayarları) kaydedilmeden önce devreye girer
+        self.engine.stop(); self.plc_manager.disconnect(); self.engine.wait_for_controller(5.0); self.config_writer.close()
+        self.flush_log(); self.log_buffer.close_file_sink()
         event.accept()
     
     def toggle_control_loop(self):
         if self.btn_start_stop.isChecked():
-            self.stop_countdown()
-            self.reset_to_optimized_defaults()
-            self.btn_start_stop.setText("Kontrolü Durdur"); self.control_timer.start(500); self.log("Kontrol döngüsü başlatıldı.")
-            self.adaptation_mode = "STABLE"
+            self.stop_countdown(); self.sync_engine_params()
+            self.btn_start_stop.setText("Kontrolü Durdur"); self.engine.start_control()
         else: 
-            self.control_timer.stop(); self.btn_start_stop.setText("Kontrolü Başlat"); self.log("Kontrol döngüsü durduruldu.")
-            self.adaptation_mode = "IDLE"
+            self.engine.stop_control(); self.btn_start_stop.setText("Kontrolü Başlat")
 
-    def read_and_update_ui(self):
-        try:
-            db_num = int(self.db_num_input.text()); set_addr = int(self.set_level_addr_input.text()); level_addr = int(self.levelmeter_addr_input.text())
-            set_level = self.plc_manager.read_real(db_num, set_addr)
-            actual_level = self.plc_manager.read_real(db_num, level_addr)
-            
-            self.current_set_level = set_level
-            self.current_actual_level = actual_level
-            self.current_error = set_level - actual_level
-            
-            active_set_for_log = "N/A"
-            if hasattr(self, 'fuzzy_controller'):
-                try:
-                    active_set_for_log = max({name: fuzz.interp_membership(self.fuzzy_controller.error_antecedent.universe, term.mf, self.current_error) for name, term in self.fuzzy_controller.error_antecedent.terms.items()}.items(), key=lambda item: item[1])[0]
-                except (ValueError, IndexError, KeyError): pass
-            
-            self.lbl_set_level.setText(f"Set Seviye:\n{self.current_set_level:.2f}")
-            self.lbl_actual_level.setText(f"Anlık Seviye:\n{self.current_actual_level:.2f}")
-            self.lbl_error.setText(f"Fark:\n{self.current_error:.2f} ({active_set_for_log})")
-            
+    def connect_engine_params(self):
+        for spin in [self.disturbance_threshold_spin, self.disturbance_delay_spin, self.fine_tune_interval_spin, self.fine_tune_aggr_spin, self.precision_threshold_spin, self.precision_aggr_spin, self.drift_threshold_spin, self.stability_window_spin, self.stability_threshold_spin, self.period_min_spin, self.period_max_spin, self.period_locked_spin]:
+            spin.valueChanged.connect(self.sync_engine_params)
+        self.learning_enabled_checkbox.toggled.connect(self.sync_engine_params); self.adaptive_rate_checkbox.toggled.connect(self.sync_engine_params)
+        for line_edit in [self.db_num_input, self.set_level_addr_input, self.levelmeter_addr_input]: line_edit.textChanged.connect(self.sync_engine_params)
+
+    def sync_engine_params(self):
+        # Motor iş parçacığı widget'lara dokunmaz; GUI değerleri her değişiklikte engine.params'a kopyalanır
+        params = {
+            'learning_enabled': self.learning_enabled_checkbox.isChecked(), 'disturbance_threshold': self.disturbance_threshold_spin.value(),
+            'disturbance_delay': self.disturbance_delay_spin.value(), 'fine_tune_interval': self.fine_tune_interval_spin.value(),
+            'fine_tune_aggressiveness': self.fine_tune_aggr_spin.value(), 'precision_threshold': self.precision_threshold_spin.value(),
+            'precision_aggressiveness': self.precision_aggr_spin.value(), 'drift_threshold': self.drift_threshold_spin.value(),
+            'stability_window': self.stability_window_spin.value(), 'stability_threshold': self.stability_threshold_spin.value(),
+            'adaptive_rate': self.adaptive_rate_checkbox.isChecked(), 'control_period_min': self.period_min_spin.value(), 'control_period_max': self.period_max_spin.value(),
+            'control_period_locked': self.period_locked_spin.value(),
+            'opt_min': self.settings.value("dialog/opt_min", self.fuzzy_settings.get('opt_min', 0), type=float),
+            'opt_max': self.settings.value("dialog/opt_max", self.fuzzy_settings.get('opt_max', 5), type=float),
+            'opt_set': self.settings.value("dialog/opt_set", self.fuzzy_settings.get('opt_set', 3.3), type=float),
+        }
+        for key, line_edit in [('db', self.db_num_input), ('set_level_addr', self.set_level_addr_input), ('levelmeter_addr', self.levelmeter_addr_input)]:
+            try: params[key] = int(line_edit.text())
+            except ValueError: pass
+        with self.engine.lock: self.engine.params.update(params)
+
+    def on_engine_snapshot(self, snapshot):
+        t0 = time.perf_counter()
+        if snapshot['kind'] == 'read':
             DEADBAND = 0.005
-            if abs(self.current_error) < DEADBAND:
-                self.lbl_actual_level.setStyleSheet("background-color: #2ecc71; color: white;")
-            else:
-                self.lbl_actual_level.setStyleSheet("")
-        except Exception as e:
-            self.log(f"PLC okuma hatası: {e}")
-            if self.plc_read_timer.isActive(): self.plc_read_timer.stop()
-            if self.plc_manager.is_connected: self.btn_connect.setChecked(False); self.toggle_plc_connection()
-            QMessageBox.critical(self,"Okuma Hatası", f"PLC okuma hatası: {e}\nBağlantı kesiliyor.")
-
-    def cancel_disturbance_adaptation(self):
-        self.stop_countdown()
-        self.adaptation_mode = "STABLE"
-        self.frozen_fuzzy_outputs.clear()
-        self.log("Kullanıcı müdahalesi: Mevcut bozucu etken/adaptasyon süreci iptal edildi.")        
-    
-    def run_control_cycle(self):
-        try:
-            current_error = self.current_error
-            db_num = int(self.db_num_input.text())
-            dt = self.control_timer.interval() / 1000.0 or 0.5
-            delta_error = (current_error - self.last_error)
-            DEADBAND = 0.01
-
-            raw_fuzzy_outputs = self.fuzzy_controller.compute(current_error, delta_error / dt) or {}
-            log_status = self.adaptation_mode
-            valves = self.fuzzy_settings.get('valves', [])
-
-            # --- STATE MACHINE START (STABLE_LOCKED içindeki drift mantığı kaldırıldı) ---
-            if self.learning_enabled_checkbox.isChecked():
-                if self.adaptation_mode == "SETTLE":
-                    if abs(current_error) < DEADBAND or time.time() > self.adaptation_mode_end_time:
-                        self.log("Settle modu tamamlandı, tüm adaptasyon ayarları sıfırlanıyor.")
-                        self.reset_adaptation_state()
-                
-                elif self.adaptation_mode in ["STABLE", "STABLE_LOCKED"]:
-                    # Bozucu Etken Tespiti (Drift mantığı buradan kaldırıldı, çıkış hesaplamasına taşındı)
-                    if abs(current_error) > self.disturbance_threshold_spin.value():
-                        log_msg = f"{self.adaptation_mode} modda BOZULMA tespit edildi."
-                        if self.is_adapted:
-                            log_msg += " Fabrika ayarlarına dönülüyor."
-                            self.reset_to_optimized_defaults()
-                        self.log(log_msg)
-                        self.adaptation_mode = "DISTURBANCE_WAIT"
-                        self.adaptation_mode_end_time = time.time() + self.disturbance_delay_spin.value()
-                        self.start_countdown(self.disturbance_delay_spin.value())
-
-                elif self.adaptation_mode == "DISTURBANCE_WAIT":
-                    if time.time() >= self.adaptation_mode_end_time:
-                        self.stop_countdown(); self.adaptation_mode = "POST_DISTURBANCE_OBSERVE"
-                        self.adaptation_mode_storage = {'error_history': [], 'start_time': time.time(), 'min_observe_time': 10.0, 'max_observe_time': 40.0, 'stability_threshold': 0.003, 'reversion_outputs': {}, 'baseline_fuzzy_outputs': {}}
-                        self.log("Bozucu etken bekleme süresi doldu. Hata stabilize olana kadar GÖZLEM modu başlıyor...")
-                
-                elif self.adaptation_mode == "POST_DISTURBANCE_OBSERVE":
-                    history = self.adaptation_mode_storage['error_history']; history.append(current_error)
-                    if len(history) > 20: history.pop(0)
-                    time_elapsed = time.time() - self.adaptation_mode_storage['start_time']; is_stable = False
-                    if time_elapsed >= self.adaptation_mode_storage['min_observe_time'] and len(history) == 20:
-                        stdev = np.std(history)
-                        if stdev < self.adaptation_mode_storage['stability_threshold']: is_stable = True
-                        elif time_elapsed % 10 < dt: self.log(f"Gözlem Stabil Değil. STDEV: {stdev:.4f}. Bekleniyor...")
-                    if is_stable or time_elapsed > self.adaptation_mode_storage['max_observe_time']:
-                        if not is_stable: self.log("Gözlem süresi aşıldı, yine de devam ediliyor.")
-                        self.log(f"Gözlem tamamlandı. Stabilize olan hata: {current_error:.3f}. Agresif Düzeltme Modu başlatılıyor.")
-                        self.adaptation_mode_storage['baseline_fuzzy_outputs'] = copy.deepcopy(raw_fuzzy_outputs)
-                        self.log(f"Gözlem sonu ham fuzzy çıktılar saklandı: { {k: f'{v:.2f}' for k,v in self.adaptation_mode_storage['baseline_fuzzy_outputs'].items()} }")
-                        target_valve = valves[0]['name'] if current_error > 0 and len(valves) > 0 else (valves[1]['name'] if len(valves) > 1 else None)
-                        reversion_outputs = {}
-                        if target_valve:
-                             for v_conf in valves:
-                                 v_name = v_conf['name']; norm_val = raw_fuzzy_outputs.get(v_name, 0.0)
-                                 physical_range = v_conf['max_out'] - v_conf['min_out']; reversion_outputs[v_name] = (norm_val * physical_range) + v_conf['min_out']
-                        self.adaptation_mode_storage['reversion_outputs'] = reversion_outputs
-                        if target_valve:
-                            valve_conf = next((v for v in valves if v['name'] == target_valve), None)
-                            baseline_output = reversion_outputs.get(target_valve, 0.0); new_target_output = np.clip(baseline_output + (abs(current_error) * 3.0), valve_conf['min_out'], valve_conf['max_out'])
-                            self.adaptation_mode_storage['aggressive_target_valve'] = target_valve; self.adaptation_mode_storage['aggressive_output_value'] = new_target_output
-                            self.log(f"Agresif Ayar: '{target_valve}' çıkışı {new_target_output:.3f} olarak ayarlandı.")
-                        else: self.log("Agresif ayar için hedef vana bulunamadı. İnce ayara geçiliyor."); self.adaptation_mode = "FINE_TUNE"
-                        self.adaptation_mode = "AGGRESSIVE_CORRECTION"
-                
-                elif self.adaptation_mode == "AGGRESSIVE_CORRECTION":
-                    if abs(current_error) <= 0.05:
-                        self.adaptation_mode = "PRECISION_OBSERVE"; self.adaptation_mode_end_time = time.time() + 10.0
-                        self.log("Hedef hata değerine ulaşıldı. Vana çıkışları gözlem değerine geri çekildi."); self.log("10 saniyelik Hassas Gözlem moduna geçiliyor.")
-
-                elif self.adaptation_mode == "PRECISION_OBSERVE":
-                    if time.time() >= self.adaptation_mode_end_time:
-                        self.log("Hassas gözlem tamamlandı. Standart İnce Ayar moduna geçiliyor."); self.adaptation_mode = "FINE_TUNE"; self.is_in_fine_tune_observation = False
-                        self.frozen_fuzzy_outputs = self.adaptation_mode_storage.get('baseline_fuzzy_outputs', copy.deepcopy(raw_fuzzy_outputs))
-                        self.log(f"Temel çıkışlar GÖZLEM SONU değerlerine göre donduruldu: { {k: f'{v:.2f}' for k,v in self.frozen_fuzzy_outputs.items()} }")
-
-                elif self.adaptation_mode == "FINE_TUNE":
-                    if abs(current_error) < DEADBAND:
-                        self.log("İnce Ayar başarılı! Hata DEADBAND içine girdi. Son kararlı çıkışlar kilitleniyor.")
-                        self.locked_stable_outputs.clear()
-                        proactive_reduction = 0.04
-                        dominant_valve = self.last_adaptation_info.get('valve')
-                        if dominant_valve:
-                            self.adaptation_mode_storage['dominant_correction_valve'] = dominant_valve
-                            self.log(f"Dominant vana '{dominant_valve}' olarak ayarlandı.")
-                        for v_conf in valves:
-                            v_name = v_conf['name']; norm_val = self.frozen_fuzzy_outputs.get(v_name, 0.0); gain = self.gain_adaptation_multipliers.get(v_name, 1.0)
-                            final_locked_value = norm_val * gain
-                            if v_name == dominant_valve:
-                                self.log(f"'{v_name}' için proaktif azaltma uygulanıyor. Orijinal: {final_locked_value:.4f}")
-                                final_locked_value = max(0.0, final_locked_value - proactive_reduction)
-                                self.log(f"Yeni kilit değeri: {final_locked_value:.4f}")
-                            self.locked_stable_outputs[v_name] = final_locked_value
-                        self.is_adapted = True; self.adaptation_mode = "STABLE_LOCKED"; self.frozen_fuzzy_outputs.clear()
-                    
-                    elif self.is_in_fine_tune_observation:
-                        if time.time() >= self.adaptation_mode_end_time: self._evaluate_observation_and_decide_next_step(current_error)
-                    else:
-                        if not self.frozen_fuzzy_outputs:
-                             self.frozen_fuzzy_outputs = copy.deepcopy(raw_fuzzy_outputs)
-                             self.log(f"İnce Ayar Modu Başladı. Temel çıkışlar donduruldu: { {k: f'{v:.2f}' for k,v in self.frozen_fuzzy_outputs.items()} }")
-                        self._perform_adaptation_step(current_error, delta_error, dt)
-
-            # --- VANA ÇIKIŞ HESAPLAMA (DEĞİŞİKLİKLER BURADA) ---
-            log_msg_parts = []
-            for valve_conf in valves:
-                valve_name = valve_conf['name']; physical_value = 0.0
-                current_gain = self.gain_adaptation_multipliers.get(valve_name, 1.0)
-
-                if self.adaptation_mode == "AGGRESSIVE_CORRECTION":
-                    physical_value = self.adaptation_mode_storage.get('aggressive_output_value', valve_conf['min_out']) if valve_name == self.adaptation_mode_storage.get('aggressive_target_valve') else valve_conf['min_out']
-                
-                elif self.adaptation_mode == "PRECISION_OBSERVE":
-                    physical_value = self.adaptation_mode_storage.get('reversion_outputs', {}).get(valve_name, valve_conf['min_out'])
-                
-                # --- YENİ MANTIK BURADA BAŞLIYOR ---
-                elif self.adaptation_mode == "STABLE_LOCKED":
-                    log_status = "STABLE_LOCKED" # Varsayılan durum
-                    base_norm_val = self.locked_stable_outputs.get(valve_name, 0.0)
-                    final_norm_val = base_norm_val
-
-                    # STABLE_LOCKED için Nudge Mantığı
-                    if abs(current_error) > 0.001:
-                        log_status = "LOCKED_NUDGE" # Log durumu güncellendi
-                        nudge_amount = 0.1
-                        fill_valve_name = valves[0]['name'] if len(valves) > 0 else None
-                        drain_valve_name = valves[1]['name'] if len(valves) > 1 else None
-
-                        # Hata pozitifse (dolum gerek), sadece dolum vanasını dürt
-                        if current_error > 0 and valve_name == fill_valve_name:
-                            final_norm_val = base_norm_val + nudge_amount
-                        # Hata negatifse (boşaltma gerek), sadece boşaltma vanasını dürt
-                        elif current_error < 0 and valve_name == drain_valve_name:
-                             final_norm_val = base_norm_val + nudge_amount
-                    
-                    final_norm_val = np.clip(final_norm_val, 0.0, 1.0)
-                    physical_range = valve_conf['max_out'] - valve_conf['min_out']
-                    physical_value = (final_norm_val * physical_range) + valve_conf['min_out']
-                
-                else: # ACTIVE FUZZY CONTROL (STABLE, SETTLE, FINE_TUNE, vb.)
-                    normalized_value = raw_fuzzy_outputs.get(valve_name, 0.0)
-                    output_to_use = self.frozen_fuzzy_outputs.get(valve_name, normalized_value) if self.adaptation_mode == "FINE_TUNE" else normalized_value
-                    final_normalized_value = max(0.0, min(1.0, output_to_use * current_gain))
-
-                    if self.adaptation_mode == "STABLE" and not self.is_adapted:
-                        log_status = "STABLE_NUDGE"
-                        fill_valve_name = valves[0]['name'] if len(valves) > 0 else None
-                        drain_valve_name = valves[1]['name'] if len(valves) > 1 else None
-                        if abs(current_error) > 0.001:
-                            if current_error > 0: final_normalized_value = 0.01 if valve_name == fill_valve_name else 0.0
-                            else: final_normalized_value = 0.01 if valve_name == drain_valve_name else 0.0
-                        else: final_normalized_value = 0.0
-                    
-                    elif self.adaptation_mode not in ["STABLE", "STABLE_LOCKED"]:
-                        fill_valve_name = valves[0]['name'] if len(valves) > 0 else None
-                        drain_valve_name = valves[1]['name'] if len(valves) > 1 else None
-                        if current_error > 0 and valve_name == drain_valve_name: final_normalized_value = 0.0
-                        elif current_error < 0 and valve_name == fill_valve_name: final_normalized_value = 0.0
-
-                    physical_range = valve_conf['max_out'] - valve_conf['min_out']
-                    physical_value = (final_normalized_value * physical_range) + valve_conf['min_out']
-                
-                addr_str = self.valve_addr_inputs.get(valve_name)
-                if addr_str and addr_str.text(): self.plc_manager.write_real(int(db_num), int(addr_str.text()), physical_value)
-                self.valve_output_labels[valve_name].setText(f"{valve_name}\n{physical_value:.2f}")
-                log_msg_parts.append(f"{valve_name[:1]}:{physical_value:.2f}(G:{current_gain:.2f})")
-            
-            self.last_error = current_error
-            self.log(f"E:{current_error:.2f}, dE:{delta_error/dt:.2f} [{log_status}] -> {', '.join(log_msg_parts)}")
-        
-        except Exception as e:
-            logging.exception("Kontrol döngüsünde kritik hata oluştu:")
-            self.log(f"Döngü hatası: {e}")
-            if self.control_timer.isActive():self.btn_start_stop.setChecked(False);self.toggle_control_loop()
-            if self.plc_manager.is_connected:self.btn_connect.setChecked(False);self.toggle_plc_connection()
-
-    def _perform_adaptation_step(self, current_error, delta_error, dt):
-        if not self.frozen_fuzzy_outputs:
-            self.frozen_fuzzy_outputs = self.fuzzy_controller.compute(current_error, delta_error / dt) or {}
-            self.log(f"İnce Ayar Modu Başladı. Temel çıkışlar donduruldu: { {k: f'{v:.2f}' for k,v in self.frozen_fuzzy_outputs.items()} }")
-        
-        if self.last_adaptation_info.get('reverting', False):
-            self.log("Kalıcı Geri Alma döngüsü aktif. Yeni adım atlanıyor, geri almaya devam ediliyor.")
-            self._revert_last_adaptation(is_permanent_revert=True)
-            return
+            self.set_label(self.lbl_set_level, f"Set Seviye:\n{snapshot['set_level']:.2f}")
+            self.set_label(self.lbl_actual_level, f"Anlık Seviye:\n{snapshot['actual_level']:.2f}", "background-color: #2ecc71; color: white;" if abs(snapshot['error']) < DEADBAND else "")
+            self.set_label(self.lbl_error, f"Fark:\n{snapshot['error']:.2f} ({snapshot['active_term']})")
+        elif snapshot['kind'] == 'cycle':
+            if self.surface_dialog is not None: self.surface_dialog.set_operating_point(snapshot['error'], snapshot['delta_error'])
+            for valve_name, physical_value in snapshot['outputs'].items():
+                if valve_name in self.valve_output_labels: self.set_label(self.valve_output_labels[valve_name], f"{valve_name}\n{physical_value:.2f}")
+        if snapshot['mode'] == "DISTURBANCE_WAIT" and not self.disturbance_countdown_timer.isActive(): self.start_countdown(self.disturbance_delay_spin.value())
+        self.engine.timings.record('ui_update', time.perf_counter() - t0)
 
-        error_abs = abs(current_error)
-        step_size = 0.0
-        adapt_type_log = ""
-        
-        observation_duration = 10.0 if error_abs < 0.3 else self.fine_tune_interval_spin.value()
-        error_trend = delta_error / dt if dt > 0 else 0.0
-        
-        if error_abs < self.precision_threshold_spin.value():
-            adapt_type_log = "Hassas (İniş Modu)"
-            damping_factor = self.precision_aggr_spin.value() * 10
-            p_adjustment = current_error * 0.1
-            d_adjustment = -error_trend * damping_factor
-            control_value = p_adjustment + d_adjustment
-            adjustment = np.clip(control_value, -0.05, 0.05)
-        else:
-            adapt_type_log = "Normal (Trend Tabanlı)"
-            damping_factor = 0.5 
-            if current_error > 0:
-                step_size = (error_abs + (error_trend * damping_factor)) * self.fine_tune_aggr_spin.value()
-            else:
-                step_size = (error_abs - (error_trend * damping_factor)) * self.fine_tune_aggr_spin.value()
-            adjustment = np.clip(abs(step_size), 0.001, 0.1)
-        
-        target_valve = None
-        valves = self.fuzzy_settings.get('valves', [])
-        if current_error > 0: target_valve = valves[0]['name'] if len(valves) > 0 else None
-        else: target_valve = valves[1]['name'] if len(valves) > 1 else None
-
-        if target_valve:
-            final_adjustment = adjustment if adapt_type_log.startswith("Hassas") or current_error > 0 else -adjustment
-            self.gain_adaptation_multipliers[target_valve] += final_adjustment
-            self.last_adaptation_info = {'type': 'gain_adjust', 'valve': target_valve, 'amount': final_adjustment, 'reverting': False}
-            self.log(f"İnce Ayar ({adapt_type_log}): '{target_valve}' kazancı -> {self.gain_adaptation_multipliers[target_valve]:.3f} (Adım: {final_adjustment:+.3f})")
-        
-        self.is_in_fine_tune_observation = True
-        self.adaptation_mode_end_time = time.time() + (1.0 if adapt_type_log.startswith("Hassas") else observation_duration)
-        self.adaptation_mode_storage['observation_initial_error'] = current_error
-        self.log(f"Adaptasyon adımı atıldı. {self.adaptation_mode_end_time - time.time():.1f}sn boyunca İnce Ayar GÖZLEM moduna geçiliyor.")
-
-    def _evaluate_observation_and_decide_next_step(self, current_error):
-        initial_error = self.adaptation_mode_storage.get('observation_initial_error', 0.0)
-        progress = abs(initial_error) - abs(current_error)
-        self.log(f"İnce Ayar Gözlem tamamlandı. Başlangıç E: {initial_error:.3f}, Bitiş E: {current_error:.3f}. İlerleme: {progress:.3f}")
-        self.is_in_fine_tune_observation = False
-        
-        has_overshoot = np.sign(current_error) != np.sign(initial_error) and abs(current_error) > 0.01
+    def set_label(self, label, text, style=None):
+        # Metin ve stil yalnızca gösterilen değer değiştiğinde uygulanır; setStyleSheet her çağrıda widget'ı yeniden stillendirir
+        shown_text, shown_style = self.label_state.get(label, (None, None))
+        if text != shown_text: label.setText(text)
+        if style is not None and style != shown_style: label.setStyleSheet(style)
+        self.label_state[label] = (text, shown_style if style is None else style)
 
-        if self.last_adaptation_info.get('reverting', False):
-            if has_overshoot:
-                self.log("Kalıcı Geri Alma devam ediyor...")
-                return
-            else:
-                self.log("Kalıcı Geri Alma modu overshoot düzeldiği için sonlandırıldı.")
-                self.last_adaptation_info['reverting'] = False
-        
-        if has_overshoot and not self.last_adaptation_info.get('reverting', False):
-            self.log("OVERSHOOT tespit edildi! Geri Alma başlatılıyor.")
-            is_permanent = abs(initial_error) < self.precision_threshold_spin.value()
-            if is_permanent:
-                self.log("Hassas modda overshoot, kalıcı geri alma döngüsü başlatılıyor.")
-                self.last_adaptation_info['reverting'] = True
-            self._revert_last_adaptation(is_permanent_revert=is_permanent)
-
-    def _revert_last_adaptation(self, is_permanent_revert=False):
-        if not self.last_adaptation_info:
-            self.log("Geri alınacak bir adaptasyon adımı bulunamadı."); return
-
-        reversal_factor = 1.0 if is_permanent_revert else 0.5 
-        info = self.last_adaptation_info.copy() 
-        amount_to_revert = info.get('amount', 0.0) * reversal_factor
-        revert_log_prefix = "Kalıcı Geri Alma" if is_permanent_revert else "Geri Alma"
-        valve_name = info.get('valve')
-        if valve_name:
-            current_gain = self.gain_adaptation_multipliers[valve_name]
-            self.gain_adaptation_multipliers[valve_name] = max(1.0, current_gain - amount_to_revert)
-            self.log(f"{revert_log_prefix} (Kazanç): '{valve_name}' kazancı -> {self.gain_adaptation_multipliers[valve_name]:.3f}")
-        
-        if not is_permanent_revert:
-            self.last_adaptation_info = {}
-        else:
-            self.last_adaptation_info['amount'] = -amount_to_revert 
-        
-        error_abs = abs(self.current_error)
-        self.is_in_fine_tune_observation = True
-        observation_duration = 10.0 if error_abs < 0.3 else self.fine_tune_interval_spin.value()
-        self.adaptation_mode_end_time = time.time() + observation_duration
-        self.adaptation_mode_storage['observation_initial_error'] = self.current_error
-        self.log(f"Geri alma sonrası {observation_duration:.1f}sn GÖZLEM moduna geçiliyor.")
+    def open_diagnostics(self):
+        if self.diagnostics_dialog is None: self.diagnostics_dialog = DiagnosticsDialog(self.engine.timings, self.engine.output_writer, self)
+        self.diagnostics_dialog.show(); self.diagnostics_dialog.activateWindow()
+
+    def open_trend(self):
+        if self.trend_dialog is None: self.trend_dialog = TrendDialog(self.engine, self)
+        self.trend_dialog.show(); self.trend_dialog.activateWindow()
+
+    def open_control_surface(self):
+        if self.surface_dialog is None: self.surface_dialog = ControlSurfaceDialog(self.fuzzy_settings, self)
+        else: self.surface_dialog.set_settings(self.fuzzy_settings)
+        self.surface_dialog.show(); self.surface_dialog.activateWindow()
+
+    def preview_surface(self, settings):
+        if self.surface_dialog is not None: self.surface_dialog.set_settings(settings)
+
+    def on_engine_fault(self, task, message):
+        if self.btn_start_stop.isChecked(): self.btn_start_stop.setChecked(False); self.btn_start_stop.setText("Kontrolü Başlat")
+        if self.plc_manager.is_connected: self.btn_connect.setChecked(False); self.toggle_plc_connection()
+        if task == 'read': QMessageBox.critical(self,"Okuma Hatası", f"PLC okuma hatası: {message}\nBağlantı kesiliyor.")
+
+    def on_engine_settings_changed(self):
+        if [v['name'] for v in self.fuzzy_settings.get('valves', [])] != list(self.valve_output_labels): self.rebuild_dynamic_ui()
+        if self.graph_dialog: self.fuzzy_settings_updated.emit(self.fuzzy_settings)
+        self.static_plot_widget.update_plot(self.fuzzy_settings); self.preview_surface(self.fuzzy_settings)
+        self.save_settings()
 
     def start_countdown(self, delay_seconds):
         self.disturbance_countdown_timer.start(50)
 
     def stop_countdown(self):
         self.disturbance_countdown_timer.stop()
-        self.countdown_label.setText("---"); self.countdown_label.setStyleSheet("")
+        self.set_label(self.countdown_label, "---", "")
 
     def update_countdown_label(self):
-        if self.adaptation_mode != "DISTURBANCE_WAIT": 
+        if self.engine.adaptation_mode != "DISTURBANCE_WAIT": 
             self.stop_countdown()
             return
-        remaining = self.adaptation_mode_end_time - time.time()
-        if remaining <= 0: self.countdown_label.setText("00:00")
+        remaining = self.engine.adaptation_mode_end_time - self.engine.clock()
+        if remaining <= 0: self.set_label(self.countdown_label, "00:00")
         else:
             seconds = int(remaining); milliseconds = int((remaining - seconds) * 100)
-            self.countdown_label.setText(f"{seconds:02d}:{milliseconds:02d}")
-            self.countdown_label.setStyleSheet("background-color: #f39c12; color: white;")
+            self.set_label(self.countdown_label, f"{seconds:02d}:{milliseconds:02d}", "background-color: #f39c12; color: white;")
         
-    def reset_adaptation_state(self):
-        self.log("Tam adaptasyon sıfırlaması yapılıyor. STABLE moda geçiliyor.")
-        self.adaptation_mode = "STABLE"
-        self.is_adapted = False
-        self.is_in_fine_tune_observation = False
-        self.adaptation_mode_end_time = 0.0
-        
-        # Dominant vana bilgisini de temizle
-        if 'dominant_correction_valve' in self.adaptation_mode_storage:
-            self.adaptation_mode_storage.pop('dominant_correction_valve')
-            
-        self.last_adaptation_info = {}
-        self.locked_stable_outputs.clear()
-        self.frozen_fuzzy_outputs.clear()
-        self.stop_countdown()
-        for key in self.gain_adaptation_multipliers: self.gain_adaptation_multipliers[key] = 1.0
-        
-        self.drift_adjustment_values.clear()
-        self.drift_correction_timer = 0.0
-    def reset_to_optimized_defaults(self):
-        self.log("Fabrika ayarlarına (hesaplanmış optimum) dönülüyor.")
-        self.reset_adaptation_state()
-
-        min_l = self.settings.value("dialog/opt_min", self.fuzzy_settings.get('opt_min', 0), type=float)
-        max_l = self.settings.value("dialog/opt_max", self.fuzzy_settings.get('opt_max', 5), type=float)
-        set_l = self.settings.value("dialog/opt_set", self.fuzzy_settings.get('opt_set', 3.3), type=float)
-        agg_factor = self.fuzzy_settings.get('opt_aggr', 4.0); prec_factor = self.fuzzy_settings.get('opt_prec', 2.0)
-        agg_multiplier = 1.0 / agg_factor; prec_multiplier = 1.0 / prec_factor
-        total_range = max_l - min_l if max_l > min_l else 1
-        max_pos_error = set_l - min_l; max_neg_error = set_l - max_l
-        z_width = (total_range * 0.05) * prec_multiplier
-        pl_peak = (max_pos_error * 0.4) * agg_multiplier; pl_end = (max_pos_error * 0.8) * agg_multiplier
-        ph_start = (max_pos_error * 0.7) * agg_multiplier; nl_peak = (max_neg_error * 0.4) * agg_multiplier
-        nl_end = (max_neg_error * 0.8) * agg_multiplier; nh_start = (max_neg_error * 0.7) * agg_multiplier
-        pl_peak = max(pl_peak, z_width + 0.01); nl_peak = min(nl_peak, -z_width - 0.01)
-        new_points = {
-            'Z': [-z_width, 0, z_width], 'PL': [z_width, pl_peak, pl_end], 'PH': [ph_start, max_pos_error, max_pos_error],
-            'NL': [nl_end, nl_peak, -z_width], 'NH': [max_neg_error, max_neg_error, nh_start]
-        }
-        self.fuzzy_settings['points'] = new_points
-        self.best_fuzzy_points = copy.deepcopy(new_points)
-        valves = self.fuzzy_settings.get('valves', []); fill_valve = valves[0]['name'] if len(valves) > 0 else None; drain_valve = valves[1]['name'] if len(valves) > 1 else None
-        raw_rules = {
-            'PH_P':{'fill':1.0,'drain':0},'PH_Z':{'fill':0.9,'drain':0},'PH_N':{'fill':0.7,'drain':0},
-            'PL_P':{'fill':0.6,'drain':0},'PL_Z':{'fill':0.3,'drain':0},'PL_N':{'fill':0.1,'drain':0},
-            'Z_P':{'fill':0.15,'drain':0},'Z_Z':{'fill':0,'drain':0},'Z_N':{'fill':0,'drain':0.15},
-            'NL_P':{'fill':0,'drain':0.1},'NL_Z':{'fill':0,'drain':0.3},'NL_N':{'fill':0,'drain':0.6},
-            'NH_P':{'fill':0,'drain':0.7},'NH_Z':{'fill':0,'drain':0.9},'NH_N':{'fill':1.0,'drain':1.0},
-        }
-        optimized_rules = {}
-        for key, vals in raw_rules.items():
-            rule_entry = {}
-            if fill_valve: rule_entry[fill_valve] = vals['fill']
-            if drain_valve: rule_entry[drain_valve] = vals['drain']
-            optimized_rules[key] = rule_entry
-        self.fuzzy_settings['outputs'] = optimized_rules
-        self.fuzzy_controller = FuzzyPIDController(self.fuzzy_settings)
-        if self.graph_dialog: self.fuzzy_settings_updated.emit(self.fuzzy_settings)
-        self.static_plot_widget.update_plot(self.fuzzy_settings)
-        self.save_settings()
 
-    def log(self, m):
-        timestamp = datetime.now().strftime('%H:%M:%S')
-        self.log_output.append(f"[{timestamp}] {m}")
-        logging.info(m)
+    def log(self, m): self.log_buffer.append(m)
+
+    def flush_log(self):
+        t0 = time.perf_counter()
+        batch = self.log_buffer.drain()
+        if not batch: return
+        self.log_output.appendPlainText("\n".join(batch))
+        self.engine.timings.record('ui_log', time.perf_counter() - t0)
+
+    def apply_log_settings(self):
+        # Döngü satırları kapalıyken motor bu satırları hiç biçimlemez (DEBUG seviyesi)
+        self.engine.log_level = logging.DEBUG if self.log_cycle_lines_checkbox.isChecked() else logging.INFO
+        self.log_buffer.set_max_lines(self.log_max_lines_spin.value()); self.log_output.setMaximumBlockCount(self.log_max_lines_spin.value())
+
+    def set_log_file(self, file_path):
+        try: self.log_buffer.set_file_sink(file_path or None)
+        except OSError as e: self.log(f"Log dosyası açılamadı: {e}"); file_path = ""
+        self.btn_log_file.setChecked(bool(file_path)); self.btn_log_file.setText(f"Dosya: {os.path.basename(file_path)}" if file_path else "Dosyaya Yaz...")
+        self.settings.setValue("log/file_path", file_path or "")
+
+    def toggle_log_file(self):
+        if self.btn_log_file.isChecked():
+            script_dir = os.path.dirname(os.path.abspath(__file__))
+            file_path, _ = QFileDialog.getSaveFileName(self, "Log Dosyası", os.path.join(script_dir, "fuzzy_control.log"), "Log Files (*.log);;All Files (*)")
+            self.set_log_file(file_path)
+            if file_path: self.log(f"Loglar {file_path} dosyasına yazılıyor (5 MB x 3 yedek).")
+        else: self.flush_log(); self.set_log_file("")
 
     def toggle_plc_connection(self):
         if self.btn_connect.isChecked():
@@ -1113,14 +1032,14 @@ class MainWindow(QMainWindow):
             self.log(f"PLC'ye bağlanılıyor: {ip}...");suc,msg=self.plc_manager.connect(ip,r,s)
             if suc:
                 self.btn_connect.setText("PLC Bağlı (Kes)");self.btn_connect.setStyleSheet("background-color: #27ae60; color: white;");self.btn_start_stop.setEnabled(True);self.log(msg)
-                self.plc_read_timer.start(1000)
+                self.engine.start()
             else:
                 QMessageBox.critical(self,"Bağlantı Hatası",msg);self.btn_connect.setChecked(False);self.log(f"Bağlantı başarısız: {msg}")
         else:
-            if self.control_timer.isActive():self.btn_start_stop.setChecked(False);self.toggle_control_loop()
-            self.plc_read_timer.stop()
+            if self.btn_start_stop.isChecked():self.btn_start_stop.setChecked(False);self.toggle_control_loop()
+            self.engine.stop()
             self.plc_manager.disconnect();self.btn_connect.setText("PLC'ye Bağlan");self.btn_connect.setStyleSheet("");self.btn_start_stop.setEnabled(False);self.log("PLC bağlantısı kesildi.")
-            self.lbl_set_level.setText("Set Seviye: -"); self.lbl_actual_level.setText("Anlık Seviye: -"); self.lbl_error.setText("Fark: -")
+            self.set_label(self.lbl_set_level, "Set Seviye: -"); self.set_label(self.lbl_actual_level, "Anlık Seviye: -", ""); self.set_label(self.lbl_error, "Fark: -")
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
@@ -0,0 +1,83 @@
+import sys
+import os
+import json
+import time
+import logging
+import argparse
+
+# Donanımsız kapalı çevrim ölçümü: gerçek ControlEngine (okuma görevi, run_control_cycle, adaptasyon) simüle tank üzerinde koşar.
+# 1) Verim: döngüler boş beklemeden art arda çağrılır; model her döngüde bir kontrol periyodu (dt) ilerler.
+# 2) Yanıt: varsayılan olarak replay.run_replay ile simüle saatte (gerçek zamandan hızlı); --realtime ile motor kendi zamanlayıcısıyla
+#    duvar saatinde çalışır. Aşım, oturma süresi ve IAE her iki durumda da model zamanında ölçülür.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fuzzy_engine import ControlEngine, get_default_fuzzy_settings
+from plant_simulator import TankPlant, SimulatedPLCManager, response_metrics
+import replay
+
+def build_engine(args, plant, clock=time.time):
+    fuzzy_settings = get_default_fuzzy_settings(); fuzzy_settings['engine'] = args.engine; fuzzy_settings['compiled'] = args.compiled
+    engine = ControlEngine(params={'opt_set': args.set_level}, clock=clock)
+    engine.plc_manager = SimulatedPLCManager(plant, fuzzy_settings, engine.params, set_level=args.set_level)
+    engine.fuzzy_settings = fuzzy_settings; engine.on_log = lambda m: None
+    engine.plc_manager.connect("127.0.0.1", 0, 1); engine.ensure_controller()
+    return engine
+
+def stage_stats(engine, stages):
+    summary = engine.timings.summary()['stages']
+    return {stage: {k: round(summary[stage][k], 4) for k in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms')} for stage in stages if stage in summary}
+
+def run_throughput(args):
+    # Döngüler arka arkaya koşar; motor saati model zamanıyla ilerletilir, ölçülen adım süresi planlanan periyoda eşit kalır
+    plant = TankPlant(level=args.level); clock = replay.SimulatedClock(); engine = build_engine(args, plant, clock); bridge = engine.plc_manager.bridge; dt = engine.params['control_period']
+    engine.prepare_control()
+    start = time.perf_counter()
+    for _ in range(args.cycles):
+        bridge.step(dt); clock.now += dt; engine.read_process(); engine.run_control_cycle(dt)
+    elapsed = time.perf_counter() - start
+    return {'cycles': args.cycles, 'elapsed_s': round(elapsed, 3), 'cycles_per_s': round(args.cycles / elapsed, 1),
+            'latency': stage_stats(engine, ['plc_read', 'inference', 'state_machine', 'plc_write', 'log']), 'valve_writes': engine.output_writer.stats()}
+
+def run_response(args):
+    plant = TankPlant(level=args.level)
+    if args.disturbance_at is not None: plant.add_disturbance(args.disturbance_at, args.disturbance_duration, args.disturbance_flow)
+    if args.realtime:
+        engine = build_engine(args, plant); bridge = engine.plc_manager.bridge
+        bridge.start(0.05); engine.start(); engine.start_control()
+        time.sleep(args.duration)
+        engine.stop(); bridge.stop()
+    else:
+        fuzzy_settings = get_default_fuzzy_settings(); fuzzy_settings['engine'] = args.engine; fuzzy_settings['compiled'] = args.compiled
+        engine, clock = replay.build_engine(fuzzy_settings, plant, params={'opt_set': args.set_level}, set_level=args.set_level); bridge = engine.plc_manager.bridge
+        start = time.perf_counter(); replay.run_replay(engine, clock, args.duration); wall = time.perf_counter() - start
+    split = args.disturbance_at if args.disturbance_at is not None and args.disturbance_at < args.duration else None
+    result = {'duration_s': args.duration, 'realtime': args.realtime, 'step': response_metrics(bridge.trace, args.set_level, args.tolerance, 0.0, split),
+              'latency': stage_stats(engine, ['plc_read', 'inference', 'plc_write', 'control_jitter', 'control_total']), 'deadline_misses': engine.timings.summary()['deadline_misses'],
+              'valve_writes': engine.output_writer.stats()}
+    if split is not None: result['disturbance'] = response_metrics(bridge.trace, args.set_level, args.tolerance, split)
+    if not args.realtime: result['wall_time_s'] = round(wall, 3); result['mode_transitions'] = replay.summarize(engine.decision_trace, engine.params['control_period'])['transitions']
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simüle tank üzerinde kapalı çevrim verim ve yanıt ölçümü")
+    parser.add_argument('--engine', choices=['mamdani', 'sugeno'], default='mamdani'); parser.add_argument('--compiled', action='store_true')
+    parser.add_argument('--cycles', type=int, default=2000, help="Verim ölçümündeki döngü sayısı (0 = atla)")
+    parser.add_argument('--duration', type=float, default=600.0, help="Yanıt ölçümü süresi, model zamanı saniye (0 = atla)")
+    parser.add_argument('--realtime', action='store_true', help="Yanıt ölçümünü simüle saat yerine motorun zamanlayıcısıyla duvar saatinde koş")
+    parser.add_argument('--level', type=float, default=3.0, help="Başlangıç seviyesi"); parser.add_argument('--set-level', type=float, default=3.3)
+    parser.add_argument('--tolerance', type=float, default=0.02, help="Oturma bandı (seviye birimi)")
+    parser.add_argument('--disturbance-at', type=float, help="Bozucu etken başlangıcı (model zamanı, sn)")
+    parser.add_argument('--disturbance-duration', type=float, default=1e9); parser.add_argument('--disturbance-flow', type=float, default=0.01)
+    parser.add_argument('--json', help="Sonuçları JSON dosyasına yaz")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    report = {'engine': args.engine, 'compiled': args.compiled}
+    if args.cycles > 0: report['throughput'] = run_throughput(args)
+    if args.duration > 0: report['response'] = run_response(args)
+    print(json.dumps(report, indent=4))
+    if args.json:
+        with open(args.json, 'w') as f: json.dump(report, f, indent=4)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
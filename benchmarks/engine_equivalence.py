@@ -0,0 +1,101 @@
+import sys
+import os
+import json
+import time
+import logging
+import argparse
+import numpy as np
+
+# Sugeno / Mamdani eşdeğerlik kontrolü: aynı ayarla kurulan iki denetleyicinin çıkışları error x delta_error ızgarasında karşılaştırılır.
+# Mamdani tarafı skfuzzy'nin kesin sonucudur (_compute_exact_array), Sugeno tarafı compute_many.
+# İki motor tanım gereği farklıdır (bilinçli anlamsal fark): Mamdani aynı değerli kuralları max ile birleştirir ve her değeri kırpılmış
+# üçgeninin alanıyla ağırlıklandırır; Sugeno her kuralı kendi ateşlenme gücüyle ağırlıklandırır (Σ wᵢzᵢ / Σ wᵢ). Bu yüzden kontrol
+# "fark küçük mü" diye değil, farkın yalnızca bu tanım farkından gelip gelmediğine bakar. Eşikler ölçümden değil tanımdan gelir:
+#  - single_value: bir vanada ateşlenen tüm kurallar aynı değeri taşıyorsa iki motor da o değeri vermelidir. Tek fark evren ucundaki
+#    (0 veya 1) yarım üçgendir; kırpılmış yarım üçgenin ağırlık merkezi değerden en fazla CONSEQUENT_HALF_WIDTH / 2 uzaktadır.
+#  - mamdani_definition: skfuzzy sonucu, kapalı formdaki tekil Mamdani'ye (değer başına max birleştirme, [0, 1]'e kırpılmış üçgenlerin
+#    alan/moment integrali) kayan nokta hassasiyetinde eşit olmalıdır. Kapalı form kural değerleri çıkış evreni düğümlerindeyse
+#    (0.01 adım) ve farklı değerlerin üçgenleri örtüşmüyorsa geçerlidir; aksi halde bu kontrol atlanır ve raporda belirtilir.
+#  - sugeno_definition: compute_many, skfuzzy antecedent üyeliklerinden ayrıca hesaplanan Σ wᵢzᵢ / Σ wᵢ'ye kayan nokta hassasiyetinde eşit olmalıdır.
+# En büyük / ortalama fark bilgi olarak raporlanır; çıkış kodu yalnızca kontrollerden biri başarısızsa 1'dir.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fuzzy_engine import FuzzyPIDController, get_default_fuzzy_settings, optimized_default_settings
+
+H = FuzzyPIDController.CONSEQUENT_HALF_WIDTH; FLOAT_TOL = 1e-9; OUT_STEP = 0.01
+
+def rule_tables(args):
+    default = get_default_fuzzy_settings(); optimized = get_default_fuzzy_settings()
+    optimized['points'], optimized['outputs'] = optimized_default_settings(optimized, args.opt_min, args.opt_max, args.set_level)
+    return {'default': default, 'optimized': optimized}
+
+def firing_strengths(controller, errors, deltas):
+    # Kural başına ateşlenme gücü (kural x nokta), skfuzzy antecedent üyeliklerinden: min(mu_error, mu_delta)
+    e_ant = controller.error_antecedent; d_ant = controller.delta_antecedent
+    return np.array([np.minimum(np.interp(errors, e_ant.universe, e_ant[key.split('_')[0]].mf), np.interp(deltas, d_ant.universe, d_ant[key.split('_')[1]].mf)) for key in controller._rule_keys])
+
+def clipped_triangle(v, w, h=H):
+    # min(w, üçgen(v-h, v, v+h)) fonksiyonunun [0, 1] üzerindeki alanı ve momenti; parçalar doğrusal olduğundan yamuk formülü kesindir
+    w = np.asarray(w, dtype=float); area = np.zeros_like(w); moment = np.zeros_like(w)
+    f = lambda x: np.clip(np.minimum(w, 1 - np.abs(x - v) / h), 0.0, None)
+    knots = (v - h, v - h + w * h, v + h - w * h, v + h)
+    for a, b in zip(knots[:-1], knots[1:]):
+        x0 = np.clip(a, 0.0, 1.0); x1 = np.clip(b, 0.0, 1.0); length = x1 - x0; f0 = f(x0); f1 = f(x1)
+        area += length * (f0 + f1) / 2; moment += length / 6 * (f0 * (2 * x0 + x1) + f1 * (x0 + 2 * x1))
+    return area, moment
+
+def singleton_mamdani(values, firing):
+    # Aynı değerli kurallar max ile birleşir; çıkış kırpılmış üçgenlerin alan ağırlıklı ağırlık merkezidir (hiçbir kural ateşlenmezse 0)
+    area = np.zeros(firing.shape[1]); moment = np.zeros(firing.shape[1])
+    for v in np.unique(values):
+        a, m = clipped_triangle(v, firing[values == v].max(axis=0)); area += a; moment += m
+    return np.divide(moment, area, out=np.zeros_like(area), where=area > 0)
+
+def closed_form_applies(values):
+    # Değerler çıkış evreni düğümlerinde ve farklı değerlerin üçgenleri örtüşmüyor (aralık >= 2h) mu
+    distinct = np.unique(values)
+    return bool(np.allclose(distinct / OUT_STEP, np.round(distinct / OUT_STEP), atol=1e-9) and (np.diff(distinct) >= 2 * H - 1e-12).all())
+
+def compare(settings, resolution):
+    mamdani = FuzzyPIDController(dict(settings, engine='mamdani', compiled=False)); sugeno = FuzzyPIDController(dict(settings, engine='sugeno', compiled=False))
+    e_univ = mamdani.error_antecedent.universe; d_univ = mamdani.delta_antecedent.universe
+    ee, dd = np.meshgrid(np.linspace(e_univ[0], e_univ[-1], resolution), np.linspace(d_univ[0], d_univ[-1], max(2, resolution // 4)), indexing='ij')
+    errors = ee.ravel(); deltas = dd.ravel()
+    start = time.perf_counter(); exact = mamdani._compute_exact_array(errors, deltas, mamdani.valve_names); t_mamdani = time.perf_counter() - start
+    start = time.perf_counter(); fast = sugeno.compute_many(errors, deltas); t_sugeno = time.perf_counter() - start
+    firing = firing_strengths(sugeno, errors, deltas); fired = firing > 0; any_fired = fired.any(axis=0)
+    single_dev = 0.0; definition_dev = 0.0; sugeno_dev = 0.0; single_points = 0; skipped = []
+    for k, name in enumerate(sugeno.valve_names):
+        values = sugeno.rule_values[:, k]
+        lo = np.where(fired, values[:, None], np.inf).min(axis=0); hi = np.where(fired, values[:, None], -np.inf).max(axis=0)
+        single = any_fired & (lo == hi); single_points += int(single.sum())
+        if single.any(): single_dev = max(single_dev, float(np.abs(exact[single, k] - fast[single, k]).max()))
+        total = firing.sum(axis=0); weighted = np.divide(values @ firing, total, out=np.zeros_like(total), where=total > 0)
+        sugeno_dev = max(sugeno_dev, float(np.abs(fast[:, k] - weighted).max()))
+        if closed_form_applies(values): definition_dev = max(definition_dev, float(np.abs(exact[:, k] - singleton_mamdani(values, firing)).max()))
+        else: skipped.append(name)
+    checks = {'single_value': {'max_deviation': single_dev, 'limit': H / 2, 'passed': single_dev <= H / 2 + FLOAT_TOL},
+              'mamdani_definition': {'max_deviation': definition_dev, 'limit': FLOAT_TOL, 'passed': definition_dev <= FLOAT_TOL, 'skipped_valves': skipped},
+              'sugeno_definition': {'max_deviation': sugeno_dev, 'limit': FLOAT_TOL, 'passed': sugeno_dev <= FLOAT_TOL}}
+    diff = np.abs(fast - exact); worst = int(np.argmax(diff.max(axis=1)))
+    return {'points': int(errors.size), 'single_valued_share': round(single_points / max(diff.size, 1), 3), 'checks': checks,
+            'gap': {'max_deviation': round(float(diff.max()), 4), 'mean_deviation': round(float(diff.mean()), 4), 'p99_deviation': round(float(np.percentile(diff, 99)), 4),
+                    'worst_at': {'error': round(float(errors[worst]), 3), 'delta_error': round(float(deltas[worst]), 3)}},
+            'mamdani_s': round(t_mamdani, 3), 'sugeno_s': round(t_sugeno, 4), 'passed': all(c['passed'] for c in checks.values())}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sugeno ile Mamdani (skfuzzy) motorlarının farkının yalnızca tanım farkından geldiğini ızgara üzerinde doğrular")
+    parser.add_argument('--resolution', type=int, default=201, help="Hata ekseni nokta sayısı (delta ekseni bunun dörtte biri)")
+    parser.add_argument('--opt-min', type=float, default=0.0); parser.add_argument('--opt-max', type=float, default=5.0); parser.add_argument('--set-level', type=float, default=3.3)
+    parser.add_argument('--json', help="Sonuçları JSON dosyasına yaz")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    report = {'resolution': args.resolution, 'consequent_half_width': H, 'tables': {name: compare(settings, args.resolution) for name, settings in rule_tables(args).items()}}
+    report['passed'] = all(r['passed'] for r in report['tables'].values())
+    print(json.dumps(report, indent=4))
+    if args.json:
+        with open(args.json, 'w') as f: json.dump(report, f, indent=4)
+    return 0 if report['passed'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
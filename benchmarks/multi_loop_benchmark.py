@@ -0,0 +1,96 @@
+import sys
+import os
+import json
+import time
+import logging
+import argparse
+import threading
+import numpy as np
+
+# Tek çekirdek kaç döngü taşır: LoopSupervisor, tek bir simüle PLC uç noktasında (her döngü kendi DB'si ve tank modeliyle) N döngü çalıştırır.
+# 1) Maliyet: tüm döngülerin okuma + kontrol görevleri boş beklemeden art arda çağrılır; döngü başına süreden belirtilen periyotta
+#    tek çekirdeğin kaldırabileceği döngü sayısı tahmin edilir (tank modeli ölçüme dahil değildir).
+# 2) Gerçek zaman: süpervizör paylaşılan zamanlayıcısıyla duvar saatinde koşar; kaçırılan son tarihler, kontrol gecikmesi (jitter)
+#    ve süreç CPU kullanımı raporlanır. Döngü sayıları verilmezse tahminin yarısı, %90'ı ve %120'si denenir.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fuzzy_engine import PLCManager, CompiledSurfaceCache, get_default_fuzzy_settings
+from plant_simulator import TankPlant, SimulatedS7Client, bridge_for_settings
+from supervisor import LoopSupervisor
+
+def build_supervisor(args, n):
+    # configs farklı set değeri -> configs farklı "fabrika" ayarı -> en fazla configs paylaşılan denetleyici
+    supervisor = LoopSupervisor(cache=CompiledSurfaceCache()); supervisor.on_log = lambda m: None
+    dbs = {}; plc = PLCManager(); plc.client = SimulatedS7Client(dbs); plc.connect("127.0.0.1", 0, 1); bridges = []
+    for i in range(n):
+        db = i + 1; dbs[db] = bytearray(64); set_level = args.set_level + 0.1 * (i % args.configs)
+        settings = get_default_fuzzy_settings(); settings['engine'] = args.engine; settings['compiled'] = args.compiled
+        # Trend tamponu döngü başına ayrılır (varsayılan 24 saat ~6 MB); binlerce döngüde belleği ölçüm değil tampon belirlemesin
+        params = {'db': db, 'opt_set': set_level, 'control_period': args.period, 'read_period': args.read_period or args.period, 'trend_capacity': 600}
+        bridge = bridge_for_settings(TankPlant(level=args.level), dbs[db], settings, params, lock=plc.client.lock, keep_trace=False); bridge.write_set_level(set_level); bridges.append(bridge)
+        supervisor.add_loop(f"T{i + 1}", settings, params, plc_manager=plc, log_level=logging.WARNING)
+    return supervisor, bridges
+
+def run_cost(args):
+    supervisor, bridges = build_supervisor(args, args.cost_loops); engines = list(supervisor.loops.values()); dt = args.period
+    for engine in engines: engine.prepare_control()
+    busy = 0.0
+    for _ in range(args.cost_rounds):
+        for bridge in bridges: bridge.step(dt)
+        start = time.perf_counter()
+        for engine in engines: engine.read_process(dt); engine.run_control_cycle(dt)
+        busy += time.perf_counter() - start
+    per_loop = busy / (args.cost_rounds * len(engines))
+    # Döngü başına saniyedeki iş: okuma her read_period, kontrol her control_period (okuma ve kontrol ayrı ölçülmediği için üst sınır)
+    load_per_loop = per_loop / min(args.period, args.read_period or args.period)
+    return {'loops': len(engines), 'rounds': args.cost_rounds, 'per_loop_ms': round(per_loop * 1000, 4), 'controllers': supervisor.controllers.stats(),
+            'estimated_loops_per_core': int(1.0 / load_per_loop), 'estimated_loops_at_70pct': int(0.7 / load_per_loop)}
+
+def run_realtime(args, n):
+    supervisor, bridges = build_supervisor(args, n); stop = threading.Event()
+    def step_plants():
+        while not stop.wait(args.plant_dt):
+            for bridge in bridges: bridge.step(args.plant_dt)
+    plant_thread = threading.Thread(target=step_plants, name="Plants", daemon=True)
+    supervisor.start(); plant_thread.start()
+    cpu0 = time.process_time(); wall0 = time.perf_counter()
+    time.sleep(args.duration)
+    cpu = time.process_time() - cpu0; wall = time.perf_counter() - wall0
+    supervisor.stop(); stop.set(); plant_thread.join()
+    summary = supervisor.timings.summary()['stages']
+    jitter = [st for stage, st in summary.items() if stage.endswith('/control_jitter')]
+    cycles = sum(engine.timings.summary()['stages'].get('inference', {}).get('count', 0) for engine in supervisor.loops.values())
+    expected = n * max(int((args.duration - args.period) / args.period), 1)
+    misses = sum(supervisor.timings.summary()['deadline_misses'].values())
+    return {'loops': n, 'duration_s': args.duration, 'control_cycles': cycles, 'cycle_ratio': round(cycles / expected, 3), 'deadline_misses': misses,
+            'jitter_p50_ms': round(float(np.median([st['p50_ms'] for st in jitter])), 3) if jitter else None,
+            'jitter_p99_ms': round(max(st['p99_ms'] for st in jitter), 3) if jitter else None,
+            'cpu_utilization': round(cpu / wall, 3), 'sustained': misses == 0 and cycles >= 0.95 * expected, 'controllers': supervisor.controllers.stats()['controllers']}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Çok döngülü süpervizör: tek çekirdekte sürdürülebilen döngü sayısı")
+    parser.add_argument('--engine', choices=['mamdani', 'sugeno'], default='mamdani'); parser.add_argument('--compiled', action='store_true')
+    parser.add_argument('--period', type=float, default=0.5, help="Kontrol periyodu, saniye"); parser.add_argument('--read-period', type=float, help="Okuma periyodu (varsayılan: kontrol periyodu)")
+    parser.add_argument('--configs', type=int, default=1, help="Farklı ayar sayısı (paylaşılan denetleyici sayısı)")
+    parser.add_argument('--cost-loops', type=int, default=20, help="Maliyet ölçümündeki döngü sayısı"); parser.add_argument('--cost-rounds', type=int, default=50)
+    parser.add_argument('--loops', type=int, nargs='*', help="Gerçek zamanlı denenecek döngü sayıları (varsayılan: tahminin %%50/%%90/%%120'si)")
+    parser.add_argument('--duration', type=float, default=10.0, help="Her gerçek zamanlı denemenin süresi, saniye (0 = atla)")
+    parser.add_argument('--plant-dt', type=float, default=0.1, help="Tank modellerinin ilerletilme aralığı (ayrı iş parçacığı)")
+    parser.add_argument('--level', type=float, default=3.0); parser.add_argument('--set-level', type=float, default=3.3)
+    parser.add_argument('--json', help="Sonuçları JSON dosyasına yaz")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    report = {'engine': args.engine, 'compiled': args.compiled, 'period_s': args.period, 'configs': args.configs, 'cost': run_cost(args)}
+    if args.duration > 0:
+        estimate = report['cost']['estimated_loops_per_core']
+        counts = args.loops or sorted({max(1, int(estimate * f)) for f in (0.5, 0.9, 1.2)})
+        report['realtime'] = [run_realtime(args, n) for n in counts]
+        sustained = [r['loops'] for r in report['realtime'] if r['sustained']]
+        report['max_sustained_loops'] = max(sustained) if sustained else 0
+    print(json.dumps(report, indent=4))
+    if args.json:
+        with open(args.json, 'w') as f: json.dump(report, f, indent=4)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
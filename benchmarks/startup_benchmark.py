@@ -0,0 +1,81 @@
+import sys
+import os
+import json
+import time
+import argparse
+import statistics
+import subprocess
+
+# Soğuk başlangıç ölçümü: her tekrar ayrı bir Python sürecinde çalışır, böylece modül önbelleği ölçümü bozmaz.
+# Çocuk süreç zaman damgalarını JSON olarak yazar; ana süreç medyan/maks değerleri raporlar ve isteğe bağlı bütçeyi denetler.
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+GUI_SCRIPT = os.path.join(REPO_DIR, "Fuzzy_Logic_v1.0.py")
+
+def child_engine():
+    t0 = time.perf_counter(); sys.path.insert(0, REPO_DIR)
+    import fuzzy_engine
+    t_import = time.perf_counter()
+    engine = fuzzy_engine.ControlEngine(); engine.fuzzy_settings = fuzzy_engine.get_default_fuzzy_settings(); engine.ensure_controller()
+    t_ready = time.perf_counter()
+    return {'import_ms': (t_import - t0) * 1000, 'controller_ready_ms': (t_ready - t0) * 1000, 'gui_loaded': any(m.startswith('PyQt6') for m in sys.modules)}
+
+def child_gui():
+    t0 = time.perf_counter(); sys.path.insert(0, REPO_DIR)
+    import importlib.util
+    spec = importlib.util.spec_from_file_location("fuzzy_gui", GUI_SCRIPT); gui = importlib.util.module_from_spec(spec); spec.loader.exec_module(gui)
+    t_import = time.perf_counter()
+    from PyQt6.QtCore import QObject, QEvent
+    class FirstPaint(QObject):
+        painted_at = None
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Type.Paint and self.painted_at is None: self.painted_at = time.perf_counter()
+            return False
+    app = gui.QApplication(sys.argv); first_paint = FirstPaint()
+    window = gui.MainWindow(); t_constructed = time.perf_counter()
+    window.installEventFilter(first_paint); window.show()
+    # Ertelenmiş işler (denetleyici kurulumu, önizleme grafiği) bitene kadar olay döngüsünü çalıştır
+    while first_paint.painted_at is None or window.engine.fuzzy_controller is None or window.static_plot_widget.canvas is None: app.processEvents(); time.sleep(0.001)
+    t_ready = time.perf_counter()
+    return {'import_ms': (t_import - t0) * 1000, 'window_constructed_ms': (t_constructed - t0) * 1000, 'first_window_ms': (first_paint.painted_at - t0) * 1000, 'controller_ready_ms': (t_ready - t0) * 1000}
+
+def run_child(mode):
+    env = dict(os.environ)
+    if not env.get('DISPLAY') and not env.get('WAYLAND_DISPLAY'): env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', mode], capture_output=True, text=True, env=env, check=True)
+    result = json.loads(out.stdout.strip().splitlines()[-1]); result['process_ms'] = (time.perf_counter() - start) * 1000
+    return result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Başlangıç süresi ölçümü (import, ilk pencere, denetleyici hazır)")
+    parser.add_argument('--mode', choices=['engine', 'gui', 'all'], default='all')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--budget-first-window-ms', type=float, help="Medyan ilk pencere süresi bu değeri aşarsa çıkış kodu 1")
+    parser.add_argument('--budget-engine-ms', type=float, help="Medyan GUI'siz denetleyici hazır süresi bu değeri aşarsa çıkış kodu 1")
+    parser.add_argument('--json', help="Sonuçları JSON dosyasına yaz")
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.child:
+        result = child_engine() if args.child == 'engine' else child_gui()
+        print(json.dumps(result)); sys.stdout.flush(); os._exit(0)
+
+    modes = ['engine', 'gui'] if args.mode == 'all' else [args.mode]; report = {}
+    for mode in modes:
+        runs = [run_child(mode) for _ in range(args.repeat)]
+        report[mode] = {key: {'median': statistics.median(r[key] for r in runs), 'max': max(r[key] for r in runs)} for key in runs[0] if key.endswith('_ms')}
+        if mode == 'engine': report[mode]['gui_loaded'] = any(r['gui_loaded'] for r in runs)
+        print(f"[{mode}] {args.repeat} tekrar")
+        for key, stats in report[mode].items():
+            if key.endswith('_ms'): print(f"  {key:<22} medyan {stats['median']:8.1f} ms   maks {stats['max']:8.1f} ms")
+        if mode == 'engine': print(f"  PyQt6 yüklendi: {'EVET' if report[mode]['gui_loaded'] else 'hayır'}")
+    if args.json:
+        with open(args.json, 'w') as f: json.dump(report, f, indent=4)
+    failed = False
+    if args.budget_first_window_ms is not None and 'gui' in report and report['gui']['first_window_ms']['median'] > args.budget_first_window_ms:
+        print(f"BÜTÇE AŞILDI: ilk pencere {report['gui']['first_window_ms']['median']:.1f} ms > {args.budget_first_window_ms:.1f} ms"); failed = True
+    if args.budget_engine_ms is not None and 'engine' in report and report['engine']['controller_ready_ms']['median'] > args.budget_engine_ms:
+        print(f"BÜTÇE AŞILDI: denetleyici hazır {report['engine']['controller_ready_ms']['median']:.1f} ms > {args.budget_engine_ms:.1f} ms"); failed = True
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,60 @@
+import sys
+import os
+import json
+import time
+import logging
+import argparse
+
+# PLC trafiği regresyon kontrolü: aynı senaryolar sabit hızda (0.5 sn kontrol, 1 sn okuma görevi) ve adaptive_rate ile simüle saatte koşar.
+# Senaryo: replay.py'deki bir saatlik Sugeno tekrarı (ölçüm gürültüsü, 600-1000 sn bozucu çıkış debisi, 2000. sn'de 3.6'ya set basamağı);
+# tohum, gürültü ve bozucu debisi değiştirilerek altı varyant. Trafik = PLC okuma + vana yazma isteği; IAE = ∫|set - seviye|dt.
+# Kontroller: toplam trafik en az --min-reduction oranında azalmalı, toplam IAE sabit hızdan kötü olmamalı ve hiçbir senaryonun IAE'si
+# --scenario-iae-tolerance'tan fazla kötüleşmemeli. Çıkış kodu bir kontrol başarısızsa 1'dir.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fuzzy_engine import get_default_fuzzy_settings
+from plant_simulator import TankPlant, response_metrics
+import replay
+
+SCENARIOS = {'seed0': {}, 'seed1': {'seed': 1}, 'seed2': {'seed': 2}, 'no_noise': {'noise': 0.0}, 'strong_disturbance': {'flow': 0.03}, 'inflow_disturbance': {'flow': -0.01}}
+
+def run(scenario, adaptive, args):
+    s = dict({'seed': 0, 'noise': 0.002, 'flow': 0.01}, **scenario)
+    fuzzy_settings = get_default_fuzzy_settings(); fuzzy_settings['engine'] = args.engine
+    plant = TankPlant(level=3.0, noise=s['noise'], seed=s['seed']); plant.add_disturbance(600.0, 400.0, s['flow'])
+    engine, clock = replay.build_engine(fuzzy_settings, plant, params={'adaptive_rate': adaptive}, set_level=args.set_level)
+    replay.run_replay(engine, clock, args.duration, events=[(args.step_at, lambda e: e.write_set_level(args.step_to))])
+    trace = engine.plc_manager.bridge.trace
+    iae = response_metrics(trace, args.set_level, end=args.step_at)['iae'] + response_metrics(trace, args.step_to, start=args.step_at)['iae']
+    reads = engine.timings.summary()['stages'].get('plc_read', {}).get('count', 0); writes = engine.output_writer.requests
+    return {'cycles': len(engine.decision_trace), 'plc_reads': reads, 'plc_writes': writes, 'traffic': reads + writes, 'iae': round(iae, 2)}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Uyarlamalı döngü hızının PLC trafiğini IAE'yi kötüleştirmeden azalttığını simüle tankta doğrular")
+    parser.add_argument('--engine', choices=['mamdani', 'sugeno'], default='sugeno')
+    parser.add_argument('--duration', type=float, default=3600.0, help="Senaryo süresi, model zamanı saniye")
+    parser.add_argument('--set-level', type=float, default=3.3); parser.add_argument('--step-at', type=float, default=2000.0); parser.add_argument('--step-to', type=float, default=3.6)
+    parser.add_argument('--scenarios', nargs='+', choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument('--min-reduction', type=float, default=0.2, help="Toplam trafikte beklenen en az azalma oranı")
+    parser.add_argument('--scenario-iae-tolerance', type=float, default=0.1, help="Tek senaryoda izin verilen en fazla IAE artış oranı")
+    parser.add_argument('--json', help="Sonuçları JSON dosyasına yaz")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    start = time.perf_counter(); scenarios = {}
+    for name in args.scenarios:
+        fixed = run(SCENARIOS[name], False, args); adaptive = run(SCENARIOS[name], True, args)
+        scenarios[name] = {'fixed': fixed, 'adaptive': adaptive, 'traffic_change': round(adaptive['traffic'] / fixed['traffic'] - 1, 3), 'iae_change': round(adaptive['iae'] / fixed['iae'] - 1, 3)}
+    total = {mode: {key: round(sum(r[mode][key] for r in scenarios.values()), 2) for key in ('plc_reads', 'plc_writes', 'traffic', 'iae')} for mode in ('fixed', 'adaptive')}
+    reduction = 1 - total['adaptive']['traffic'] / total['fixed']['traffic']; worst = max(r['iae_change'] for r in scenarios.values())
+    checks = {'traffic_reduction': {'value': round(reduction, 3), 'limit': args.min_reduction, 'passed': reduction >= args.min_reduction},
+              'total_iae': {'value': total['adaptive']['iae'], 'limit': total['fixed']['iae'], 'passed': total['adaptive']['iae'] <= total['fixed']['iae']},
+              'worst_scenario_iae_change': {'value': worst, 'limit': args.scenario_iae_tolerance, 'passed': worst <= args.scenario_iae_tolerance}}
+    report = {'engine': args.engine, 'duration_s': args.duration, 'scenarios': scenarios, 'total': total, 'checks': checks,
+              'wall_time_s': round(time.perf_counter() - start, 1), 'passed': all(c['passed'] for c in checks.values())}
+    print(json.dumps(report, indent=4))
+    if args.json:
+        with open(args.json, 'w') as f: json.dump(report, f, indent=4)
+    return 0 if report['passed'] else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
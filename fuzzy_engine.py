@@ -0,0 +1,1526 @@
+import sys
+import logging
+import logging.handlers
+import argparse
+import signal
+import importlib
+import numpy as np
+import copy
+import time
+import json
+import os
+import hashlib
+import math
+import bisect
+import heapq
+import itertools
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+
+class _LazyModule:
+    # Ağır bağımlılıklar ilk öznitelik erişiminde yüklenir: skfuzzy scipy'yi, skfuzzy.control ise matplotlib.pyplot'u çeker (~1.5 sn)
+    def __init__(self, name): self._name = name; self._module = None
+    def __getattr__(self, attr):
+        if self._module is None: self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+fuzz = _LazyModule('skfuzzy'); ctrl = _LazyModule('skfuzzy.control')
+snap7_client = _LazyModule('snap7.client'); snap7_util = _LazyModule('snap7.util')
+
+
+def get_default_fuzzy_settings():
+    default_valves = [{'name': 'Dolum Vanası', 'min_out': 0.0, 'max_out': 10.0, 'offset': 4},{'name': 'Boşaltma Vanası', 'min_out': 0.0, 'max_out': 10.0, 'offset': 12}]
+    default_rules = { 'NH_N': {'Dolum Vanası': 0.0, 'Boşaltma Vanası': 1.0} }
+    return {'universe_max':5,'control_range':5.0,'opt_min':0,'opt_max':5,'opt_set':3.3, 'opt_aggr':4.0, 'opt_prec':2.0, 'points':{'NH':[-5,-5,-2.5],'NL':[-3.5,-1.5,-0.1],'Z':[-0.5,0,0.5],'PL':[0.1,1.5,3.5],'PH':[2.5,5,5]}, 'valves': default_valves, 'outputs': default_rules}
+
+def validate_fuzzy_settings(s):
+    # Eksik üst düzey alanlar varsayılanlarla tamamlanır; denetleyiciyi kuramayacak noktalar, vanalar veya kurallar ValueError verir
+    if not isinstance(s, dict): raise ValueError("kök bir JSON nesnesi değil")
+    defaults = get_default_fuzzy_settings()
+    for key, value in defaults.items(): s.setdefault(key, value)
+    for field in ('points', 'best_fuzzy_points'):
+        points = s.get(field)
+        if points is None and field == 'best_fuzzy_points': continue
+        if not isinstance(points, dict) or set(points) != set(defaults['points']): raise ValueError(f"'{field}' yalnızca {'/'.join(defaults['points'])} terimlerini içermeli")
+        for name, pts in points.items():
+            if not isinstance(pts, list) or len(pts) != 3 or not all(isinstance(v, (int, float)) and math.isfinite(v) for v in pts): raise ValueError(f"'{field}.{name}' üç sayı olmalı: {pts}")
+            # NH'nin sol ve PH'nin sağ ucu denetleyicide evren sınırına çekilir; sıralama yalnızca kalan uçlarda aranır
+            p = list(pts)
+            if name == 'NH': p[0] = -math.inf
+            if name == 'PH': p[2] = math.inf
+            if not p[0] <= p[1] <= p[2]: raise ValueError(f"'{field}.{name}' noktaları sıralı değil: {pts}")
+    if not isinstance(s['valves'], list) or not all(isinstance(v, dict) and isinstance(v.get('name'), str) and 'min_out' in v and 'max_out' in v for v in s['valves']):
+        raise ValueError("'valves' her biri name/min_out/max_out içeren bir liste olmalı")
+    if not isinstance(s['outputs'], dict) or not all(isinstance(rule, dict) for rule in s['outputs'].values()): raise ValueError("'outputs' kural -> {vana: değer} sözlüğü olmalı")
+    if not isinstance(s['universe_max'], (int, float)) or s['universe_max'] <= 0: raise ValueError(f"'universe_max' pozitif olmalı: {s['universe_max']}")
+    return s
+
+def load_config_file(config_path, defaults=True, on_error=None):
+    # config.json yoksa, okunamazsa veya doğrulanamazsa varsayılan ayarlar (defaults=False ise None) döner. Dosya tek okumada çözülür.
+    # on_error hata mesajını alır (GUI kendi log paneline yönlendirir); verilmezse logging.error kullanılır
+    if os.path.exists(config_path):
+        try:
+            with open(config_path, 'rb') as f: return validate_fuzzy_settings(json.loads(f.read()))
+        except Exception as e: (on_error or logging.error)(f"{os.path.basename(config_path)} okuma hatası: {e}. Varsayılan ayarlar kullanılacak.")
+    return get_default_fuzzy_settings() if defaults else None
+
+def atomic_write_json(file_path, data, indent=4):
+    # Aynı dizinde geçici dosyaya yazılır, diske indirilir (fsync) ve os.replace ile yerine konur; yazma ortasında çökme eski dosyayı bozmaz
+    tmp_path = f"{file_path}.tmp"
+    try:
+        with open(tmp_path, 'w') as f: json.dump(data, f, indent=indent); f.flush(); os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path): os.remove(tmp_path)
+        raise
+
+class ConfigWriter:
+    # Ertelenmiş, birleştirilmiş ve atomik config.json kaydı. mark_dirty() her iş parçacığından çağrılabilir ve yalnızca bayrak koyar;
+    # son istekten delay saniye sonra arka plan iş parçacığı tek bir anlık görüntü alır. Anlık görüntü son yazılanla üst düzey alan
+    # bazında karşılaştırılır: hiçbir alan değişmediyse dosyaya dokunulmaz. flush() bekleyen kaydı çağıran iş parçacığında hemen yapar.
+    def __init__(self, file_path, snapshot, delay=1.0, written=None):
+        self.file_path = file_path; self.snapshot = snapshot; self.delay = delay; self._written = written
+        self._lock = threading.Lock(); self._wake = threading.Condition(self._lock); self._write_lock = threading.Lock()
+        self._dirty = False; self._extra = {}; self._deadline = None; self._thread = None; self._closed = False
+        self.requests = 0; self.writes = 0; self.skipped = 0; self.last_changed = []
+        self.on_log = logging.info; self.on_error = lambda e: logging.error(f"Ayarları dosyaya kaydetme hatası: {e}")
+
+    def mark_dirty(self, extra=None):
+        # extra: anlık görüntüye eklenecek, çağıranın sahip olduğu alanlar (ör. GUI'deki PLC adresi); son değer geçerlidir
+        with self._lock:
+            if self._closed: return
+            self._dirty = True; self.requests += 1; self._extra.update(extra or {}); self._deadline = time.monotonic() + self.delay
+            if self._thread is None: self._thread = threading.Thread(target=self._run, name="ConfigWriter", daemon=True); self._thread.start()
+            self._wake.notify()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                while not self._closed and (self._deadline is None or self._deadline > time.monotonic()):
+                    self._wake.wait(None if self._deadline is None else self._deadline - time.monotonic())
+                if self._closed: return
+                self._deadline = None
+            self.flush()
+
+    def flush(self):
+        with self._write_lock:
+            with self._lock:
+                if not self._dirty: return False
+                self._dirty = False; self._deadline = None; extra = dict(self._extra)
+            try:
+                data = self.snapshot(); data.update(extra); written = self._written or {}
+                changed = [key for key in data if key not in written or data[key] != written[key]] + [key for key in written if key not in data]
+                if not changed: self.skipped += 1; return False
+                atomic_write_json(self.file_path, data); self._written = data; self.writes += 1; self.last_changed = changed
+                self.on_log(f"Ayarlar {os.path.basename(self.file_path)} dosyasına kaydedildi ({', '.join(changed)}).")
+                return True
+            except Exception as e:
+                with self._lock: self._dirty = True
+                self.on_error(e); return False
+
+    def close(self):
+        # Bekleyen kayıt eşzamanlı yazılır ve arka plan iş parçacığı durdurulur; sonraki mark_dirty() çağrıları yok sayılır
+        with self._lock: self._closed = True; self._wake.notify(); thread = self._thread
+        if thread is not None: thread.join(timeout=5.0)
+        return self.flush()
+
+def settings_fingerprint(s):
+    # Denetleyiciyi belirleyen alanların kanonik özeti; vana min/max değerleri çıkarımı etkilemediği için dahil edilmez
+    valve_names = [valve['name'] for valve in s.get('valves', [])]; outputs = s.get('outputs', {})
+    canonical = {'universe_max': float(s.get('universe_max', 100)), 'engine': s.get('engine', 'mamdani'), 'valves': valve_names,
+                 'points': {n: [float(p) for p in pts] for n, pts in s['points'].items()},
+                 'outputs': {f"{e}_{d}": [float(outputs.get(f"{e}_{d}", {}).get(n, 0.0)) for n in valve_names] for e in ['NH', 'NL', 'Z', 'PL', 'PH'] for d in ['N', 'Z', 'P']}}
+    return hashlib.sha256(json.dumps(canonical, sort_keys=True, separators=(',', ':')).encode('utf-8')).hexdigest()
+
+class CompiledSurfaceCache:
+    # Derlenmiş kontrol yüzeyleri için LRU önbellek; directory verilirse girdiler .npz olarak diske de yazılır
+    def __init__(self, capacity=16, directory=None):
+        self.capacity = capacity; self.directory = directory; self._entries = OrderedDict()
+    def _path(self, key): return os.path.join(self.directory, f"{key}.npz")
+    def get(self, key):
+        if key in self._entries: self._entries.move_to_end(key); return self._entries[key]
+        if not self.directory or not os.path.exists(self._path(key)): return None
+        try:
+            with np.load(self._path(key), allow_pickle=False) as data: entry = {name: data[name] for name in data.files}
+            os.utime(self._path(key))
+        except Exception as e: logging.error(f"Yüzey önbelleği okunamadı ({key[:12]}): {e}"); return None
+        self._remember(key, entry); return entry
+    def put(self, key, entry):
+        self._remember(key, entry)
+        if not self.directory: return
+        try:
+            os.makedirs(self.directory, exist_ok=True); tmp_path = self._path(key) + ".tmp"
+            with open(tmp_path, 'wb') as f: np.savez(f, **entry)
+            os.replace(tmp_path, self._path(key))
+            files = sorted((os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith('.npz')), key=os.path.getmtime)
+            for old_path in files[:-self.capacity]: os.remove(old_path)
+        except Exception as e: logging.error(f"Yüzey önbelleği yazılamadı ({key[:12]}): {e}")
+    def _remember(self, key, entry):
+        for value in entry.values(): value.setflags(write=False)
+        self._entries[key] = entry; self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity: self._entries.popitem(last=False)
+
+def _trimf_at(x, a, b, c):
+    if x == b: return 1.0
+    if a < x < b: return (x - a) / (b - a)
+    if b < x < c: return (c - x) / (c - b)
+    return 0.0
+
+class TermIndex:
+    # Üçgen üyelik fonksiyonlarının köşelerinden kurulan kırılma noktası dizini. İki kırılma noktası arasında her terim doğrusal olduğundan
+    # her aralık için μ = eğim*x + kesişim tablosu önceden hesaplanır; sorgu tek bir searchsorted (O(log n)) ve bir satır okumasıdır.
+    # Girdi, çıkarımdaki gibi [lo, hi] evrenine kırpılır. Sonuç örneklenmiş değil, tam trimf değeridir.
+    def __init__(self, points, lo, hi):
+        self.names = list(points); self.lo = float(lo); self.hi = float(hi)
+        vertices = np.array([points[n] for n in self.names], dtype=float).reshape(-1, 3)
+        self.breakpoints = np.unique(np.clip(np.concatenate([vertices.ravel(), [self.lo, self.hi]]), self.lo, self.hi))
+        mids = (self.breakpoints[:-1] + self.breakpoints[1:]) / 2
+        # Satır k: [bp[k], bp[k+1]) aralığı; son satır x == hi içindir
+        self.slope = np.zeros((len(self.breakpoints), len(self.names))); self.intercept = np.zeros_like(self.slope)
+        for j, (a, b, c) in enumerate(vertices):
+            rising = (mids > a) & (mids < b); falling = (mids > b) & (mids < c)
+            if b > a: self.slope[:-1][rising, j] = 1.0 / (b - a); self.intercept[:-1][rising, j] = -a / (b - a)
+            if c > b: self.slope[:-1][falling, j] = -1.0 / (c - b); self.intercept[:-1][falling, j] = c / (c - b)
+            self.intercept[-1, j] = _trimf_at(self.hi, a, b, c)
+        # Skaler sorgular (her okuma) NumPy skaler maliyetinden kaçınmak için aynı tabloların liste kopyasını bisect ile kullanır
+        self._bp_list = self.breakpoints.tolist(); self._rows = [list(zip(a, b)) for a, b in zip(self.slope.tolist(), self.intercept.tolist())]
+
+    def degrees(self, x):
+        # Skaler için (terim sayısı,), dizi için (n, terim sayısı) üyelik dereceleri
+        x = np.clip(np.asarray(x, dtype=float), self.lo, self.hi); k = np.searchsorted(self.breakpoints, x, side='right') - 1
+        return self.slope[k] * x[..., None] + self.intercept[k]
+
+    def classify(self, x):
+        # (baskın terim, {terim: derece}); eşitlikte ilk terim (eski max() davranışı)
+        x = min(max(float(x), self.lo), self.hi); row = self._rows[bisect.bisect_right(self._bp_list, x) - 1]
+        mu = [a * x + b for a, b in row]
+        return self.names[mu.index(max(mu))], dict(zip(self.names, mu))
+
+class FuzzyPIDController:
+    BATCH_OUTPUT_RESOLUTION = 1001
+    # Derlenmiş yüzeyin ölçülen sapması bunu aşarsa (config: compiled_tolerance) tablo kullanılmaz, kesin çıkarıma dönülür.
+    # SURFACE_FORMAT önbellek anahtarına girer; tablo biçimi/ölçümü değişince eski önbellek kayıtları kullanılmaz.
+    COMPILED_TOLERANCE = 0.05; SURFACE_FORMAT = 3
+    # Mamdani sonuçları kural değerinin çevresinde ±CONSEQUENT_HALF_WIDTH genişliğinde dar üçgenlerdir (fiilen tekil değer)
+    CONSEQUENT_HALF_WIDTH = 0.01
+    def __init__(self, s, cache=None):
+        umax = s.get('universe_max', 100); p_conf = {n: list(pts) for n, pts in s['points'].items()}; valves_conf = s.get('valves', [])
+        p_conf['NH'][0] = -umax; p_conf['PH'][2] = umax
+        self.error_antecedent = ctrl.Antecedent(np.arange(-umax, umax + 0.5, 0.5), 'error'); [self.error_antecedent.__setitem__(n, fuzz.trimf(self.error_antecedent.universe, p)) for n, p in p_conf.items()]
+        self.term_index = TermIndex(p_conf, -umax, umax)
+        delta_umax = umax / 4; delta_error = ctrl.Antecedent(np.arange(-delta_umax, delta_umax + 0.1, 0.1), 'delta_error')
+        delta_error['N'] = fuzz.trimf(delta_error.universe, [-delta_umax, -delta_umax, 0]); delta_error['Z'] = fuzz.trimf(delta_error.universe, [-delta_umax * 0.2, 0, delta_umax * 0.2]); delta_error['P'] = fuzz.trimf(delta_error.universe, [0, delta_umax, delta_umax])
+        self.delta_antecedent = delta_error; output_values = s.get('outputs', {})
+        self.engine = s.get('engine', 'mamdani'); self.valve_names = [valve['name'] for valve in valves_conf]
+        self.cache = cache; self.fingerprint = settings_fingerprint(s)
+        self.consequents = {}; self._rules = []; self._simulation = None; self._universe_max = umax; self._points = {n: list(pts) for n, pts in s['points'].items()}
+        self.rule_values = np.array([[output_values.get(f"{e}_{d}", {}).get(n, 0.0) for n in self.valve_names] for e in ['NH', 'NL', 'Z', 'PL', 'PH'] for d in ['N', 'Z', 'P']], dtype=float)
+        # Sıfırıncı dereceden Sugeno: çıkış, kural değerlerinin ateşlenme ağırlıklı ortalamasıdır; sonuç evreni kurulmaz
+        if self.engine not in ('mamdani', 'sugeno'): raise ValueError(f"Bilinmeyen çıkarım motoru: {self.engine}")
+        if self.engine == 'mamdani':
+            for valve in valves_conf:
+                self.consequents[valve['name']] = ctrl.Consequent(np.arange(0, 1.01, 0.01), valve['name'])
+            rules = self._rules
+            for err_label in ['NH', 'NL', 'Z', 'PL', 'PH']:
+                for delta_label in ['N', 'Z', 'P']:
+                    key = f"{err_label}_{delta_label}"; rule_outputs = output_values.get(key, {})
+                    consequent_tuple = []
+                    for valve_name, consequent_obj in self.consequents.items():
+                        val = rule_outputs.get(valve_name, 0.0); consequent_obj[key] = fuzz.trimf(consequent_obj.universe, [val - self.CONSEQUENT_HALF_WIDTH, val, val + self.CONSEQUENT_HALF_WIDTH]); consequent_tuple.append(consequent_obj[key])
+                    if consequent_tuple: rule = ctrl.Rule(self.error_antecedent[err_label] & delta_error[delta_label], tuple(consequent_tuple)); rules.append(rule)
+        self._build_batch_engine()
+        # Derlenmiş mod: error x delta_error yüzeyi bir kez örneklenir, compute() bilineer enterpolasyonla cevaplar
+        self.surface = None; self.compiled_max_deviation = None
+        if s.get('compiled', False): self.compile_surface(s.get('compiled_resolution', 101), tolerance=s.get('compiled_tolerance', self.COMPILED_TOLERANCE))
+    @property
+    def simulation(self):
+        # ControlSystem kurulumu (networkx grafı) maliyetin neredeyse tamamıdır; yalnızca kesin skfuzzy sonucu gerektiğinde kurulur
+        if self._simulation is None and self._rules: self._simulation = ctrl.ControlSystemSimulation(ctrl.ControlSystem(self._rules))
+        return self._simulation
+    def update_settings(self, s):
+        # Ayar farkı yerinde uygulanır: yalnızca değişen üyelik dizileri ve kural çıkışları yeniden hesaplanır.
+        # Evren, motor, vana listesi veya terim adları değiştiyse tam yeniden kurulum yapılır. Yeniden kurulduysa True döner.
+        if (s.get('universe_max', 100) != self._universe_max or s.get('engine', 'mamdani') != self.engine
+                or [valve['name'] for valve in s.get('valves', [])] != self.valve_names or list(s['points']) != list(self._points)):
+            self.__dict__ = type(self)(s, cache=self.cache).__dict__; return True
+        umax = self._universe_max; output_values = s.get('outputs', {}); new_mfs = {}; new_rows = {}
+        # Önce tüm yeni diziler hesaplanır; geçersiz bir nokta (trimf hatası) denetleyiciyi yarım güncellenmiş bırakmaz
+        for n, pts in s['points'].items():
+            if list(pts) == self._points[n]: continue
+            p = list(pts)
+            if n == 'NH': p[0] = -umax
+            if n == 'PH': p[2] = umax
+            new_mfs[n] = fuzz.trimf(self.error_antecedent.universe, p)
+        for r, key in enumerate(self._rule_keys):
+            row = [output_values.get(key, {}).get(n, 0.0) for n in self.valve_names]
+            if not np.array_equal(row, self.rule_values[r]): new_rows[r] = row
+        if new_mfs:
+            p_conf = {n: list(pts) for n, pts in s['points'].items()}; p_conf['NH'][0] = -umax; p_conf['PH'][2] = umax
+            self.term_index = TermIndex(p_conf, -umax, umax)
+        e_terms = list(self.error_antecedent.terms.keys())
+        for n, mf in new_mfs.items(): self.error_antecedent[n].mf = mf; self._error_mfs[e_terms.index(n)] = mf
+        for r, row in new_rows.items():
+            self.rule_values[r] = row
+            for name, val in zip(self.valve_names, row):
+                if name in self.consequents: consequent_obj = self.consequents[name]; consequent_obj[self._rule_keys[r]].mf = fuzz.trimf(consequent_obj.universe, [val - self.CONSEQUENT_HALF_WIDTH, val, val + self.CONSEQUENT_HALF_WIDTH])
+        if new_rows and self.engine == 'mamdani':
+            for name in self.valve_names: self._build_consequent_slices(name)
+        # skfuzzy girdi->çıktı önbelleği eski fonksiyonlarla hesaplanmış sonuçları tutar
+        if self._simulation is not None and (new_mfs or new_rows): self._simulation.reset()
+        self._points = {n: list(pts) for n, pts in s['points'].items()}; self.fingerprint = settings_fingerprint(s)
+        if not s.get('compiled', False): self.surface = None; self.compiled_max_deviation = None
+        elif new_mfs or new_rows or self.surface is None or len(self.surface_error_axis) != max(2, int(s.get('compiled_resolution', 101))):
+            self.compile_surface(s.get('compiled_resolution', 101), tolerance=s.get('compiled_tolerance', self.COMPILED_TOLERANCE))
+        return False
+    def _build_batch_engine(self):
+        # compute_many için NumPy Mamdani motoru: aynı örneklenmiş üyelik fonksiyonları ve kural tablosu kullanılır
+        e_terms = list(self.error_antecedent.terms.keys()); d_terms = list(self.delta_antecedent.terms.keys())
+        self._error_mfs = np.array([self.error_antecedent[n].mf for n in e_terms]); self._delta_mfs = np.array([self.delta_antecedent[n].mf for n in d_terms])
+        self._rule_keys = [f"{e}_{d}" for e in ['NH', 'NL', 'Z', 'PL', 'PH'] for d in ['N', 'Z', 'P']] if self.valve_names else []
+        self._rule_error_idx = np.array([e_terms.index(k.split('_')[0]) for k in self._rule_keys], dtype=int)
+        self._rule_delta_idx = np.array([d_terms.index(k.split('_')[1]) for k in self._rule_keys], dtype=int)
+        if self.engine == 'sugeno': return
+        # Çıkış evreni 10 kat sıklaştırılır; skfuzzy'nin kesim noktalarıyla genişlettiği evrene yakın bir centroid verir
+        x = np.linspace(0.0, 1.0, self.BATCH_OUTPUT_RESOLUTION); h = np.diff(x)
+        self._out_universe = x; self._centroid_area_w = np.zeros_like(x); self._centroid_moment_w = np.zeros_like(x)
+        self._centroid_area_w[:-1] += h / 2; self._centroid_area_w[1:] += h / 2
+        self._centroid_moment_w[:-1] += h / 6 * (2 * x[:-1] + x[1:]); self._centroid_moment_w[1:] += h / 6 * (x[:-1] + 2 * x[1:])
+        self._consequent_slices = {}
+        for valve_name in self.consequents: self._build_consequent_slices(valve_name)
+    def _build_consequent_slices(self, valve_name):
+        # Dar üçgen sonuçlar evrenin küçük bir kısmını kaplar; her vana için yalnızca desteklenen sütunlar tutulur
+        consequent_obj = self.consequents[valve_name]; x = self._out_universe
+        mfs = [np.interp(x, consequent_obj.universe, consequent_obj[key].mf) for key in self._rule_keys]
+        cols = np.nonzero(np.any(mfs, axis=0))[0] if mfs else np.array([], dtype=int); slices = []
+        for mf in mfs:
+            nz = np.searchsorted(cols, np.nonzero(mf)[0])
+            slices.append((nz[0], nz[-1] + 1, mf[cols[nz[0]:nz[-1] + 1]]) if nz.size else (0, 0, mf[:0]))
+        self._consequent_slices[valve_name] = (cols, slices)
+    def compute_many(self, errors, delta_errors, chunk_size=4096):
+        errors = np.clip(np.asarray(errors, dtype=float).ravel(), self.error_antecedent.universe[0], self.error_antecedent.universe[-1])
+        delta_errors = np.clip(np.asarray(delta_errors, dtype=float).ravel(), self.delta_antecedent.universe[0], self.delta_antecedent.universe[-1])
+        names = self.valve_names; out = np.zeros((errors.size, len(names)))
+        if not names or errors.size == 0: return out
+        e_univ = self.error_antecedent.universe; d_univ = self.delta_antecedent.universe
+        for start in range(0, errors.size, chunk_size):
+            e = errors[start:start + chunk_size]; d = delta_errors[start:start + chunk_size]
+            mu_e = np.array([np.interp(e, e_univ, mf) for mf in self._error_mfs]); mu_d = np.array([np.interp(d, d_univ, mf) for mf in self._delta_mfs])
+            firing = np.minimum(mu_e[self._rule_error_idx], mu_d[self._rule_delta_idx])
+            if self.engine == 'sugeno':
+                # Her kural kendi ateşlenme gücüyle ağırlıklandırılır: sum(w_r * z_r) / sum(w_r); hiçbir kural ateşlenmezse 0.0
+                total = firing.sum(axis=0)[:, None]
+                out[start:start + e.size] = np.divide((self.rule_values.T @ firing).T, total, out=np.zeros((e.size, len(names))), where=total > 0)
+                continue
+            for col, name in enumerate(names):
+                cols, slices = self._consequent_slices[name]; aggregated = np.zeros((e.size, cols.size))
+                for r, (lo, hi, mf) in enumerate(slices):
+                    if hi > lo: np.maximum(aggregated[:, lo:hi], np.minimum(firing[r][:, None], mf), out=aggregated[:, lo:hi])
+                area = aggregated @ self._centroid_area_w[cols]; moment = aggregated @ self._centroid_moment_w[cols]
+                # Hiçbir kural ateşlenmezse compute() gibi 0.0 döndür
+                out[start:start + e.size, col] = np.divide(moment, area, out=np.zeros_like(area), where=area > 0)
+        return out
+    def evaluate_grid(self, resolution=101, delta_resolution=None):
+        # Tüm error x delta_error evreni tek bir compute_many çağrısıyla örneklenir: (error ekseni, delta ekseni, tablo[i, j, vana])
+        e_univ = self.error_antecedent.universe; d_univ = self.delta_antecedent.universe
+        error_axis = np.linspace(e_univ[0], e_univ[-1], max(2, int(resolution))); delta_axis = np.linspace(d_univ[0], d_univ[-1], max(2, int(delta_resolution or resolution)))
+        ee, dd = np.meshgrid(error_axis, delta_axis, indexing='ij')
+        return error_axis, delta_axis, self.compute_many(ee.ravel(), dd.ravel()).reshape(error_axis.size, delta_axis.size, len(self.valve_names))
+    def compile_surface(self, resolution=101, tolerance=COMPILED_TOLERANCE):
+        resolution = max(2, int(resolution)); names = self.valve_names; key = f"{self.fingerprint}_{resolution}_v{self.SURFACE_FORMAT}"
+        cached = self.cache.get(key) if self.cache is not None else None
+        if cached is not None:
+            self.surface_error_axis = cached['error_axis']; self.surface_delta_axis = cached['delta_axis']; self.surface = cached['surface']; self.surface_names = names
+            self.surface_exact = cached['exact_cells'].astype(bool); self.compiled_max_deviation = float(cached['max_deviation'])
+            logging.info(f"Kontrol yüzeyi önbellekten yüklendi ({resolution}x{resolution}). Maks. sapma: {self.compiled_max_deviation:.4f}")
+            return self._check_compiled_deviation(tolerance)
+        start = time.perf_counter()
+        self.surface_error_axis, self.surface_delta_axis, self.surface = self.evaluate_grid(resolution); self.surface_names = names
+        mid_e, mid_d, mid, bilinear = self._mark_exact_cells(self.COMPILED_TOLERANCE if tolerance is None else tolerance)
+        # Sapma tüm enterpolasyon ızgarasında, her hücrenin ortasında ölçülür: compute()'un orada vereceği değer (tablo hücresinde bilineer,
+        # yedek hücrede NumPy motoru compute_many) kesin sonuçla (_compute_exact_array; Mamdani'de skfuzzy) karşılaştırılır.
+        # Yedek hücrelerin sapması, tablonun kendisi gibi NumPy motorunun skfuzzy'den farkını da içerir.
+        exact = self._compute_exact_array(mid_e.ravel(), mid_d.ravel(), names).reshape(mid.shape)
+        answer = np.where(self.surface_exact[:, :, None], mid, bilinear)
+        self.compiled_max_deviation = float(np.max(np.abs(exact - answer))) if exact.size else 0.0
+        logging.info(f"Kontrol yüzeyi derlendi ({resolution}x{resolution}, {time.perf_counter() - start:.2f}sn). Maks. sapma: {self.compiled_max_deviation:.4f}")
+        if self.cache is not None: self.cache.put(key, {'error_axis': self.surface_error_axis, 'delta_axis': self.surface_delta_axis, 'surface': self.surface, 'max_deviation': np.array(self.compiled_max_deviation), 'exact_cells': self.surface_exact})
+        return self._check_compiled_deviation(tolerance)
+    def _mark_exact_cells(self, tolerance):
+        # Tablo yerine kesin çıkarımla (compute_many) cevaplanacak hücreler, surface_exact[i, j]:
+        #  - Hiçbir terimin ateşlenmediği evren düğümünde (NH/PH'nin evren ucundaki sıfırı, terimler arası boşluk, arange'in sınırı biraz aşan
+        #    son düğümü) çıkış 0'a sıçrar. Üyelikler evren düğümleri arasında doğrusal olduğundan boşluklar yalnızca böyle düğümlerde başlar;
+        #    bu düğümleri içeren satır/sütunlar işaretlenir.
+        #  - Toplam ateşlenme küçükken ağırlıklı ortalama kısa mesafede kural değerleri arasında kayar; her hücrenin ortası NumPy motoruyla
+        #    hesaplanır (tek compute_many çağrısı) ve bilineer değeri tolerance/2'den fazla sapan hücreler işaretlenir.
+        # Hücre ortaları, compute_many sonucu ve bilineer değerler sapma ölçümü için döner.
+        def dead_cells(universe, mfs, ax):
+            dead = universe[mfs.sum(axis=0) <= 0]
+            return np.array([bool(((dead >= lo) & (dead <= hi)).any()) for lo, hi in zip(ax[:-1], ax[1:])])
+        e_axis = self.surface_error_axis; d_axis = self.surface_delta_axis; t = self.surface
+        exact = dead_cells(self.error_antecedent.universe, self._error_mfs, e_axis)[:, None] | dead_cells(self.delta_antecedent.universe, self._delta_mfs, d_axis)[None, :]
+        mid_e, mid_d = np.meshgrid((e_axis[:-1] + e_axis[1:]) / 2, (d_axis[:-1] + d_axis[1:]) / 2, indexing='ij')
+        mid = self.compute_many(mid_e.ravel(), mid_d.ravel()).reshape(t[1:, 1:].shape)
+        bilinear = (t[:-1, :-1] + t[1:, :-1] + t[:-1, 1:] + t[1:, 1:]) / 4
+        if self.valve_names: exact |= (np.abs(mid - bilinear) > tolerance / 2).any(axis=2)
+        self.surface_exact = exact
+        return mid_e, mid_d, mid, bilinear
+    def _check_compiled_deviation(self, tolerance):
+        if tolerance is not None and self.compiled_max_deviation > tolerance:
+            logging.warning(f"Derlenmiş kontrol yüzeyi sapması {self.compiled_max_deviation:.4f} > {tolerance:.4f}; yüzey kullanılmıyor, kesin çıkarım yapılacak. compiled_resolution artırılabilir.")
+            self.surface = None
+        return self.compiled_max_deviation
+    def _compute_exact_array(self, errors, deltas, names):
+        # skfuzzy girişleri evren sınırlarına kırpar; ateşlenme kontrolü de aynı kırpılmış değerlerle yapılmalı
+        errors = np.clip(np.asarray(errors, dtype=float), self.error_antecedent.universe[0], self.error_antecedent.universe[-1])
+        deltas = np.clip(np.asarray(deltas, dtype=float), self.delta_antecedent.universe[0], self.delta_antecedent.universe[-1])
+        out = np.zeros((len(errors), len(names)))
+        if not names or len(errors) == 0: return out
+        if self.engine == 'sugeno': return self.compute_many(errors, deltas)
+        # Hiçbir kuralın ateşlenmediği noktada skfuzzy dizi hesabını toptan düşürür; compute() orada 0.0 döndürür
+        mu_e = np.array([fuzz.interp_membership(self.error_antecedent.universe, t.mf, errors) for t in self.error_antecedent.terms.values()])
+        mu_d = np.array([fuzz.interp_membership(self.delta_antecedent.universe, t.mf, deltas) for t in self.delta_antecedent.terms.values()])
+        fires = (np.minimum(mu_e[:, None, :], mu_d[None, :, :]) > 0).any(axis=(0, 1))
+        if not fires.any(): return out
+        # Ayrı bir simülasyon kullanılır; canlı simülasyonun skaler/önbellek durumu bozulmaz
+        sim = ctrl.ControlSystemSimulation(self.simulation.ctrl, cache=False)
+        sim.input['error'] = errors[fires]; sim.input['delta_error'] = deltas[fires]; sim.compute()
+        out[fires] = np.column_stack([np.asarray(sim.output[n], dtype=float).ravel() for n in names])
+        return out
+    def _interpolate_surface(self, current_error, delta_error_val):
+        e_axis = self.surface_error_axis; d_axis = self.surface_delta_axis
+        fx = (min(max(current_error, e_axis[0]), e_axis[-1]) - e_axis[0]) / (e_axis[1] - e_axis[0])
+        fy = (min(max(delta_error_val, d_axis[0]), d_axis[-1]) - d_axis[0]) / (d_axis[1] - d_axis[0])
+        i = min(int(fx), len(e_axis) - 2); j = min(int(fy), len(d_axis) - 2); tx = fx - i; ty = fy - j
+        if self.surface_exact[i, j]: return self.compute_many([current_error], [delta_error_val])[0]
+        t = self.surface
+        return (t[i, j] * (1 - tx) + t[i + 1, j] * tx) * (1 - ty) + (t[i, j + 1] * (1 - tx) + t[i + 1, j + 1] * tx) * ty
+    def compute(self, current_error, delta_error_val):
+        if self.surface is not None:
+            values = self._interpolate_surface(float(current_error), float(delta_error_val))
+            return {name: float(v) for name, v in zip(self.surface_names, values)}
+        if self.engine == 'sugeno': return dict(zip(self.valve_names, self.compute_many([current_error], [delta_error_val])[0].tolist()))
+        try: self.simulation.input['error'] = current_error; self.simulation.input['delta_error'] = delta_error_val; self.simulation.compute(); return self.simulation.output
+        except Exception as ex: logging.error(f"Hesaplama hatası: {ex}"); return {name: 0.0 for name in self.valve_names}
+    def max_deviation_from(self, other, resolution=51):
+        # İki denetleyicinin kesin çıkışları arasındaki en büyük fark (ör. Sugeno ile Mamdani), resolution x resolution ızgaranın hücre ortalarında
+        e_univ = self.error_antecedent.universe; d_univ = self.delta_antecedent.universe
+        e_axis = np.linspace(e_univ[0], e_univ[-1], max(2, int(resolution))); d_axis = np.linspace(d_univ[0], d_univ[-1], max(2, int(resolution)))
+        ee, dd = np.meshgrid((e_axis[:-1] + e_axis[1:]) / 2, (d_axis[:-1] + d_axis[1:]) / 2, indexing='ij'); errors = ee.ravel(); deltas = dd.ravel()
+        ours = self._compute_exact_array(errors, deltas, self.valve_names); theirs = other._compute_exact_array(errors, deltas, self.valve_names)
+        return float(np.max(np.abs(ours - theirs))) if ours.size else 0.0
+
+class ControllerPool:
+    # Aynı denetleyiciyi üreten ayarlara (settings_fingerprint + derleme seçenekleri) sahip döngüler tek bir FuzzyPIDController'ı paylaşır.
+    # Paylaşılan denetleyici yerinde güncellenmez: ayarı değişen döngü eskisini bırakır, yeni anahtarın denetleyicisini alır (yazarken kopyala).
+    # compute() durum taşıyabildiği için (skfuzzy simülasyonu) paylaşan döngüler aynı zamanlayıcı iş parçacığında koşmalıdır.
+    def __init__(self, cache=None):
+        self.cache = cache; self._entries = {}; self._lock = threading.Lock(); self.builds = 0
+
+    @staticmethod
+    def key(s): return f"{settings_fingerprint(s)}_{bool(s.get('compiled', False))}_{int(s.get('compiled_resolution', 101))}_{s.get('compiled_tolerance', FuzzyPIDController.COMPILED_TOLERANCE)}"
+
+    def acquire(self, s, current=None):
+        # current aynı anahtardaysa olduğu gibi döner; değilse bırakılır ve s için (varsa paylaşılan) denetleyici verilir
+        key = self.key(s)
+        with self._lock:
+            if current is not None and getattr(current, 'pool_key', None) == key: return current
+            self._release(current); entry = self._entries.get(key)
+            if entry is None:
+                controller = FuzzyPIDController(copy.deepcopy(s), cache=self.cache); controller.pool_key = key
+                entry = self._entries[key] = [controller, 0]; self.builds += 1
+            entry[1] += 1
+            return entry[0]
+
+    def release(self, controller):
+        with self._lock: self._release(controller)
+
+    def _release(self, controller):
+        entry = self._entries.get(getattr(controller, 'pool_key', None))
+        if entry is None or entry[0] is not controller: return
+        entry[1] -= 1
+        if entry[1] <= 0: del self._entries[controller.pool_key]
+
+    def stats(self):
+        with self._lock: return {'controllers': len(self._entries), 'users': sum(entry[1] for entry in self._entries.values()), 'builds': self.builds}
+
+class PLCManager:
+    def __init__(self): self._client=None; self.is_connected=False
+    @property
+    def client(self):
+        if self._client is None: self._client = snap7_client.Client()
+        return self._client
+    @client.setter
+    def client(self, client): self._client = client
+    def connect(self,ip,r,s):
+        try: self.client.connect(ip,r,s); self.is_connected = self.client.get_connected()
+        except Exception as e: self.is_connected=False; logging.error(f"PLC hata: {e}"); return False, f"Hata: {e}"
+        return (True, "Başarılı.") if self.is_connected else (False, "Bağlantı kurulamadı.")
+    def disconnect(self):
+        if self.is_connected: self.client.disconnect(); self.is_connected=False; logging.info("PLC bağlantısı kesildi.")
+    def read_real(self,d,o):
+        try: return snap7_util.get_real(self.client.db_read(d,o,4),0)
+        except Exception as e: logging.error(f"Okuma hatası (DB{d},Off{o}): {e}"); raise
+    def write_real(self,d,o,v):
+        try: data=bytearray(4); snap7_util.set_real(data,0,v); self.client.db_write(d,o,data)
+        except Exception as e: logging.error(f"Yazma hatası (DB{d},Off{o}): {e}"); raise
+    @staticmethod
+    def _coalesce(tags, max_gap):
+        # Aynı DB'deki adresler, aralarındaki boşluk max_gap baytı geçmiyorsa tek bir [başlangıç, bitiş) aralığında birleştirilir
+        spans = []
+        for i, (d, o) in sorted(enumerate(tags), key=lambda item: item[1]):
+            if spans and spans[-1][0] == d and o <= spans[-1][2] + max_gap: spans[-1][2] = max(spans[-1][2], o + 4); spans[-1][3].append((i, o))
+            else: spans.append([d, o, o + 4, [(i, o)]])
+        return spans
+    def read_reals(self, tags, max_gap=32):
+        # tags: [(db, offset), ...] -> aynı sırada REAL değerler; her aralık tek bir db_read ile okunur ve tek tamponda çözülür
+        values = [0.0] * len(tags)
+        for d, start, end, members in self._coalesce(tags, max_gap):
+            try: data = self.client.db_read(d, start, end - start)
+            except Exception as e: logging.error(f"Okuma hatası (DB{d},Off{start}-{end}): {e}"); raise
+            for i, o in members: values[i] = snap7_util.get_real(data, o - start)
+        return values
+    def write_reals(self, items):
+        # items: [(db, offset, value), ...]; yalnızca bitişik adresler birleştirilir, böylece aradaki baytların üzerine yazılmaz
+        for d, start, end, members in self._coalesce([(d, o) for d, o, _ in items], 0):
+            data = bytearray(end - start)
+            for i, o in members: snap7_util.set_real(data, o - start, items[i][2])
+            try: self.client.db_write(d, start, data)
+            except Exception as e: logging.error(f"Yazma hatası (DB{d},Off{start}-{end}): {e}"); raise
+
+class OutputWriter:
+    # İstisna ile raporlama: her etiketin (db, offset) son yazılan değeri ve zamanı tutulur; öncekinden tolerans kadar sapmayan değer yazılmaz.
+    # Bekçi: refresh_interval saniyedir yazılmamış etiket değeri aynı olsa da yeniden yazılır (PLC/HMI tarafında ezilen değer geri gelir).
+    # refresh_interval <= 0 her döngüde yazar. Yazma hatasında ilgili etiketler unutulur; bir sonraki döngü onları koşulsuz yazar.
+    def __init__(self): self.last = {}; self.reset_stats()
+
+    def reset_stats(self): self.requests = 0; self.issued = 0; self.suppressed = 0; self.refreshed = 0
+
+    def invalidate(self): self.last.clear()
+
+    def write(self, plc_manager, items, now, tolerance=0.0, refresh_interval=5.0):
+        # items: [(db, offset, value), ...] -> yazılan etiket sayısı
+        # Sayaçlar yalnızca yazma başarılı olunca artar; başarısız yazma trafiği istatistiğe girmez
+        due = []; refreshed = 0; suppressed = 0
+        for d, o, v in items:
+            prev = self.last.get((d, o))
+            if prev is None or abs(v - prev[0]) > tolerance: due.append((d, o, v))
+            elif now - prev[1] >= refresh_interval: due.append((d, o, v)); refreshed += 1
+            else: suppressed += 1
+        if due:
+            try: plc_manager.write_reals(due)
+            except Exception:
+                for d, o, _ in due: self.last.pop((d, o), None)
+                raise
+            for d, o, v in due: self.last[(d, o)] = (v, now)
+            self.requests += 1; self.issued += len(due); self.refreshed += refreshed
+        self.suppressed += suppressed
+        return len(due)
+
+    def stats(self):
+        total = self.issued + self.suppressed
+        return {'requests': self.requests, 'issued': self.issued, 'suppressed': self.suppressed, 'refreshed': self.refreshed,
+                'suppressed_ratio': round(self.suppressed / total, 4) if total else 0.0}
+
+    def format_stats(self):
+        st = self.stats()
+        return f"Vana yazmaları: yazılan {st['issued']} ({st['requests']} istek), bastırılan {st['suppressed']} (%{st['suppressed_ratio'] * 100:.1f}), bekçi yenilemesi {st['refreshed']}"
+
+class CycleTimings:
+    # Aşama bazlı süre ölçümü: her aşamanın son `window` örneği sabit boyutlu NumPy halka tamponunda tutulur,
+    # yüzdelikler (p50/p95/p99) yalnızca özet istendiğinde hesaplanır. Kayıt maliyeti bir kilit ve bir dizi atamasıdır.
+    HISTOGRAM_EDGES_MS = [0, 0.1, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, float('inf')]
+
+    def __init__(self, window=1024):
+        self.window = window; self._lock = threading.Lock(); self._samples = {}; self.deadline_misses = {}; self.started_at = time.time()
+
+    def record(self, stage, seconds):
+        with self._lock:
+            buf = self._samples.get(stage)
+            if buf is None: buf = self._samples[stage] = [np.zeros(self.window), 0, 0.0]
+            buf[0][buf[1] % self.window] = seconds; buf[1] += 1
+            if seconds > buf[2]: buf[2] = seconds
+
+    def miss(self, task):
+        with self._lock: self.deadline_misses[task] = self.deadline_misses.get(task, 0) + 1
+
+    def reset(self):
+        with self._lock: self._samples.clear(); self.deadline_misses.clear(); self.started_at = time.time()
+
+    def summary(self, histogram=False):
+        with self._lock:
+            data = {stage: (buf[0][:min(buf[1], self.window)].copy(), buf[1], buf[2]) for stage, buf in self._samples.items()}
+            misses = dict(self.deadline_misses)
+        stages = {}
+        for stage, (samples, count, peak) in data.items():
+            samples_ms = samples * 1000.0; p50, p95, p99 = np.percentile(samples_ms, [50, 95, 99])
+            stages[stage] = {'count': count, 'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99), 'max_ms': peak * 1000.0}
+            if histogram: stages[stage]['histogram'] = np.histogram(samples_ms, bins=self.HISTOGRAM_EDGES_MS)[0].tolist()
+        return {'window': self.window, 'since': datetime.fromtimestamp(self.started_at).isoformat(timespec='seconds'), 'stages': stages, 'deadline_misses': misses}
+
+    def format_report(self):
+        summary = self.summary()
+        lines = [f"{'Aşama':<18}{'Adet':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}"]
+        for stage in sorted(summary['stages']):
+            st = summary['stages'][stage]
+            lines.append(f"{stage:<18}{st['count']:>8}{st['p50_ms']:>10.3f}{st['p95_ms']:>10.3f}{st['p99_ms']:>10.3f}{st['max_ms']:>10.3f}")
+        lines.append(""); lines.append("Kaçırılan son tarihler: " + (", ".join(f"{task}={count}" for task, count in sorted(summary['deadline_misses'].items())) or "0"))
+        lines.append(f"Pencere: son {summary['window']} örnek, başlangıç {summary['since']}")
+        return "\n".join(lines)
+
+    def dump(self, file_path, extra=None):
+        summary = self.summary(histogram=True); summary['histogram_edges_ms'] = [e if e != float('inf') else None for e in self.HISTOGRAM_EDGES_MS]
+        summary['dumped_at'] = datetime.now().isoformat(timespec='seconds'); summary.update(extra or {})
+        with open(file_path, 'w') as f: json.dump(summary, f, indent=4)
+
+class CycleScheduler:
+    # Periyodik görevleri GUI'den bağımsız bir iş parçacığında monotonik saate göre (deadline) çalıştırır.
+    # Bir görev bir sonraki periyodu aşarsa gecikme sayılır; kaçırılan periyotlar biriktirilmeden atlanır, faz korunur.
+    # Sıradaki görev (deadline, kayıt sırası) anahtarlı bir yığından alınır; çok döngülü süpervizörde yüzlerce görevle de O(log n).
+    # Kaldırılan veya yeniden kurulan görevlerin eski yığın girdileri çekilirken atlanır.
+    def __init__(self, on_error=None, on_overrun=None, timings=None):
+        self._tasks = {}; self._heap = []; self._order = itertools.count(); self._lock = threading.Lock(); self._wake = threading.Event(); self._stop = threading.Event(); self._thread = None
+        self.on_error = on_error; self.on_overrun = on_overrun; self.overruns = {}; self.timings = timings
+
+    def set_task(self, name, period, func, start_delay=0.0):
+        with self._lock:
+            task = [float(period), time.monotonic() + start_delay, func, next(self._order)]; self._tasks[name] = task; self.overruns.setdefault(name, 0)
+            heapq.heappush(self._heap, (task[1], task[3], name, task))
+        self._wake.set()
+
+    def remove_task(self, name):
+        with self._lock: self._tasks.pop(name, None)
+        self._wake.set()
+
+    def set_period(self, name, period):
+        # Yeni periyot bir sonraki son tarihten itibaren geçerlidir; görev kendi içinden çağırarak bir sonraki aralığı seçebilir
+        with self._lock:
+            task = self._tasks.get(name)
+            if task is not None: task[0] = float(period)
+
+    def has_task(self, name):
+        with self._lock: return name in self._tasks
+
+    @property
+    def is_running(self): return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running: return
+        self._stop = threading.Event(); self._thread = threading.Thread(target=self._run, args=(self._stop,), name="FuzzyControlScheduler", daemon=True); self._thread.start()
+
+    def stop(self):
+        self._stop.set(); self._wake.set()
+        with self._lock: self._tasks.clear(); self._heap.clear()
+        if self._thread is not None and self._thread is not threading.current_thread(): self._thread.join()
+        self._thread = None
+
+    def _run(self, stop):
+        heap = self._heap
+        while not stop.is_set():
+            with self._lock:
+                while heap and (self._tasks.get(heap[0][2]) is not heap[0][3] or heap[0][3][1] != heap[0][0]): heapq.heappop(heap)
+                _, _, name, task = heap[0] if heap else (None, None, None, None)
+            if task is None:
+                self._wake.wait(); self._wake.clear(); continue
+            delay = task[1] - time.monotonic()
+            if delay > 0:
+                if self._wake.wait(delay): self._wake.clear()
+                continue
+            period, deadline, func, order = task; started = time.monotonic()
+            try: func(period)
+            except Exception as e:
+                if self.on_error: self.on_error(name, e)
+            # Görev çağrı sırasında set_period ile periyodunu değiştirmiş olabilir
+            period = task[0]; next_deadline = deadline + period; now = time.monotonic()
+            if self.timings: self.timings.record(f"{name}_jitter", started - deadline); self.timings.record(f"{name}_total", now - started)
+            if now > next_deadline:
+                missed = int((now - deadline) // period)
+                self.overruns[name] = self.overruns.get(name, 0) + 1
+                if self.timings: self.timings.miss(name)
+                if self.on_overrun: self.on_overrun(name, now - next_deadline, missed)
+                next_deadline = deadline + (missed + 1) * period
+            with self._lock:
+                if self._tasks.get(name) is task: task[1] = next_deadline; heapq.heappush(heap, (next_deadline, order, name, task))
+
+class LogBuffer:
+    # Sınırlı, toplu log hattı. append() her iş parçacığından çağrılabilir; yalnızca (zaman, mesaj) çiftini halkaya ekler.
+    # Tüketici (ör. GUI zamanlayıcısı) drain() ile birikenleri tek seferde biçimlenmiş satırlar olarak alır; halka dolarsa en eski satırlar düşer.
+    # İsteğe bağlı dosya hedefi RotatingFileHandler'dır ve drain() sırasında toplu yazılır.
+    def __init__(self, max_lines=5000):
+        self._lock = threading.Lock(); self._pending = deque(maxlen=max(int(max_lines), 1)); self.total = 0; self.dropped = 0; self.file_handler = None
+
+    @property
+    def max_lines(self): return self._pending.maxlen
+
+    def set_max_lines(self, n):
+        with self._lock: self._pending = deque(self._pending, maxlen=max(int(n), 1))
+
+    def append(self, m):
+        with self._lock:
+            if len(self._pending) == self._pending.maxlen: self.dropped += 1
+            self._pending.append((time.time(), m)); self.total += 1
+
+    def drain(self):
+        with self._lock:
+            if not self._pending: return []
+            batch = list(self._pending); self._pending.clear()
+        if self.file_handler is not None:
+            try:
+                for created, m in batch: self.file_handler.emit(logging.makeLogRecord({'msg': m, 'created': created, 'msecs': (created % 1) * 1000, 'levelname': 'INFO', 'levelno': logging.INFO}))
+            except Exception as e: logging.error(f"Log dosyasına yazma hatası: {e}")
+        return [f"[{time.strftime('%H:%M:%S', time.localtime(created))}] {m}" for created, m in batch]
+
+    def set_file_sink(self, file_path, max_bytes=5 * 1024 * 1024, backup_count=3):
+        # file_path None ise dosya hedefi kapatılır
+        self.close_file_sink()
+        if file_path:
+            handler = logging.handlers.RotatingFileHandler(file_path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+            handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s')); self.file_handler = handler
+
+    def close_file_sink(self):
+        if self.file_handler is not None: self.file_handler.close(); self.file_handler = None
+
+ADAPTATION_MODES = ["IDLE", "STABLE", "SETTLE", "DISTURBANCE_WAIT", "POST_DISTURBANCE_OBSERVE", "AGGRESSIVE_CORRECTION", "PRECISION_OBSERVE", "FINE_TUNE", "STABLE_LOCKED"]
+MODE_INDEX = {name: i for i, name in enumerate(ADAPTATION_MODES)}
+
+class TrendRecorder:
+    # Önceden ayrılmış NumPy halka tamponu: her kontrol döngüsü zaman, SP, PV, hata, dE, adaptasyon modu ve tüm vana çıkışlarını tek satır yazar.
+    # Bellek yalnızca capacity ve vana sayısıyla belirlenir (172800 satır = 0.5 sn'de 24 saat, iki vanayla ~6 MB); çalışma süresiyle büyümez.
+    FIELDS = ('set_level', 'actual_level', 'error', 'delta_error')
+
+    def __init__(self, capacity=172800, valve_names=()):
+        self._lock = threading.Lock(); self._allocate(capacity, valve_names)
+
+    def _allocate(self, capacity, valve_names):
+        self.capacity = max(int(capacity), 2); self.valve_names = tuple(valve_names); self.head = 0; self.count = 0
+        self.t = np.full(self.capacity, np.nan); self.values = np.full((self.capacity, len(self.FIELDS)), np.nan, dtype=np.float32)
+        self.mode = np.full(self.capacity, -1, dtype=np.int8); self.outputs = np.full((self.capacity, len(self.valve_names)), np.nan, dtype=np.float32)
+
+    def _order(self): return (self.head - self.count + np.arange(self.count)) % self.capacity
+
+    def _set_valves(self, valve_names):
+        # Vana listesi değişince çıkış sütunları yeniden ayrılır; aynı adlı vanaların geçmişi korunur, yeniler NaN ile başlar
+        outputs = np.full((self.capacity, len(valve_names)), np.nan, dtype=np.float32)
+        for j, name in enumerate(valve_names):
+            if name in self.valve_names: outputs[:, j] = self.outputs[:, self.valve_names.index(name)]
+        self.outputs = outputs; self.valve_names = tuple(valve_names)
+
+    def record(self, t, set_level, actual_level, error, delta_error, mode, outputs):
+        with self._lock:
+            if tuple(outputs) != self.valve_names: self._set_valves(tuple(outputs))
+            i = self.head; self.t[i] = t; self.values[i] = (set_level, actual_level, error, delta_error); self.mode[i] = MODE_INDEX.get(mode, -1)
+            self.outputs[i] = list(outputs.values())
+            self.head = (i + 1) % self.capacity; self.count = min(self.count + 1, self.capacity)
+
+    def resize(self, capacity):
+        # En yeni min(count, capacity) satır korunur
+        with self._lock:
+            if max(int(capacity), 2) == self.capacity: return
+            order = self._order(); t, values, mode, outputs, names = self.t[order], self.values[order], self.mode[order], self.outputs[order], self.valve_names
+            self._allocate(capacity, names); n = min(len(order), self.capacity)
+            if n: self.t[:n] = t[-n:]; self.values[:n] = values[-n:]; self.mode[:n] = mode[-n:]; self.outputs[:n] = outputs[-n:]
+            self.count = n; self.head = n % self.capacity
+
+    def clear(self):
+        with self._lock: self._allocate(self.capacity, self.valve_names)
+
+    def window(self, seconds=None):
+        # Son `seconds` saniyelik kayıtlar zaman sırasıyla, kopya olarak döner
+        with self._lock:
+            order = self._order(); t = self.t[order]
+            if seconds is not None and len(t): first = int(np.searchsorted(t, t[-1] - seconds)); order = order[first:]; t = t[first:]
+            data = {'t': t, 'mode': self.mode[order], 'outputs': self.outputs[order], 'valve_names': self.valve_names}
+            values = self.values[order]
+        for j, field in enumerate(self.FIELDS): data[field] = values[:, j]
+        return data
+
+def minmax_decimate(x, y, buckets):
+    # Uzun pencerelerde nokta sayısını ~2*buckets'a indirir: her kovadan en küçük ve en büyük örnek zaman sırasıyla alınır,
+    # böylece tepe/dip değerleri ve ani sıçramalar ekranda kaybolmaz. Kovaya sığmayan son örnekler olduğu gibi eklenir.
+    n = len(y); buckets = max(int(buckets), 1)
+    if n <= 2 * buckets: return x, y
+    k = int(np.ceil(n / buckets)); m = (n // k) * k
+    yb = y[:m].reshape(-1, k); xb = x[:m].reshape(-1, k); nan = np.isnan(yb)
+    imin = np.where(nan, np.inf, yb).argmin(axis=1); imax = np.where(nan, -np.inf, yb).argmax(axis=1)
+    idx = np.stack([np.minimum(imin, imax), np.maximum(imin, imax)], axis=1); rows = np.arange(len(yb))[:, None]
+    return np.concatenate([xb[rows, idx].ravel(), x[m:]]), np.concatenate([yb[rows, idx].ravel(), y[m:]])
+
+class RollingStats:
+    # Son `window` örneğin ortalama, varyans, eğim (örnek başına, en küçük kareler) ve min/maks değerleri. Örnekler önceden ayrılmış sabit
+    # bir halka dizisinde tutulur; toplamlar kayan olarak güncellendiği için push O(1)'dir (min/maks monoton kuyruklarla amortize O(1)).
+    # Kayan toplamlarda biriken yuvarlama hatası her `window` örnekte bir tampondan yeniden toplanarak silinir.
+    def __init__(self, window=20): self.resize(window)
+
+    def resize(self, window): self.window = max(int(window), 2); self.clear()
+
+    def clear(self):
+        self.buf = [0.0] * self.window; self.head = 0; self.count = 0; self.pushed = 0
+        self.sum = 0.0; self.sumsq = 0.0; self.sumky = 0.0; self._min = deque(); self._max = deque()
+
+    @property
+    def full(self): return self.count == self.window
+
+    def push(self, y):
+        y = float(y); w = self.window; n = self.pushed
+        if self.count == w:
+            old = self.buf[self.head]; self.sumky -= self.sum - old; self.sum -= old; self.sumsq -= old * old # kalan örnekler bir konum kayar
+        else: self.count += 1
+        self.sumky += (self.count - 1) * y; self.sum += y; self.sumsq += y * y
+        self.buf[self.head] = y; self.head = (self.head + 1) % w; self.pushed = n + 1
+        while self._min and self._min[-1][1] >= y: self._min.pop()
+        while self._max and self._max[-1][1] <= y: self._max.pop()
+        self._min.append((n, y)); self._max.append((n, y))
+        if self._min[0][0] <= n - w: self._min.popleft()
+        if self._max[0][0] <= n - w: self._max.popleft()
+        if self.pushed % w == 0: self._resum()
+
+    def _resum(self):
+        values = self.buf[self.head:] + self.buf[:self.head] if self.full else self.buf[:self.count]
+        self.sum = math.fsum(values); self.sumsq = math.fsum(v * v for v in values); self.sumky = math.fsum(k * v for k, v in enumerate(values))
+
+    def mean(self): return self.sum / self.count if self.count else 0.0
+
+    def variance(self):
+        if not self.count: return 0.0
+        mean = self.sum / self.count; return max(self.sumsq / self.count - mean * mean, 0.0)
+
+    def std(self): return math.sqrt(self.variance())
+
+    def slope(self):
+        c = self.count
+        if c < 2: return 0.0
+        sx = c * (c - 1) / 2; return (c * self.sumky - sx * self.sum) / (c * c * (c * c - 1) / 12)
+
+    def min(self): return self._min[0][1] if self.count else float('nan')
+
+    def max(self): return self._max[0][1] if self.count else float('nan')
+
+DEFAULT_ENGINE_PARAMS = {
+    'learning_enabled': True, 'disturbance_threshold': 0.1, 'disturbance_delay': 5.0, 'fine_tune_interval': 10.0, 'fine_tune_aggressiveness': 0.1,
+    'precision_threshold': 0.05, 'precision_aggressiveness': 0.01, 'drift_threshold': 0.02, 'db': 1, 'set_level_addr': 0, 'levelmeter_addr': 8,
+    'opt_min': 0.0, 'opt_max': 5.0, 'opt_set': 3.3, 'read_period': 1.0, 'control_period': 0.5, 'trend_capacity': 172800,
+    'stability_window': 20, 'stability_threshold': 0.003, 'observe_min_time': 10.0, 'observe_max_time': 40.0, 'settle_stability_threshold': 0.0, 'trend_window': 2,
+    'adaptive_rate': False, 'control_period_min': 0.25, 'control_period_max': 1.0, 'rate_error_band': 0.01, 'write_tolerance': 0.0, 'write_refresh_interval': 5.0,
+    'control_period_locked': 2.0, 'locked_error_band': 0.03, 'locked_trim': 0.2,
+}
+# Uyarlamalı döngü hızı: bu modlarda en kısa periyot, kararlı modlarda hata küçüldükçe en uzun periyoda doğru; diğerleri temel periyotta kalır
+FAST_RATE_MODES = ("DISTURBANCE_WAIT", "AGGRESSIVE_CORRECTION"); SLOW_RATE_MODES = ("STABLE", "STABLE_LOCKED")
+
+# "Fabrika" ayarının oranları: Z yarı genişliği toplam aralığın, L tepe/bitiş ve H başlangıcı en büyük hatanın kesirleridir.
+# config'de 'opt_ratios' / 'opt_rules' ile ezilebilir (ör. tuner.py çıktısı); eksik anahtarlar bu varsayılanlardan alınır.
+DEFAULT_OPT_RATIOS = {'z_width': 0.05, 'l_peak': 0.4, 'l_end': 0.8, 'h_start': 0.7}
+# opt_aggr / opt_prec için geçerli aralık: grafik ayar penceresinin kutuları ve otomatik ayarın arama sınırları aynı aralığı kullanır
+OPT_AGGR_RANGE = (0.5, 10.0); OPT_PREC_RANGE = (0.5, 10.0)
+DEFAULT_OPT_RULES = {
+    'PH_P':{'fill':1.0,'drain':0},'PH_Z':{'fill':0.9,'drain':0},'PH_N':{'fill':0.7,'drain':0},
+    'PL_P':{'fill':0.6,'drain':0},'PL_Z':{'fill':0.3,'drain':0},'PL_N':{'fill':0.1,'drain':0},
+    'Z_P':{'fill':0.15,'drain':0},'Z_Z':{'fill':0,'drain':0},'Z_N':{'fill':0,'drain':0.15},
+    'NL_P':{'fill':0,'drain':0.1},'NL_Z':{'fill':0,'drain':0.3},'NL_N':{'fill':0,'drain':0.6},
+    'NH_P':{'fill':0,'drain':0.7},'NH_Z':{'fill':0,'drain':0.9},'NH_N':{'fill':1.0,'drain':1.0},
+}
+
+def optimized_default_settings(fuzzy_settings, min_l, max_l, set_l):
+    # Seviye aralığı ve set değerinden "fabrika" giriş noktalarını ve kural tablosunu hesaplar (GUI'den bağımsız)
+    agg_factor = fuzzy_settings.get('opt_aggr', 4.0); prec_factor = fuzzy_settings.get('opt_prec', 2.0)
+    ratios = dict(DEFAULT_OPT_RATIOS); ratios.update(fuzzy_settings.get('opt_ratios') or {})
+    agg_multiplier = 1.0 / agg_factor; prec_multiplier = 1.0 / prec_factor
+    total_range = max_l - min_l if max_l > min_l else 1
+    max_pos_error = set_l - min_l; max_neg_error = set_l - max_l
+    z_width = (total_range * ratios['z_width']) * prec_multiplier
+    pl_peak = (max_pos_error * ratios['l_peak']) * agg_multiplier; pl_end = (max_pos_error * ratios['l_end']) * agg_multiplier
+    ph_start = (max_pos_error * ratios['h_start']) * agg_multiplier; nl_peak = (max_neg_error * ratios['l_peak']) * agg_multiplier
+    nl_end = (max_neg_error * ratios['l_end']) * agg_multiplier; nh_start = (max_neg_error * ratios['h_start']) * agg_multiplier
+    pl_peak = max(pl_peak, z_width + 0.01); nl_peak = min(nl_peak, -z_width - 0.01)
+    new_points = {
+        'Z': [-z_width, 0, z_width], 'PL': [z_width, pl_peak, pl_end], 'PH': [ph_start, max_pos_error, max_pos_error],
+        'NL': [nl_end, nl_peak, -z_width], 'NH': [max_neg_error, max_neg_error, nh_start]
+    }
+    valves = fuzzy_settings.get('valves', []); fill_valve = valves[0]['name'] if len(valves) > 0 else None; drain_valve = valves[1]['name'] if len(valves) > 1 else None
+    raw_rules = dict(DEFAULT_OPT_RULES); raw_rules.update(fuzzy_settings.get('opt_rules') or {})
+    optimized_rules = {}
+    for key, vals in raw_rules.items():
+        rule_entry = {}
+        if fill_valve: rule_entry[fill_valve] = vals['fill']
+        if drain_valve: rule_entry[drain_valve] = vals['drain']
+        optimized_rules[key] = rule_entry
+    return new_points, optimized_rules
+
+class ControlEngine:
+    # GUI'siz kontrol çekirdeği: PLC okuma, bulanık çıkarım, adaptasyon durum makinesi ve vana yazma.
+    # Görevler CycleScheduler iş parçacığında koşar; tüm durum değişiklikleri self.lock altında yapılır.
+    # GUI (veya başka bir istemci) yalnızca on_log / on_snapshot / on_fault / on_settings_changed geri çağrılarını dinler.
+    # Durum makinesinin tüm zamanlayıcıları `clock` (saniye döndüren çağrılabilir) üzerinden okunur; tekrar oynatmada simüle saat verilir.
+    # log_level altındaki mesajlar on_log'a gitmez; döngü başına özet satırı DEBUG'dır ve kapalıyken hiç biçimlenmez.
+    # `decision_trace` bir liste olduğunda her kontrol döngüsü karar kaydını (mod, çıkışlar, kazançlar, döngüdeki olaylar) ona ekler.
+    INITIAL_SETTLING_TIMEOUT = 60
+
+    def __init__(self, plc_manager=None, params=None, cache=None, clock=time.time, scheduler=None, name=None, controller_pool=None):
+        self.plc_manager = plc_manager or PLCManager(); self.cache = cache; self.clock = clock; self.name = name; self.controller_pool = controller_pool
+        self.decision_trace = None; self._cycle_events = None; self.log_level = logging.DEBUG
+        self.params = dict(DEFAULT_ENGINE_PARAMS); self.params.update(params or {})
+        self.fuzzy_settings = {}; self.fuzzy_controller = None; self.best_fuzzy_points = None
+        self.lock = threading.RLock()
+        # Arka planda kurulan denetleyici: en son istek (_build_request) kurulur, hazır olan (_pending_controller) döngü sınırında geçilir.
+        # Her eşzamanlı ayar uygulaması ve her istek _settings_generation'ı artırır; eskimiş bir kurulum sonucu hiç geçilmez.
+        self._build_lock = threading.Lock(); self._build_request = None; self._build_thread = None; self._pending_controller = None
+        # Gönderilmiş ama henüz geçilmemiş en son ayar (s, best_points, generation): eşzamanlı bir uygulama (ör. fabrika ayarına dönüş) onu kaybetmez
+        self._submitted_settings = None
+        self._settings_generation = 0; self.controller_swaps = 0
+        self.timings = CycleTimings(); self.trend = TrendRecorder(self.params['trend_capacity']); self.output_writer = OutputWriter()
+        # Her kontrol döngüsünde hatayla beslenir: error_stats gözlem/oturma kararlılığı, trend_stats ince ayar eğilimi için
+        self.error_stats = RollingStats(self.params['stability_window']); self.trend_stats = RollingStats(self.params['trend_window'])
+        # Uyarlamalı hız (adaptive_rate, kontrol başlarken okunur): ölçüm kontrol döngüsünde okunur ve sonraki periyot moda/hataya göre seçilir
+        self.reads_inline = False; self._read_task_paused = False; self.control_period_now = self.params['control_period']; self.control_period_next = None; self._last_dt = None; self._last_control_time = None
+        # Paylaşılan bir zamanlayıcı verilirse (LoopSupervisor) görev adları "ad/read", "ad/control" olur ve motor yalnızca kendi görevlerini yönetir
+        self.owns_scheduler = scheduler is None
+        self.scheduler = scheduler or CycleScheduler(on_error=self._on_task_error, on_overrun=self._on_task_overrun, timings=self.timings)
+        self.read_task = f"{name}/read" if name else 'read'; self.control_task = f"{name}/control" if name else 'control'
+        self.on_log = logging.info; self.on_snapshot = lambda snapshot: None; self.on_fault = lambda task, message: None; self.on_settings_changed = lambda: None
+
+        # --- Temel Durum Değişkenleri ---
+        self.current_set_level = 0.0; self.current_actual_level = 0.0; self.current_error = 0.0; self.last_error = 0.0
+
+        # --- Gelişmiş Adaptasyon Durum Değişkenleri (STATE MACHINE) ---
+        self.adaptation_mode = "IDLE"           # Current state: IDLE, STABLE, SETTLE, DISTURBANCE_WAIT, POST_DISTURBANCE_OBSERVE, AGGRESSIVE_CORRECTION, PRECISION_OBSERVE, FINE_TUNE, STABLE_LOCKED
+        self.adaptation_mode_end_time = 0.0     # Timer for states
+        self.adaptation_mode_storage = {}       # Dictionary to pass data between states (e.g., pre-aggressive gain)
+        self.is_adapted = False                 # Flag to indicate successful adaptation
+        self.is_in_fine_tune_observation = False # Sub-state for FINE_TUNE
+        self.last_adaptation_info = {}
+        self.gain_adaptation_multipliers = {}
+        self.frozen_fuzzy_outputs = {}
+        self.locked_stable_outputs = {}
+        self.drift_correction_timer = 0.0
+        self.drift_adjustment_values = {}
+
+    def log(self, m, level=logging.INFO):
+        if self._cycle_events is not None and level > logging.DEBUG: self._cycle_events.append(m)
+        if level >= self.log_level: self.on_log(m)
+
+    def set_fuzzy_settings(self, s):
+        # İlk çağrıda kontrolcüyü kurar, sonrakilerde yerinde günceller
+        with self.lock:
+            self._apply_controller_settings(s)
+            self.fuzzy_settings = s
+            for valve in s.get('valves', []): self.gain_adaptation_multipliers.setdefault(valve['name'], 1.0)
+
+    def _apply_controller_settings(self, s):
+        if self._submitted_settings is not None:
+            self.log("Arka planda kurulan ayar düzenlemesi, doğrudan uygulanan ayarlarla geçersiz kılındı ve atıldı.", logging.WARNING); self._submitted_settings = None
+        self._settings_generation += 1; self._discard_pending_controller()
+        if self.controller_pool is not None: self.fuzzy_controller = self.controller_pool.acquire(s, self.fuzzy_controller)
+        elif self.fuzzy_controller is None: self.fuzzy_controller = FuzzyPIDController(s, cache=self.cache)
+        else: self.fuzzy_controller.update_settings(s)
+
+    def submit_fuzzy_settings(self, s, best_points=None):
+        # Canlı düzenleme: yeni denetleyici arka plan iş parçacığında kurulur, çalışan denetleyici bir sonraki kontrol döngüsü sınırına
+        # kadar hizmet vermeye devam eder; kontrol çalışmıyorsa kurulum biter bitmez geçilir. Ayarlar denetleyiciyle birlikte geçer
+        # (best_points verilirse öğrenilmiş noktalar da). Art arda gelen isteklerden yalnızca en sonuncusu kurulur.
+        # Biçimsel olarak geçersiz ayarlar burada ValueError verir; kurulum hatası loglanır ve mevcut denetleyici korunur.
+        s = validate_fuzzy_settings(copy.deepcopy(s))
+        with self.lock: self._settings_generation += 1; generation = self._settings_generation; self._submitted_settings = (s, copy.deepcopy(best_points), generation)
+        with self._build_lock:
+            self._build_request = (s, copy.deepcopy(best_points), generation)
+            if self._build_thread is None:
+                self._build_thread = threading.Thread(target=self._build_worker, name=f"{self.name}/build" if self.name else "ControllerBuild", daemon=True); self._build_thread.start()
+
+    def _build_worker(self):
+        while True:
+            with self._build_lock:
+                request = self._build_request; self._build_request = None
+                if request is None: self._build_thread = None; return
+            s, best_points, generation = request; start = time.perf_counter()
+            try:
+                if self.controller_pool is not None: controller = self.controller_pool.acquire(s)
+                else:
+                    # skfuzzy simülasyonu ilk compute()'ta kurulur; ısıtma da kontrol döngüsünde değil burada ödenir
+                    controller = FuzzyPIDController(s, cache=self.cache); controller.compute(0.0, 0.0)
+            except Exception as e:
+                self.log(f"Yeni denetleyici kurulamadı, mevcut denetleyiciyle devam ediliyor: {e}", logging.ERROR)
+                with self.lock:
+                    if self._submitted_settings is not None and self._submitted_settings[2] == generation: self._submitted_settings = None
+                continue
+            build_time = time.perf_counter() - start; self.timings.record('controller_build', build_time)
+            with self.lock:
+                if generation != self._settings_generation: self._release_controller(controller); continue
+                self._discard_pending_controller(); self._pending_controller = (controller, s, best_points, generation, time.perf_counter())
+                self.log(f"Yeni denetleyici arka planda kuruldu ({build_time * 1000:.0f} ms).")
+                if not self.is_control_active: self._swap_pending_controller()
+
+    def _release_controller(self, controller):
+        if self.controller_pool is not None: self.controller_pool.release(controller)
+
+    def _discard_pending_controller(self):
+        if self._pending_controller is not None: self._release_controller(self._pending_controller[0]); self._pending_controller = None
+
+    def _swap_pending_controller(self):
+        # self.lock altında çağrılır; tek bir referans ataması olduğu için okuma görevi de eski ya da yeni denetleyiciyi tutarlı görür
+        controller, s, best_points, generation, ready = self._pending_controller; self._pending_controller = None
+        if self._submitted_settings is not None and self._submitted_settings[2] == generation: self._submitted_settings = None
+        old = self.fuzzy_controller; self.fuzzy_controller = controller; self.fuzzy_settings = s
+        # Havuzda acquire() yeni denetleyiciyi (aynı nesne olsa bile) bir kez daha saydı; eskisi bir kez bırakılır
+        if old is not None: self._release_controller(old)
+        if best_points is not None: self.best_fuzzy_points = best_points
+        for valve in s.get('valves', []): self.gain_adaptation_multipliers.setdefault(valve['name'], 1.0)
+        self.timings.record('controller_swap', time.perf_counter() - ready); self.controller_swaps += 1
+        self.on_settings_changed()
+
+    def wait_for_controller(self, timeout=None):
+        # Bekleyen arka plan kurulumu bitene kadar bekler (kıyaslama, test ve kapanış için); hâlâ sürüyorsa False
+        with self._build_lock: thread = self._build_thread
+        if thread is not None: thread.join(timeout)
+        return thread is None or not thread.is_alive()
+
+    def apply_config(self, s):
+        # config.json içeriğini motora uygular: öğrenilmiş noktalar, kazanç çarpanları ve kayıtlı motor parametreleri
+        with self.lock:
+            self.best_fuzzy_points = s.get("best_fuzzy_points", None)
+            if self.best_fuzzy_points: s['points'] = copy.deepcopy(self.best_fuzzy_points)
+            else: self.best_fuzzy_points = copy.deepcopy(s['points'])
+            self.params.update(s.get('engine_params', {})); self.trend.resize(self.params['trend_capacity'])
+            self.set_fuzzy_settings(s)
+            loaded_multipliers = s.get('gain_multipliers', {})
+            if loaded_multipliers: self.gain_adaptation_multipliers.update(loaded_multipliers); self.is_adapted = True
+
+    def config_snapshot(self):
+        with self.lock:
+            snapshot = copy.deepcopy(self.fuzzy_settings)
+            snapshot['best_fuzzy_points'] = copy.deepcopy(self.best_fuzzy_points)
+            snapshot['gain_multipliers'] = dict(self.gain_adaptation_multipliers)
+            snapshot['engine_params'] = dict(self.params)
+        return snapshot
+
+    def save_config(self, file_path, extra=None):
+        snapshot = self.config_snapshot(); snapshot.update(extra or {})
+        atomic_write_json(file_path, snapshot)
+
+    def ensure_controller(self):
+        # GUI ilk pencereyi çizdikten sonra kurar; kurulmadan kontrol başlatılırsa burada kurulur
+        with self.lock:
+            if self.fuzzy_controller is None: self.set_fuzzy_settings(self.fuzzy_settings)
+            return self.fuzzy_controller
+
+    @property
+    def is_control_active(self): return self.scheduler.has_task(self.control_task)
+
+    def start(self, phase=0.0):
+        # phase: ilk okumanın gecikmesi; süpervizör döngüleri periyot içinde kaydırarak yükü yayar
+        self.scheduler.start(); self.scheduler.set_task(self.read_task, self.params['read_period'], self.read_process, start_delay=phase)
+
+    def _stop_tasks(self):
+        self._read_task_paused = False
+        if self.owns_scheduler: self.scheduler.stop()
+        else: self.scheduler.remove_task(self.read_task); self.scheduler.remove_task(self.control_task)
+
+    def stop(self):
+        self._stop_tasks()
+        with self.lock: self.adaptation_mode = "IDLE"
+
+    def prepare_control(self):
+        # Zamanlayıcıdan bağımsız hazırlık; kıyaslama ve tekrar oynatma döngüleri görevleri kendileri çağırır
+        with self.lock:
+            self.ensure_controller()
+            self.reset_to_optimized_defaults()
+            self.adaptation_mode = "STABLE"
+            self.reads_inline = bool(self.params['adaptive_rate']); self.control_period_now = self.params['control_period']; self._last_dt = None; self._last_control_time = None
+            self.output_writer.invalidate()
+
+    def start_control(self, phase=0.0):
+        self.prepare_control()
+        # Uyarlamalı hızda ayrı okuma görevi durdurulur; her kontrol döngüsü kendi ölçümünü okur (döngü başına bir okuma + bir yazma)
+        if self.reads_inline and self.scheduler.has_task(self.read_task): self.scheduler.remove_task(self.read_task); self._read_task_paused = True
+        self.scheduler.set_task(self.control_task, self.params['control_period'], self.run_control_cycle, start_delay=self.params['control_period'] + phase)
+        self.log("Kontrol döngüsü başlatıldı." + (f" Uyarlamalı hız: {self.control_period_bounds()[0]:.2f}-{self.control_period_bounds()[1]:.2f} sn." if self.reads_inline else ""))
+
+    def stop_control(self):
+        self.scheduler.remove_task(self.control_task)
+        if self._read_task_paused: self._read_task_paused = False; self.scheduler.set_task(self.read_task, self.params['read_period'], self.read_process)
+        with self.lock: self.adaptation_mode = "IDLE"; self.reads_inline = False
+        self.log("Kontrol döngüsü durduruldu.")
+
+    def control_period_bounds(self):
+        p = self.params; base = p['control_period']
+        return min(p['control_period_min'], base), max(p['control_period_max'], base, p['control_period_locked'])
+
+    def next_control_period(self):
+        # Bozulmada, agresif düzeltmede veya hata bozulma eşiğinin üstündeyken en kısa periyot. Kararlı modlarda hata rate_error_band
+        # içindeyse periyot, hata sıfıra yaklaştıkça temel periyottan en uzun periyoda doğru uzar; bant dışında temel periyot. Kararlı modların
+        # dürtme çıkışı bir periyot boyunca tutulduğundan uzun periyot salınımı büyütür: bant ve üst sınır bu yüzden dar tutulur.
+        # Gözlem ve ince ayar modları temel periyotta kalır: kararlılık ve eğilim pencereleri döngü sayısıyla tanımlıdır.
+        # STABLE_LOCKED'da hata locked_error_band içindeyse okuma ve kontrol birlikte control_period_locked'a (okuma periyodundan uzun) iner;
+        # bu modda dürtme okuma periyoduna göre ölçeklenir ve sabit dolum çıkışı hatayla düzeltilir (_control_step), salınım büyümez.
+        p = self.params; base = p['control_period']; lo = self.control_period_bounds()[0]; hi = max(p['control_period_max'], base); e = abs(self.current_error)
+        if self.adaptation_mode in FAST_RATE_MODES or e > p['disturbance_threshold']: return lo
+        if self.adaptation_mode == "STABLE_LOCKED" and p['control_period_locked'] > 0 and e < p['locked_error_band']: return p['control_period_locked']
+        if self.adaptation_mode in SLOW_RATE_MODES and e < p['rate_error_band']: return hi - (hi - base) * e / p['rate_error_band']
+        return base
+
+    def _on_task_error(self, task, e):
+        if task == self.control_task:
+            logging.exception("Kontrol döngüsünde kritik hata oluştu:", exc_info=e)
+            self.log(f"Döngü hatası: {e}")
+        else: self.log(f"PLC okuma hatası: {e}")
+        self._stop_tasks()
+        with self.lock: self.adaptation_mode = "IDLE"
+        self.on_fault(task, str(e))
+
+    def _on_task_overrun(self, task, lateness, missed):
+        logging.warning(f"'{task}' görevi son tarihini {lateness * 1000:.0f} ms aştı, {missed} periyot atlandı.")
+
+    def classify_error(self, error):
+        # Denetleyicinin önceden hesaplanmış kırılma noktası dizininden (baskın terim, {terim: derece}); denetleyici yoksa ("N/A", {})
+        controller = self.fuzzy_controller
+        if controller is None: return "N/A", {}
+        return controller.term_index.classify(error)
+
+    def active_error_term(self, error): return self.classify_error(error)[0]
+
+    def read_process(self, dt=None):
+        p = self.params
+        with self.lock:
+            db_num = int(p['db']); set_addr = int(p['set_level_addr']); level_addr = int(p['levelmeter_addr'])
+            t0 = time.perf_counter()
+            set_level, actual_level = self.plc_manager.read_reals([(db_num, set_addr), (db_num, level_addr)])
+            self.timings.record('plc_read', time.perf_counter() - t0)
+            self.current_set_level = set_level
+            self.current_actual_level = actual_level
+            self.current_error = set_level - actual_level
+            active_term, memberships = self.classify_error(self.current_error)
+            snapshot = {'kind': 'read', 'set_level': set_level, 'actual_level': actual_level, 'error': self.current_error, 'active_term': active_term, 'memberships': memberships, 'mode': self.adaptation_mode}
+        self.on_snapshot(snapshot)
+
+    def write_set_level(self, value):
+        p = self.params
+        with self.lock:
+            self.cancel_disturbance_adaptation()
+            db = int(p['db']); set_addr = int(p['set_level_addr']); level_addr = int(p['levelmeter_addr'])
+            current_level = self.plc_manager.read_real(db, level_addr)
+            initial_error = value - current_level
+
+            if abs(value - self.current_set_level) > 0.001:
+                if abs(initial_error) > 0.01:
+                    self.adaptation_mode = "SETTLE"; self.error_stats.clear()
+                    self.adaptation_mode_end_time = self.clock() + self.INITIAL_SETTLING_TIMEOUT
+                    self.log(f"Set değeri değişti. Başlangıç Hatası: {initial_error:.2f}. Oturma ölçümü (SETTLE modu) başladı.")
+                else:
+                    self.log("Yeni set değeri gönderildi, ancak fark çok küçük. Ayar sıfırlanmadı.")
+
+            self.current_set_level = value
+            self.plc_manager.write_real(db, set_addr, value)
+            self.log(f"PLC'ye yeni set seviyesi: {value} (DB{db}, Off:{set_addr})")
+
+    def cancel_disturbance_adaptation(self):
+        self.adaptation_mode = "STABLE"
+        self.frozen_fuzzy_outputs.clear()
+        self.log("Kullanıcı müdahalesi: Mevcut bozucu etken/adaptasyon süreci iptal edildi.")
+
+    def run_control_cycle(self, dt=0.5):
+        # dt, zamanlayıcının planladığı periyottur (uyarlamalı hızda değişkendir). Türev, eğilim ve zaman hesapları ise önceki kontrol
+        # adımından bu yana saatle (self.clock) ölçülen süreyi kullanır: gecikme veya atlanan periyot bu süreyi uzatır. Ölçüm periyot
+        # sınırlarına kırpılır (duraklama sonrası aşırı büyük, ardışık çağrıda sıfıra yakın aralık); ilk adımda planlanan periyot kullanılır.
+        now = self.clock(); lo, hi = self.control_period_bounds()
+        elapsed = (dt or self.params['control_period']) if self._last_control_time is None else min(max(now - self._last_control_time, lo), hi)
+        self._last_control_time = now
+        if self.reads_inline: self.read_process(elapsed)
+        with self.lock:
+            # Döngü sınırı: arka planda kurulmuş denetleyici yalnızca burada, iki kontrol adımı arasında devreye girer
+            if self._pending_controller is not None: self._swap_pending_controller()
+            snapshot = self._control_step(elapsed, dt or self.params['control_period'])
+            if self.reads_inline:
+                period = self.control_period_next
+                if period != self.control_period_now: self.control_period_now = period; self.scheduler.set_period(self.control_task, period)
+        self.on_snapshot(snapshot)
+
+    def _sync_stats_windows(self):
+        # Pencere uzunlukları params'tan okunur (GUI/config değiştirebilir); değişen pencere boş olarak yeniden ayrılır
+        for stats, key in ((self.error_stats, 'stability_window'), (self.trend_stats, 'trend_window')):
+            if stats.window != max(int(self.params[key]), 2): stats.resize(self.params[key])
+
+    def _control_step(self, dt, period=None):
+        # dt: ölçülen adım süresi; period: planlanan periyot (örnekleme aralığı)
+        p = self.params
+        current_error = self.current_error
+        # Eğilim eğimi örnek başınadır ve dt'ye bölünür; planlanan periyot değişince eski aralıklı örnekler atılır (eğim zamana göre doğru kalır).
+        # Saat titreşimi ölçülen dt'yi her döngüde biraz değiştirir; pencere bu yüzden planlanan periyoda göre sıfırlanır.
+        period = dt if period is None else period
+        if self._last_dt is not None and period != self._last_dt: self.trend_stats.clear()
+        self._last_dt = period
+        self._sync_stats_windows(); self.error_stats.push(current_error); self.trend_stats.push(current_error)
+        db_num = int(p['db'])
+        delta_error = (current_error - self.last_error)
+        if self.decision_trace is not None: self._cycle_events = []; mode_before = self.adaptation_mode
+        log_cycle = self.log_level <= logging.DEBUG
+        DEADBAND = 0.01
+
+        t0 = time.perf_counter()
+        raw_fuzzy_outputs = self.fuzzy_controller.compute(current_error, delta_error / dt) or {}
+        t1 = time.perf_counter(); self.timings.record('inference', t1 - t0)
+        log_status = self.adaptation_mode
+        valves = self.fuzzy_settings.get('valves', [])
+
+        # --- STATE MACHINE START (STABLE_LOCKED içindeki drift mantığı kaldırıldı) ---
+        if p['learning_enabled']:
+            if self.adaptation_mode == "SETTLE":
+                settled = p['settle_stability_threshold'] > 0 and self.error_stats.full and self.error_stats.std() < p['settle_stability_threshold']
+                if settled and abs(current_error) >= DEADBAND: self.log(f"Seviye oturdu (STDEV: {self.error_stats.std():.4f}, ortalama hata: {self.error_stats.mean():.3f}).")
+                if abs(current_error) < DEADBAND or settled or self.clock() > self.adaptation_mode_end_time:
+                    self.log("Settle modu tamamlandı, tüm adaptasyon ayarları sıfırlanıyor.")
+                    self.reset_adaptation_state()
+
+            elif self.adaptation_mode in ["STABLE", "STABLE_LOCKED"]:
+                # Bozucu Etken Tespiti (Drift mantığı buradan kaldırıldı, çıkış hesaplamasına taşındı)
+                if abs(current_error) > p['disturbance_threshold']:
+                    log_msg = f"{self.adaptation_mode} modda BOZULMA tespit edildi."
+                    if self.is_adapted:
+                        log_msg += " Fabrika ayarlarına dönülüyor."
+                        self.reset_to_optimized_defaults()
+                    self.log(log_msg)
+                    self.adaptation_mode = "DISTURBANCE_WAIT"
+                    self.adaptation_mode_end_time = self.clock() + p['disturbance_delay']
+
+            elif self.adaptation_mode == "DISTURBANCE_WAIT":
+                if self.clock() >= self.adaptation_mode_end_time:
+                    self.adaptation_mode = "POST_DISTURBANCE_OBSERVE"
+                    self.adaptation_mode_storage = {'start_time': self.clock(), 'reversion_outputs': {}, 'baseline_fuzzy_outputs': {}}; self.error_stats.clear()
+                    self.log("Bozucu etken bekleme süresi doldu. Hata stabilize olana kadar GÖZLEM modu başlıyor...")
+
+            elif self.adaptation_mode == "POST_DISTURBANCE_OBSERVE":
+                time_elapsed = self.clock() - self.adaptation_mode_storage['start_time']; is_stable = False
+                if time_elapsed >= p['observe_min_time'] and self.error_stats.full:
+                    stdev = self.error_stats.std()
+                    if stdev < p['stability_threshold']: is_stable = True
+                    elif time_elapsed % 10 < dt: self.log(f"Gözlem Stabil Değil. STDEV: {stdev:.4f}. Bekleniyor...")
+                if is_stable or time_elapsed > p['observe_max_time']:
+                    if not is_stable: self.log("Gözlem süresi aşıldı, yine de devam ediliyor.")
+                    self.log(f"Gözlem tamamlandı. Stabilize olan hata: {current_error:.3f}. Agresif Düzeltme Modu başlatılıyor.")
+                    self.adaptation_mode_storage['baseline_fuzzy_outputs'] = copy.deepcopy(raw_fuzzy_outputs)
+                    self.log(f"Gözlem sonu ham fuzzy çıktılar saklandı: { {k: f'{v:.2f}' for k,v in self.adaptation_mode_storage['baseline_fuzzy_outputs'].items()} }")
+                    target_valve = valves[0]['name'] if current_error > 0 and len(valves) > 0 else (valves[1]['name'] if len(valves) > 1 else None)
+                    reversion_outputs = {}
+                    if target_valve:
+                         for v_conf in valves:
+                             v_name = v_conf['name']; norm_val = raw_fuzzy_outputs.get(v_name, 0.0)
+                             physical_range = v_conf['max_out'] - v_conf['min_out']; reversion_outputs[v_name] = (norm_val * physical_range) + v_conf['min_out']
+                    self.adaptation_mode_storage['reversion_outputs'] = reversion_outputs
+                    if target_valve:
+                        valve_conf = next((v for v in valves if v['name'] == target_valve), None)
+                        baseline_output = reversion_outputs.get(target_valve, 0.0); new_target_output = np.clip(baseline_output + (abs(current_error) * 3.0), valve_conf['min_out'], valve_conf['max_out'])
+                        self.adaptation_mode_storage['aggressive_target_valve'] = target_valve; self.adaptation_mode_storage['aggressive_output_value'] = new_target_output
+                        self.log(f"Agresif Ayar: '{target_valve}' çıkışı {new_target_output:.3f} olarak ayarlandı.")
+                    else: self.log("Agresif ayar için hedef vana bulunamadı. İnce ayara geçiliyor."); self.adaptation_mode = "FINE_TUNE"
+                    self.adaptation_mode = "AGGRESSIVE_CORRECTION"
+
+            elif self.adaptation_mode == "AGGRESSIVE_CORRECTION":
+                if abs(current_error) <= 0.05:
+                    self.adaptation_mode = "PRECISION_OBSERVE"; self.adaptation_mode_end_time = self.clock() + 10.0
+                    self.log("Hedef hata değerine ulaşıldı. Vana çıkışları gözlem değerine geri çekildi."); self.log("10 saniyelik Hassas Gözlem moduna geçiliyor.")
+
+            elif self.adaptation_mode == "PRECISION_OBSERVE":
+                if self.clock() >= self.adaptation_mode_end_time:
+                    self.log("Hassas gözlem tamamlandı. Standart İnce Ayar moduna geçiliyor."); self.adaptation_mode = "FINE_TUNE"; self.is_in_fine_tune_observation = False
+                    self.frozen_fuzzy_outputs = self.adaptation_mode_storage.get('baseline_fuzzy_outputs', copy.deepcopy(raw_fuzzy_outputs))
+                    self.log(f"Temel çıkışlar GÖZLEM SONU değerlerine göre donduruldu: { {k: f'{v:.2f}' for k,v in self.frozen_fuzzy_outputs.items()} }")
+
+            elif self.adaptation_mode == "FINE_TUNE":
+                if abs(current_error) < DEADBAND:
+                    self.log("İnce Ayar başarılı! Hata DEADBAND içine girdi. Son kararlı çıkışlar kilitleniyor.")
+                    self.locked_stable_outputs.clear()
+                    proactive_reduction = 0.04
+                    dominant_valve = self.last_adaptation_info.get('valve')
+                    if dominant_valve:
+                        self.adaptation_mode_storage['dominant_correction_valve'] = dominant_valve
+                        self.log(f"Dominant vana '{dominant_valve}' olarak ayarlandı.")
+                    for v_conf in valves:
+                        v_name = v_conf['name']; norm_val = self.frozen_fuzzy_outputs.get(v_name, 0.0); gain = self.gain_adaptation_multipliers.get(v_name, 1.0)
+                        final_locked_value = norm_val * gain
+                        if v_name == dominant_valve:
+                            self.log(f"'{v_name}' için proaktif azaltma uygulanıyor. Orijinal: {final_locked_value:.4f}")
+                            final_locked_value = max(0.0, final_locked_value - proactive_reduction)
+                            self.log(f"Yeni kilit değeri: {final_locked_value:.4f}")
+                        self.locked_stable_outputs[v_name] = final_locked_value
+                    self.is_adapted = True; self.adaptation_mode = "STABLE_LOCKED"; self.frozen_fuzzy_outputs.clear()
+
+                elif self.is_in_fine_tune_observation:
+                    if self.clock() >= self.adaptation_mode_end_time: self._evaluate_observation_and_decide_next_step(current_error)
+                else:
+                    if not self.frozen_fuzzy_outputs:
+                         self.frozen_fuzzy_outputs = copy.deepcopy(raw_fuzzy_outputs)
+                         self.log(f"İnce Ayar Modu Başladı. Temel çıkışlar donduruldu: { {k: f'{v:.2f}' for k,v in self.frozen_fuzzy_outputs.items()} }")
+                    self._perform_adaptation_step(current_error, delta_error, dt)
+
+        # Uyarlamalı hızda bu döngünün çıkışı bir sonraki periyot boyunca tutulur; periyot çıkıştan önce belirlenir
+        self.control_period_next = self.next_control_period() if self.reads_inline else None
+
+        # --- VANA ÇIKIŞ HESAPLAMA (DEĞİŞİKLİKLER BURADA) ---
+        log_msg_parts = []; pending_writes = []; outputs = {}
+        for valve_conf in valves:
+            valve_name = valve_conf['name']; physical_value = 0.0
+            current_gain = self.gain_adaptation_multipliers.get(valve_name, 1.0)
+
+            if self.adaptation_mode == "AGGRESSIVE_CORRECTION":
+                physical_value = self.adaptation_mode_storage.get('aggressive_output_value', valve_conf['min_out']) if valve_name == self.adaptation_mode_storage.get('aggressive_target_valve') else valve_conf['min_out']
+
+            elif self.adaptation_mode == "PRECISION_OBSERVE":
+                physical_value = self.adaptation_mode_storage.get('reversion_outputs', {}).get(valve_name, valve_conf['min_out'])
+
+            # --- YENİ MANTIK BURADA BAŞLIYOR ---
+            elif self.adaptation_mode == "STABLE_LOCKED":
+                log_status = "STABLE_LOCKED" # Varsayılan durum
+                base_norm_val = self.locked_stable_outputs.get(valve_name, 0.0)
+                final_norm_val = base_norm_val
+
+                # STABLE_LOCKED için Nudge Mantığı
+                if abs(current_error) > 0.001:
+                    log_status = "LOCKED_NUDGE" # Log durumu güncellendi
+                    nudge_amount = 0.1
+                    fill_valve_name = valves[0]['name'] if len(valves) > 0 else None
+                    drain_valve_name = valves[1]['name'] if len(valves) > 1 else None
+                    # Uyarlamalı hızda dürtme periyot boyunca tutulur: itki sabit hızdaki gibi bir okuma periyodu kadar kalsın diye ölçeklenir
+                    if self.control_period_next: nudge_amount *= min(1.0, p['read_period'] / self.control_period_next)
+
+                    # Hata pozitifse (dolum gerek), sadece dolum vanasını dürt
+                    if current_error > 0 and valve_name == fill_valve_name:
+                        final_norm_val = base_norm_val + nudge_amount
+                    # Hata negatifse (boşaltma gerek), sadece boşaltma vanasını dürt
+                    elif current_error < 0 and valve_name == drain_valve_name:
+                         final_norm_val = base_norm_val + nudge_amount
+
+                # Uyarlamalı hızda kilitli dolum çıkışı hatanın zaman integraliyle düzeltilir: kilitlenme anındaki çıkış sızıntıyı tam
+                # karşılamıyorsa dürtme iki yöne sürekli salınır (röle çevrimi); düzeltme bu sapmayı sıfırlar ve uzun periyotta seviye oturur.
+                if self.control_period_next and p['locked_trim'] and valves and valve_name == valves[0]['name']:
+                    self.locked_stable_outputs[valve_name] = float(np.clip(base_norm_val + p['locked_trim'] * current_error * self.control_period_next, 0.0, 1.0))
+
+                final_norm_val = np.clip(final_norm_val, 0.0, 1.0)
+                physical_range = valve_conf['max_out'] - valve_conf['min_out']
+                physical_value = (final_norm_val * physical_range) + valve_conf['min_out']
+
+            else: # ACTIVE FUZZY CONTROL (STABLE, SETTLE, FINE_TUNE, vb.)
+                normalized_value = raw_fuzzy_outputs.get(valve_name, 0.0)
+                output_to_use = self.frozen_fuzzy_outputs.get(valve_name, normalized_value) if self.adaptation_mode == "FINE_TUNE" else normalized_value
+                final_normalized_value = max(0.0, min(1.0, output_to_use * current_gain))
+
+                if self.adaptation_mode == "STABLE" and not self.is_adapted:
+                    log_status = "STABLE_NUDGE"
+                    fill_valve_name = valves[0]['name'] if len(valves) > 0 else None
+                    drain_valve_name = valves[1]['name'] if len(valves) > 1 else None
+                    if abs(current_error) > 0.001:
+                        if current_error > 0: final_normalized_value = 0.01 if valve_name == fill_valve_name else 0.0
+                        else: final_normalized_value = 0.01 if valve_name == drain_valve_name else 0.0
+                    else: final_normalized_value = 0.0
+
+                elif self.adaptation_mode not in ["STABLE", "STABLE_LOCKED"]:
+                    fill_valve_name = valves[0]['name'] if len(valves) > 0 else None
+                    drain_valve_name = valves[1]['name'] if len(valves) > 1 else None
+                    if current_error > 0 and valve_name == drain_valve_name: final_normalized_value = 0.0
+                    elif current_error < 0 and valve_name == fill_valve_name: final_normalized_value = 0.0
+
+                physical_range = valve_conf['max_out'] - valve_conf['min_out']
+                physical_value = (final_normalized_value * physical_range) + valve_conf['min_out']
+
+            if valve_conf.get('offset') is not None: pending_writes.append((db_num, int(valve_conf['offset']), physical_value))
+            outputs[valve_name] = float(physical_value)
+            if log_cycle: log_msg_parts.append(f"{valve_name[:1]}:{physical_value:.2f}(G:{current_gain:.2f})")
+        t2 = time.perf_counter(); self.timings.record('state_machine', t2 - t1)
+        # Yalnızca değişen (veya bekçi süresi dolan) vanalar yazılır; plc_write süresi yalnızca gerçekten yazılan döngülerde kaydedilir
+        if self.output_writer.write(self.plc_manager, pending_writes, self.clock(), p['write_tolerance'], p['write_refresh_interval']): self.timings.record('plc_write', time.perf_counter() - t2)
+        t3 = time.perf_counter()
+
+        self.last_error = current_error
+        if self._cycle_events is not None:
+            self.decision_trace.append({'t': self.clock(), 'dt': dt, 'set_level': self.current_set_level, 'actual_level': self.current_actual_level, 'error': current_error, 'delta_error': delta_error / dt,
+                                        'mode_before': mode_before, 'mode': self.adaptation_mode, 'status': log_status, 'outputs': outputs, 'gains': dict(self.gain_adaptation_multipliers), 'events': self._cycle_events})
+            self._cycle_events = None
+        if log_cycle: self.log(f"E:{current_error:.2f}, dE:{delta_error/dt:.2f} [{log_status}] -> {', '.join(log_msg_parts)}", logging.DEBUG)
+        t4 = time.perf_counter(); self.timings.record('log', t4 - t3)
+        self.trend.record(self.clock(), self.current_set_level, self.current_actual_level, current_error, delta_error / dt, self.adaptation_mode, outputs)
+        self.timings.record('trend', time.perf_counter() - t4)
+        return {'kind': 'cycle', 'outputs': outputs, 'error': current_error, 'delta_error': delta_error / dt, 'status': log_status, 'mode': self.adaptation_mode, 'period': dt}
+
+    def _perform_adaptation_step(self, current_error, delta_error, dt):
+        p = self.params
+        if not self.frozen_fuzzy_outputs:
+            self.frozen_fuzzy_outputs = self.fuzzy_controller.compute(current_error, delta_error / dt) or {}
+            self.log(f"İnce Ayar Modu Başladı. Temel çıkışlar donduruldu: { {k: f'{v:.2f}' for k,v in self.frozen_fuzzy_outputs.items()} }")
+
+        if self.last_adaptation_info.get('reverting', False):
+            self.log("Kalıcı Geri Alma döngüsü aktif. Yeni adım atlanıyor, geri almaya devam ediliyor.")
+            self._revert_last_adaptation(is_permanent_revert=True)
+            return
+
+        error_abs = abs(current_error)
+        step_size = 0.0
+        adapt_type_log = ""
+
+        observation_duration = 10.0 if error_abs < 0.3 else p['fine_tune_interval']
+        # trend_window örneklik en küçük kareler eğimi (varsayılan 2 örnek = son döngüdeki fark); gürültülü ölçümde pencere büyütülebilir
+        error_trend = (self.trend_stats.slope() if self.trend_stats.count >= 2 else delta_error) / dt if dt > 0 else 0.0
+
+        if error_abs < p['precision_threshold']:
+            adapt_type_log = "Hassas (İniş Modu)"
+            damping_factor = p['precision_aggressiveness'] * 10
+            p_adjustment = current_error * 0.1
+            d_adjustment = -error_trend * damping_factor
+            control_value = p_adjustment + d_adjustment
+            adjustment = np.clip(control_value, -0.05, 0.05)
+        else:
+            adapt_type_log = "Normal (Trend Tabanlı)"
+            damping_factor = 0.5
+            if current_error > 0:
+                step_size = (error_abs + (error_trend * damping_factor)) * p['fine_tune_aggressiveness']
+            else:
+                step_size = (error_abs - (error_trend * damping_factor)) * p['fine_tune_aggressiveness']
+            adjustment = np.clip(abs(step_size), 0.001, 0.1)
+
+        target_valve = None
+        valves = self.fuzzy_settings.get('valves', [])
+        if current_error > 0: target_valve = valves[0]['name'] if len(valves) > 0 else None
+        else: target_valve = valves[1]['name'] if len(valves) > 1 else None
+
+        if target_valve:
+            final_adjustment = adjustment if adapt_type_log.startswith("Hassas") or current_error > 0 else -adjustment
+            self.gain_adaptation_multipliers[target_valve] += final_adjustment
+            self.last_adaptation_info = {'type': 'gain_adjust', 'valve': target_valve, 'amount': final_adjustment, 'reverting': False}
+            self.log(f"İnce Ayar ({adapt_type_log}): '{target_valve}' kazancı -> {self.gain_adaptation_multipliers[target_valve]:.3f} (Adım: {final_adjustment:+.3f})")
+
+        self.is_in_fine_tune_observation = True
+        self.adaptation_mode_end_time = self.clock() + (1.0 if adapt_type_log.startswith("Hassas") else observation_duration)
+        self.adaptation_mode_storage['observation_initial_error'] = current_error
+        self.log(f"Adaptasyon adımı atıldı. {self.adaptation_mode_end_time - self.clock():.1f}sn boyunca İnce Ayar GÖZLEM moduna geçiliyor.")
+
+    def _evaluate_observation_and_decide_next_step(self, current_error):
+        initial_error = self.adaptation_mode_storage.get('observation_initial_error', 0.0)
+        progress = abs(initial_error) - abs(current_error)
+        self.log(f"İnce Ayar Gözlem tamamlandı. Başlangıç E: {initial_error:.3f}, Bitiş E: {current_error:.3f}. İlerleme: {progress:.3f}")
+        self.is_in_fine_tune_observation = False
+
+        has_overshoot = np.sign(current_error) != np.sign(initial_error) and abs(current_error) > 0.01
+
+        if self.last_adaptation_info.get('reverting', False):
+            if has_overshoot:
+                self.log("Kalıcı Geri Alma devam ediyor...")
+                return
+            else:
+                self.log("Kalıcı Geri Alma modu overshoot düzeldiği için sonlandırıldı.")
+                self.last_adaptation_info['reverting'] = False
+
+        if has_overshoot and not self.last_adaptation_info.get('reverting', False):
+            self.log("OVERSHOOT tespit edildi! Geri Alma başlatılıyor.")
+            is_permanent = abs(initial_error) < self.params['precision_threshold']
+            if is_permanent:
+                self.log("Hassas modda overshoot, kalıcı geri alma döngüsü başlatılıyor.")
+                self.last_adaptation_info['reverting'] = True
+            self._revert_last_adaptation(is_permanent_revert=is_permanent)
+
+    def _revert_last_adaptation(self, is_permanent_revert=False):
+        if not self.last_adaptation_info:
+            self.log("Geri alınacak bir adaptasyon adımı bulunamadı."); return
+
+        reversal_factor = 1.0 if is_permanent_revert else 0.5
+        info = self.last_adaptation_info.copy()
+        amount_to_revert = info.get('amount', 0.0) * reversal_factor
+        revert_log_prefix = "Kalıcı Geri Alma" if is_permanent_revert else "Geri Alma"
+        valve_name = info.get('valve')
+        if valve_name:
+            current_gain = self.gain_adaptation_multipliers[valve_name]
+            self.gain_adaptation_multipliers[valve_name] = max(1.0, current_gain - amount_to_revert)
+            self.log(f"{revert_log_prefix} (Kazanç): '{valve_name}' kazancı -> {self.gain_adaptation_multipliers[valve_name]:.3f}")
+
+        if not is_permanent_revert:
+            self.last_adaptation_info = {}
+        else:
+            self.last_adaptation_info['amount'] = -amount_to_revert
+
+        error_abs = abs(self.current_error)
+        self.is_in_fine_tune_observation = True
+        observation_duration = 10.0 if error_abs < 0.3 else self.params['fine_tune_interval']
+        self.adaptation_mode_end_time = self.clock() + observation_duration
+        self.adaptation_mode_storage['observation_initial_error'] = self.current_error
+        self.log(f"Geri alma sonrası {observation_duration:.1f}sn GÖZLEM moduna geçiliyor.")
+
+    def reset_adaptation_state(self):
+        self.log("Tam adaptasyon sıfırlaması yapılıyor. STABLE moda geçiliyor.")
+        self.adaptation_mode = "STABLE"
+        self.is_adapted = False
+        self.is_in_fine_tune_observation = False
+        self.adaptation_mode_end_time = 0.0
+
+        # Dominant vana bilgisini de temizle
+        if 'dominant_correction_valve' in self.adaptation_mode_storage:
+            self.adaptation_mode_storage.pop('dominant_correction_valve')
+
+        self.last_adaptation_info = {}
+        self.locked_stable_outputs.clear()
+        self.frozen_fuzzy_outputs.clear()
+        for key in self.gain_adaptation_multipliers: self.gain_adaptation_multipliers[key] = 1.0
+
+        self.drift_adjustment_values.clear()
+        self.drift_correction_timer = 0.0
+
+    def reset_to_optimized_defaults(self):
+        self.log("Fabrika ayarlarına (hesaplanmış optimum) dönülüyor.")
+        self.reset_adaptation_state()
+        if self._submitted_settings is not None:
+            # Henüz geçilmemiş düzenleme (vanalar, opt_* genleri...) fabrika hesabının temeli olur; aksi halde eski ayarlarla kurulup kaybolurdu
+            s, best_points, _ = self._submitted_settings; self._submitted_settings = None; self.fuzzy_settings = copy.deepcopy(s)
+            for valve in s.get('valves', []): self.gain_adaptation_multipliers.setdefault(valve['name'], 1.0)
+            self.log("Bekleyen ayar düzenlemesi fabrika ayarına dönüşe dahil edildi.")
+        p = self.params
+        new_points, optimized_rules = optimized_default_settings(self.fuzzy_settings, p['opt_min'], p['opt_max'], p['opt_set'])
+        self.fuzzy_settings['points'] = new_points
+        self.best_fuzzy_points = copy.deepcopy(new_points)
+        self.fuzzy_settings['outputs'] = optimized_rules
+        self._apply_controller_settings(self.fuzzy_settings)
+        self.on_settings_changed()
+
+def main(argv=None):
+    # GUI'siz çalıştırma: config.json'u yükler, PLC'ye bağlanır ve kontrol döngüsünü Ctrl+C / SIGTERM gelene kadar sürdürür
+    parser = argparse.ArgumentParser(description="Fuzzy Logic kontrol motoru (GUI'siz)")
+    parser.add_argument('--config', default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.json"), help="Ayar dosyası (varsayılan: betik yanındaki config.json)")
+    parser.add_argument('--ip', help="PLC IP adresi (config.json 'plc.ip' değerini ezer)")
+    parser.add_argument('--rack', type=int); parser.add_argument('--slot', type=int); parser.add_argument('--db', type=int, help="DB numarası")
+    parser.add_argument('--set-level', type=float, help="Başlangıçta PLC'ye yazılacak set seviyesi")
+    parser.add_argument('--duration', type=float, default=0.0, help="Saniye cinsinden çalışma süresi (0 = süresiz)")
+    parser.add_argument('--no-learning', action='store_true', help="Otomatik ayarı (öğrenme) kapat")
+    parser.add_argument('--no-save', action='store_true', help="Çıkışta öğrenilen ayarları config.json'a yazma")
+    parser.add_argument('--log-level', default="INFO", help="DEBUG döngü başına özet satırlarını da yazar")
+    parser.add_argument('--log-file', help="Dönen (rotating) log dosyası; 5 MB x 3 yedek")
+    args = parser.parse_args(argv)
+    log_level = getattr(logging, args.log_level.upper(), logging.INFO)
+    logging.basicConfig(level=log_level, format='%(asctime)s - %(levelname)s - %(message)s')
+    if args.log_file:
+        handler = logging.handlers.RotatingFileHandler(args.log_file, maxBytes=5 * 1024 * 1024, backupCount=3, encoding='utf-8'); handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        logging.getLogger().addHandler(handler)
+
+    fuzzy_settings = load_config_file(args.config)
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(args.config)), "controller_cache") if fuzzy_settings.get('persist_surface_cache', True) else None
+    engine = ControlEngine(cache=CompiledSurfaceCache(directory=cache_dir))
+    engine.apply_config(fuzzy_settings); engine.log_level = log_level
+    if args.db is not None: engine.params['db'] = args.db
+    if args.no_learning: engine.params['learning_enabled'] = False
+    plc = fuzzy_settings.get('plc', {})
+    ip = args.ip or plc.get('ip', "192.168.0.1"); rack = args.rack if args.rack is not None else int(plc.get('rack', 0)); slot = args.slot if args.slot is not None else int(plc.get('slot', 1))
+
+    stop_event = threading.Event(); faults = []
+    engine.on_fault = lambda task, message: (faults.append((task, message)), stop_event.set())
+    # Öğrenilen ayarlar değiştikçe arka planda (birleştirilerek) kaydedilir; beklenmedik bir kapanmada son öğrenilen durum kaybolmaz
+    writer = ConfigWriter(args.config, lambda: dict(engine.config_snapshot(), plc={'ip': ip, 'rack': rack, 'slot': slot}), delay=5.0) if not args.no_save else None
+    if writer is not None: engine.on_settings_changed = writer.mark_dirty
+    for sig in (signal.SIGINT, signal.SIGTERM): signal.signal(sig, lambda signum, frame: stop_event.set())
+
+    logging.info(f"PLC'ye bağlanılıyor: {ip}...")
+    suc, msg = engine.plc_manager.connect(ip, rack, slot)
+    if not suc: logging.error(f"Bağlantı başarısız: {msg}"); return 1
+    try:
+        engine.start()
+        if args.set_level is not None: engine.write_set_level(args.set_level)
+        engine.start_control()
+        deadline = time.monotonic() + args.duration if args.duration > 0 else None
+        while not stop_event.wait(0.5):
+            if deadline is not None and time.monotonic() >= deadline: break
+    finally:
+        engine.stop(); engine.plc_manager.disconnect(); logging.info(engine.output_writer.format_stats())
+        if writer is not None: writer.mark_dirty(); writer.close()
+    return 1 if faults else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
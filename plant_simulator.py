@@ -0,0 +1,139 @@
+import sys
+import logging
+import argparse
+import threading
+import time
+import numpy as np
+from fuzzy_engine import PLCManager, snap7_util
+
+class TankPlant:
+    # Tek tanklı seviye süreci: dolum debisi vana açıklığıyla doğrusal; boşaltma vanası ve sürekli tüketim debisi sqrt(h) ile orantılı (Torricelli).
+    # Bozucu etkenler [başlangıç, bitiş) aralığında ek çıkış debisi olarak eklenir (negatif değer ek giriş demektir).
+    def __init__(self, level=3.0, area=1.0, height=10.0, fill_gain=0.02, drain_gain=0.01, leak_gain=0.01, max_opening=10.0, noise=0.0, seed=0):
+        self.level = float(level); self.area = area; self.height = height; self.fill_gain = fill_gain; self.drain_gain = drain_gain; self.leak_gain = leak_gain
+        self.max_opening = max_opening; self.noise = noise; self.rng = np.random.default_rng(seed); self.time = 0.0; self.disturbances = []
+
+    def add_disturbance(self, start, duration, outflow): self.disturbances.append((start, start + duration, outflow))
+
+    def disturbance_at(self, t): return sum(q for start, end, q in self.disturbances if start <= t < end)
+
+    def step(self, dt, fill_opening, drain_opening):
+        fill = min(max(fill_opening, 0.0), self.max_opening); drain = min(max(drain_opening, 0.0), self.max_opening)
+        q_in = self.fill_gain * fill; q_out = (self.drain_gain * drain + self.leak_gain) * np.sqrt(max(self.level, 0.0)) + self.disturbance_at(self.time)
+        self.level = min(max(self.level + (q_in - q_out) * dt / self.area, 0.0), self.height); self.time += dt
+        return self.level
+
+    def measured_level(self): return self.level + (self.rng.normal(0.0, self.noise) if self.noise > 0 else 0.0)
+
+class SimulatedS7Client:
+    # snap7 Client yerine geçen bellek içi DB'ler; PLCManager'ın kullandığı db_read/db_write imzalarıyla
+    def __init__(self, dbs): self.dbs = dbs; self.lock = threading.Lock(); self._connected = False
+    def connect(self, ip, rack, slot, *args): self._connected = True
+    def get_connected(self): return self._connected
+    def disconnect(self): self._connected = False
+    def db_read(self, db, start, size):
+        with self.lock: return bytearray(self.dbs[db][start:start + size])
+    def db_write(self, db, start, data):
+        with self.lock: self.dbs[db][start:start + len(data)] = data
+
+class PlantBridge:
+    # Tank modelini bir DB tamponuna bağlar: her adımda vana açıklıklarını okur, modeli ilerletir ve seviyeyi yazar
+    def __init__(self, plant, buffer, set_level_addr=0, fill_addr=4, level_addr=8, drain_addr=12, lock=None, keep_trace=True):
+        self.plant = plant; self.buffer = buffer; self.lock = lock or threading.Lock(); self.keep_trace = keep_trace; self.trace = []; self.last = None
+        self.set_level_addr = set_level_addr; self.fill_addr = fill_addr; self.level_addr = level_addr; self.drain_addr = drain_addr
+        self._thread = None; self._stop = threading.Event()
+        with self.lock: snap7_util.set_real(self.buffer, self.level_addr, self.plant.measured_level())
+
+    def set_level(self):
+        with self.lock: return snap7_util.get_real(self.buffer, self.set_level_addr)
+
+    def write_set_level(self, value):
+        with self.lock: snap7_util.set_real(self.buffer, self.set_level_addr, value)
+
+    def step(self, dt):
+        with self.lock:
+            fill = snap7_util.get_real(self.buffer, self.fill_addr); drain = snap7_util.get_real(self.buffer, self.drain_addr); set_level = snap7_util.get_real(self.buffer, self.set_level_addr)
+        self.plant.step(dt, fill, drain); level = self.plant.measured_level()
+        with self.lock: snap7_util.set_real(self.buffer, self.level_addr, level)
+        self.last = (self.plant.time, level, set_level, fill, drain)
+        if self.keep_trace: self.trace.append(self.last)
+        return level
+
+    def start(self, period=0.05):
+        # Gerçek zamanlı mod: model duvar saatine göre `period` aralıklarla ilerletilir
+        if self._thread is not None: return
+        self._stop.clear(); self._thread = threading.Thread(target=self._run, args=(period,), name="TankPlant", daemon=True); self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None: self._thread.join(); self._thread = None
+
+    def _run(self, period):
+        next_deadline = time.monotonic()
+        while not self._stop.is_set():
+            self.step(period); next_deadline += period
+            delay = next_deadline - time.monotonic()
+            if delay > 0: self._stop.wait(delay)
+            else: next_deadline = time.monotonic()
+
+def bridge_for_settings(plant, buffer, fuzzy_settings, params, lock=None, keep_trace=True, bridge_cls=PlantBridge):
+    # Adresler motorun kullandığıyla aynı kaynaktan alınır: set/seviye engine params'tan, vanalar valves[].offset'ten
+    valves = fuzzy_settings.get('valves', [])
+    fill_addr = int(valves[0].get('offset', 4)) if len(valves) > 0 else 4; drain_addr = int(valves[1].get('offset', 12)) if len(valves) > 1 else 12
+    return bridge_cls(plant, buffer, int(params.get('set_level_addr', 0)), fill_addr, int(params.get('levelmeter_addr', 8)), drain_addr, lock=lock, keep_trace=keep_trace)
+
+class SimulatedPLCManager(PLCManager):
+    # PLCManager'ın donanımsız karşılığı: okuma/yazma kodu aynıdır, yalnızca istemci bellek içi DB üzerinde çalışır
+    def __init__(self, plant=None, fuzzy_settings=None, params=None, db=1, size=64, set_level=3.3, bridge_cls=PlantBridge):
+        super().__init__()
+        self.buffer = bytearray(size); self.client = SimulatedS7Client({db: self.buffer}); self.plant = plant or TankPlant()
+        self.bridge = bridge_for_settings(self.plant, self.buffer, fuzzy_settings or {}, params or {}, lock=self.client.lock, bridge_cls=bridge_cls)
+        self.bridge.write_set_level(set_level)
+
+def response_metrics(trace, setpoint, tolerance=0.02, start=0.0, end=None):
+    # trace: [(t, seviye, ...), ...]. Aşım, basamak yönünde set değerinin ötesine çıkan en büyük sapmanın basamağa oranıdır (%).
+    # Oturma süresi: seviyenin bir daha |e| > tolerans olmadığı ilk an (start'a göre); IAE = ∫|e|dt.
+    rows = [(t, level) for t, level, *_ in trace if t >= start and (end is None or t < end)]
+    if len(rows) < 2: return {'overshoot_pct': None, 'settling_time': None, 'iae': None, 'max_abs_error': None, 'final_error': None}
+    t = np.array([r[0] for r in rows]); level = np.array([r[1] for r in rows]); error = setpoint - level
+    step = setpoint - level[0]; direction = np.sign(step) if step != 0 else 1.0
+    overshoot = max(0.0, float(np.max(-(error) * direction))) / abs(step) * 100.0 if abs(step) > tolerance else 0.0
+    outside = np.nonzero(np.abs(error) > tolerance)[0]
+    if outside.size == 0: settling = 0.0
+    elif outside[-1] == len(t) - 1: settling = None
+    else: settling = float(t[outside[-1] + 1] - t[0])
+    iae = float(np.sum(np.abs(error[:-1]) * np.diff(t)))
+    return {'overshoot_pct': overshoot, 'settling_time': settling, 'iae': iae, 'max_abs_error': float(np.max(np.abs(error))), 'final_error': float(error[-1])}
+
+def serve(plant, port=102, db=1, size=64, set_level=3.3, period=0.05, fuzzy_settings=None, params=None):
+    # Modeli gerçek bir snap7 sunucusu arkasında yayınlar; GUI veya headless motor 127.0.0.1'e bağlanabilir
+    from snap7.server import Server
+    try: from snap7.type import SrvArea; db_area = SrvArea.DB
+    except ImportError: from snap7.types import srvAreaDB as db_area
+    buffer = bytearray(size); bridge = bridge_for_settings(plant, buffer, fuzzy_settings or {}, params or {}, keep_trace=False); bridge.write_set_level(set_level)
+    server = Server(log=False); server.register_area(db_area, db, buffer); server.start(tcp_port=port)
+    bridge.start(period)
+    return server, bridge
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simüle tank + snap7 sunucusu (donanımsız test)")
+    parser.add_argument('--port', type=int, default=102, help="TCP portu (102 yönetici yetkisi gerektirebilir)")
+    parser.add_argument('--db', type=int, default=1); parser.add_argument('--level', type=float, default=3.0); parser.add_argument('--set-level', type=float, default=3.3)
+    parser.add_argument('--noise', type=float, default=0.0, help="Seviye ölçüm gürültüsü (std)")
+    parser.add_argument('--disturbance', type=float, nargs=3, action='append', metavar=('START', 'DURATION', 'OUTFLOW'), default=[], help="Ek çıkış debisi (saniye, saniye, m³/s)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    plant = TankPlant(level=args.level, noise=args.noise)
+    for start, duration, outflow in args.disturbance: plant.add_disturbance(start, duration, outflow)
+    server, bridge = serve(plant, port=args.port, db=args.db, set_level=args.set_level)
+    logging.info(f"Simüle PLC dinleniyor: 127.0.0.1:{args.port}, DB{args.db} (set 0, dolum 4, seviye 8, boşaltma 12)")
+    try:
+        while True:
+            time.sleep(5.0); t, level, set_level, fill, drain = bridge.last
+            logging.info(f"t={t:.0f}s seviye={level:.3f} set={set_level:.2f} dolum={fill:.2f} boşaltma={drain:.2f}")
+    except KeyboardInterrupt: pass
+    finally: bridge.stop(); server.stop()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import sys
+import csv
+import json
+import time
+import logging
+import argparse
+import numpy as np
+from fuzzy_engine import ControlEngine, CompiledSurfaceCache, load_config_file, get_default_fuzzy_settings, snap7_util
+from plant_simulator import TankPlant, PlantBridge, SimulatedPLCManager, response_metrics
+
+# Gerçek zamandan hızlı tekrar oynatma: ControlEngine simüle bir saatle kurulur ve okuma/kontrol görevleri CycleScheduler'daki
+# periyot ve sırayla, ama beklemeden çağrılır. Böylece saatlerce süren bozucu etken/adaptasyon senaryoları saniyeler içinde koşar.
+# Örnek kaynağı ya TankPlant (kapalı çevrim) ya da kayıtlı bir SP/PV izidir (açık çevrim). Çıktı, döngü başına karar kaydıdır.
+
+class SimulatedClock:
+    # ControlEngine(clock=...) için elle ilerletilen saat; değer saniye cinsinden model zamanıdır
+    def __init__(self, start=0.0): self.now = float(start)
+    def __call__(self): return self.now
+
+class TracePlant:
+    # Kayıtlı SP/PV izini TankPlant arayüzüyle sunar: seviye ve set değeri izden sıfırıncı dereceden tutma ile okunur.
+    # Açık çevrimdir; motorun vana çıkışları seviyeyi etkilemez, yalnızca karar kaydına düşer.
+    def __init__(self, t, set_levels, levels):
+        self.t = np.asarray(t, dtype=float); self.set_levels = np.asarray(set_levels, dtype=float); self.levels = np.asarray(levels, dtype=float); self.time = 0.0
+
+    @property
+    def duration(self): return float(self.t[-1])
+
+    def _index(self): return max(int(np.searchsorted(self.t, self.time + 1e-9, side='right')) - 1, 0)
+
+    def step(self, dt, fill_opening, drain_opening):
+        self.time += dt
+        return self.measured_level()
+
+    def measured_level(self): return float(self.levels[self._index()])
+
+    def set_level(self): return float(self.set_levels[self._index()])
+
+class TraceBridge(PlantBridge):
+    # PlantBridge ile aynı DB yerleşimi; ek olarak set değerini de izden PLC tamponuna yazar
+    def step(self, dt):
+        with self.lock: fill = snap7_util.get_real(self.buffer, self.fill_addr); drain = snap7_util.get_real(self.buffer, self.drain_addr)
+        self.plant.step(dt, fill, drain); level = self.plant.measured_level(); set_level = self.plant.set_level()
+        with self.lock: snap7_util.set_real(self.buffer, self.level_addr, level); snap7_util.set_real(self.buffer, self.set_level_addr, set_level)
+        self.last = (self.plant.time, level, set_level, fill, drain)
+        if self.keep_trace: self.trace.append(self.last)
+        return level
+
+def load_trace(path):
+    # CSV (başlık: t, set_level, actual_level) veya JSONL (aynı anahtarlar; replay.py karar kayıtları da olur) okur.
+    # Zaman ekseni ilk örnek 0 olacak şekilde kaydırılır.
+    if path.lower().endswith('.csv'):
+        with open(path, newline='') as f: rows = [r for r in csv.DictReader(f)]
+    else:
+        with open(path) as f: rows = [json.loads(line) for line in f if line.strip()]
+    if not rows: raise ValueError(f"{path}: iz boş")
+    level_key = 'actual_level' if 'actual_level' in rows[0] else 'level'
+    t = np.array([float(r['t']) for r in rows]); order = np.argsort(t, kind='stable')
+    return TracePlant(t[order] - t[order][0], np.array([float(r['set_level']) for r in rows])[order], np.array([float(r[level_key]) for r in rows])[order])
+
+def build_engine(fuzzy_settings, plant, bridge_cls=PlantBridge, params=None, set_level=3.3, cache=None):
+    clock = SimulatedClock()
+    engine = ControlEngine(cache=cache, clock=clock); engine.apply_config(fuzzy_settings); engine.params.update(params or {})
+    engine.plc_manager = SimulatedPLCManager(plant, engine.fuzzy_settings, engine.params, db=int(engine.params['db']), set_level=set_level, bridge_cls=bridge_cls)
+    engine.plc_manager.connect("127.0.0.1", 0, 1); engine.on_log = lambda m: None; engine.log_level = logging.INFO
+    return engine, clock
+
+def run_replay(engine, clock, duration, plant_dt=0.05, events=None):
+    # Görevler gerçek zamanlayıcıdaki gibi sıralanır: okuma t=0'da, kontrol bir periyot gecikmeyle başlar; aynı anda düşenlerde önce okuma.
+    # Model, bir sonraki görev anına kadar en fazla plant_dt'lik adımlarla ilerletilir. events: [(t, çağrılabilir(engine)), ...] (ör. set değeri değişimi).
+    # Uyarlamalı hızda (adaptive_rate) ayrı okuma yoktur; kontrol son tarihleri motorun seçtiği periyotla ilerler (CycleScheduler.set_period gibi)
+    bridge = engine.plc_manager.bridge; read_period = engine.params['read_period']; control_period = engine.params['control_period']
+    pending = sorted(events or [], key=lambda e: e[0]); n_read = 0; n_control = 1; start = clock.now
+    if engine.decision_trace is None: engine.decision_trace = []
+    engine.prepare_control(); period = control_period; t_control = control_period
+    while True:
+        t_read = n_read * read_period if not engine.reads_inline else float('inf'); t_next = min(t_read, t_control)
+        if t_next > duration: break
+        while bridge.plant.time < t_next - 1e-9: bridge.step(min(plant_dt, t_next - bridge.plant.time))
+        clock.now = start + t_next
+        while pending and pending[0][0] <= t_next: pending.pop(0)[1](engine)
+        if t_read <= t_control: engine.read_process(read_period); n_read += 1
+        else:
+            engine.run_control_cycle(period); n_control += 1
+            if engine.reads_inline: period = engine.control_period_now; t_control += period
+            else: t_control = n_control * control_period
+    return engine.decision_trace
+
+def summarize(decision_trace, control_period):
+    # Mod geçişleri ve her modda geçen model süresi
+    transitions = [{'t': round(r['t'], 3), 'from': r['mode_before'], 'to': r['mode']} for r in decision_trace if r['mode'] != r['mode_before']]
+    time_in_mode = {}
+    for r in decision_trace: time_in_mode[r['mode']] = time_in_mode.get(r['mode'], 0.0) + r.get('dt', control_period)
+    return {'cycles': len(decision_trace), 'transitions': transitions, 'time_in_mode_s': time_in_mode, 'final_gains': decision_trace[-1]['gains'] if decision_trace else {}}
+
+def write_decision_trace(decision_trace, path):
+    # .csv: düz tablo (vana çıkışları/kazançlar ayrı sütunlar, olaylar ' | ' ile birleşik); diğer uzantılar: satır başına bir JSON kaydı
+    if path.lower().endswith('.csv'):
+        valves = list(decision_trace[0]['outputs']) if decision_trace else []
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['t', 'set_level', 'actual_level', 'error', 'delta_error', 'mode_before', 'mode', 'status'] + [f"out:{v}" for v in valves] + [f"gain:{v}" for v in valves] + ['events'])
+            for r in decision_trace:
+                writer.writerow([f"{r['t']:.3f}", r['set_level'], r['actual_level'], r['error'], r['delta_error'], r['mode_before'], r['mode'], r['status']]
+                                + [r['outputs'].get(v) for v in valves] + [r['gains'].get(v) for v in valves] + [' | '.join(r['events'])])
+    else:
+        with open(path, 'w') as f:
+            for r in decision_trace: f.write(json.dumps(r, ensure_ascii=False) + "\n")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Adaptasyon durum makinesini simüle saatle, gerçek zamandan hızlı tekrar oynat")
+    parser.add_argument('--trace', help="Kayıtlı SP/PV izi (CSV: t,set_level,actual_level veya JSONL). Verilmezse simüle tank kullanılır (kapalı çevrim).")
+    parser.add_argument('--config', help="Bulanık ayarlar ve motor parametreleri için config.json (varsayılan: fabrika ayarları)")
+    parser.add_argument('--engine', choices=['mamdani', 'sugeno'], help="config'deki çıkarım motorunu ezer"); parser.add_argument('--compiled', action='store_true')
+    parser.add_argument('--no-learning', action='store_true', help="Otomatik ayarı (öğrenme) kapat")
+    parser.add_argument('--adaptive-rate', action='store_true', help="Uyarlamalı döngü hızı (engine_params.adaptive_rate); PLC okuma/yazma sayıları özette")
+    parser.add_argument('--duration', type=float, help="Model zamanı, saniye (varsayılan: iz uzunluğu veya 3600)")
+    parser.add_argument('--plant-dt', type=float, default=0.05, help="Model integrasyon adımı, saniye")
+    parser.add_argument('--level', type=float, default=3.0, help="Başlangıç seviyesi (simüle tank)"); parser.add_argument('--set-level', type=float, default=3.3)
+    parser.add_argument('--noise', type=float, default=0.0, help="Seviye ölçüm gürültüsü (std)"); parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--disturbance', type=float, nargs=3, action='append', metavar=('START', 'DURATION', 'OUTFLOW'), default=[], help="Ek çıkış debisi (saniye, saniye, m³/s)")
+    parser.add_argument('--set-step', type=float, nargs=2, action='append', metavar=('T', 'VALUE'), default=[], help="T anında operatör gibi yeni set değeri yaz (write_set_level)")
+    parser.add_argument('--tolerance', type=float, default=0.02, help="Oturma bandı (yanıt ölçütleri için)")
+    parser.add_argument('--out', help="Karar kaydı dosyası (.csv veya .jsonl)")
+    parser.add_argument('--json', help="Özeti JSON dosyasına yaz")
+    parser.add_argument('--verbose', action='store_true', help="Motor log satırlarını model zamanıyla yazdır")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    fuzzy_settings = load_config_file(args.config) if args.config else get_default_fuzzy_settings()
+    if args.engine: fuzzy_settings['engine'] = args.engine
+    if args.compiled: fuzzy_settings['compiled'] = True
+    params = {'learning_enabled': False} if args.no_learning else {}
+    if args.adaptive_rate: params['adaptive_rate'] = True
+    if args.trace:
+        plant = load_trace(args.trace); bridge_cls = TraceBridge; set_level = plant.set_level(); duration = args.duration if args.duration is not None else plant.duration
+    else:
+        plant = TankPlant(level=args.level, noise=args.noise, seed=args.seed); bridge_cls = PlantBridge; set_level = args.set_level; duration = args.duration if args.duration is not None else 3600.0
+        for start, length, outflow in args.disturbance: plant.add_disturbance(start, length, outflow)
+    engine, clock = build_engine(fuzzy_settings, plant, bridge_cls, params, set_level, cache=CompiledSurfaceCache())
+    if args.verbose: engine.on_log = lambda m: print(f"[t={clock():9.2f}] {m}"); engine.log_level = logging.DEBUG
+    events = [(t, lambda e, v=value: e.write_set_level(v)) for t, value in args.set_step]
+
+    start = time.perf_counter()
+    decision_trace = run_replay(engine, clock, duration, args.plant_dt, events)
+    elapsed = time.perf_counter() - start
+    summary = {'source': args.trace or 'TankPlant', 'engine': engine.fuzzy_settings.get('engine', 'mamdani'), 'model_time_s': duration, 'wall_time_s': round(elapsed, 3),
+               'speedup': round(duration / elapsed, 1) if elapsed > 0 else None}
+    summary.update(summarize(decision_trace, engine.params['control_period']))
+    stages = engine.timings.summary()['stages']; summary['plc_reads'] = stages.get('plc_read', {}).get('count', 0); summary['plc_writes'] = engine.output_writer.requests
+    summary['valve_writes'] = engine.output_writer.stats()
+    if not args.trace and not args.set_step: summary['response'] = response_metrics(engine.plc_manager.bridge.trace, set_level, args.tolerance)
+    print(json.dumps(summary, indent=4, ensure_ascii=False))
+    if args.out: write_decision_trace(decision_trace, args.out)
+    if args.json:
+        with open(args.json, 'w') as f: json.dump(summary, f, indent=4, ensure_ascii=False)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import sys
+import os
+import copy
+import json
+import time
+import signal
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from fuzzy_engine import ControlEngine, ControllerPool, CompiledSurfaceCache, CycleScheduler, CycleTimings, PLCManager, load_config_file
+
+# Çok döngülü süpervizör: tek süreçte N bağımsız kontrol döngüsü. Her döngü kendi ayarları, FuzzyPIDController'ı, adaptasyon durumu ve
+# etiket haritasıyla (engine_params: db / set_level_addr / levelmeter_addr, ayarlar: valves[].offset) ayrı bir ControlEngine'dir. Döngüler
+#  - tek bir CycleScheduler iş parçacığını (görev adları "döngü/read", "döngü/control"),
+#  - aynı denetleyiciyi üreten ayarlarda tek bir FuzzyPIDController'ı (ControllerPool, yazarken kopyala),
+#  - aynı uç noktadaki (ip, rack, slot) döngüler tek bir PLCManager bağlantısını paylaşır.
+# Tüm görevler aynı iş parçacığında sırayla koştuğu için paylaşılan snap7 istemcisi ve denetleyiciler eşzamanlı çağrılmaz.
+
+class LoopSupervisor:
+    def __init__(self, cache=None, clock=time.time, plc_factory=PLCManager):
+        self.cache = cache; self.clock = clock; self.plc_factory = plc_factory
+        self.timings = CycleTimings(); self.scheduler = CycleScheduler(on_error=self._on_task_error, on_overrun=self._on_task_overrun, timings=self.timings)
+        self.controllers = ControllerPool(cache); self.endpoints = {}; self.loops = OrderedDict()
+        self.on_log = logging.info; self.on_fault = lambda name, task, message: None
+
+    def endpoint(self, ip, rack=0, slot=1):
+        key = (ip, int(rack), int(slot))
+        if key not in self.endpoints: self.endpoints[key] = self.plc_factory()
+        return self.endpoints[key]
+
+    def add_loop(self, name, fuzzy_settings, params=None, endpoint=None, plc_manager=None, log_level=logging.INFO):
+        # endpoint: (ip, rack, slot) -> paylaşılan PLCManager; plc_manager verilirse doğrudan kullanılır (ör. simülasyon).
+        # params, ayarlardaki engine_params'ı ezer (döngüye özel adresler ve set değeri buradan verilir).
+        if not name or '/' in name or name in self.loops: raise ValueError(f"Geçersiz veya tekrarlanan döngü adı: {name!r}")
+        plc_manager = plc_manager or self.endpoint(*(endpoint or ("192.168.0.1", 0, 1)))
+        engine = ControlEngine(plc_manager=plc_manager, params=params, cache=self.cache, clock=self.clock, scheduler=self.scheduler, name=name, controller_pool=self.controllers)
+        engine.apply_config(copy.deepcopy(fuzzy_settings)); engine.params.update(params or {}); engine.log_level = log_level
+        engine.on_log = lambda m, name=name: self.on_log(f"[{name}] {m}")
+        engine.on_fault = lambda task, message, name=name: self.on_fault(name, task, message)
+        self.loops[name] = engine
+        return engine
+
+    def remove_loop(self, name):
+        engine = self.loops.pop(name); engine.stop(); engine.wait_for_controller(5.0)
+        with engine.lock: engine._discard_pending_controller()
+        if engine.fuzzy_controller is not None: self.controllers.release(engine.fuzzy_controller); engine.fuzzy_controller = None
+
+    def connect(self):
+        # Her uç noktaya bir kez bağlanılır; başarısız olanlar [((ip, rack, slot), mesaj), ...] olarak döner
+        failures = []
+        for (ip, rack, slot), plc in self.endpoints.items():
+            if plc.is_connected: continue
+            suc, msg = plc.connect(ip, rack, slot)
+            if not suc: failures.append(((ip, rack, slot), msg))
+        return failures
+
+    def disconnect(self):
+        for plc in self.endpoints.values(): plc.disconnect()
+
+    def start(self, control=True):
+        # Döngüler periyot içinde eşit aralıklarla kaydırılır; hepsi aynı anda uyanıp tek çekirdeği aynı anda zorlamaz
+        self.scheduler.start(); n = max(len(self.loops), 1)
+        for i, engine in enumerate(self.loops.values()):
+            engine.start(phase=engine.params['read_period'] * i / n)
+            if control: engine.start_control(phase=engine.params['control_period'] * i / n)
+
+    def stop(self):
+        for engine in self.loops.values(): engine.stop()
+        self.scheduler.stop()
+
+    def _owner(self, task): return self.loops.get(task.rsplit('/', 1)[0])
+
+    def _on_task_error(self, task, e):
+        engine = self._owner(task)
+        if engine is not None: engine._on_task_error(task, e)
+        else: logging.error(f"Sahipsiz görev hatası ({task}): {e}")
+
+    def _on_task_overrun(self, task, lateness, missed):
+        engine = self._owner(task)
+        if engine is not None: engine._on_task_overrun(task, lateness, missed)
+
+    def status(self):
+        rows = OrderedDict()
+        for name, engine in self.loops.items():
+            with engine.lock:
+                rows[name] = {'mode': engine.adaptation_mode, 'set_level': engine.current_set_level, 'actual_level': engine.current_actual_level, 'error': engine.current_error,
+                              'controller': getattr(engine.fuzzy_controller, 'pool_key', '')[:12], 'control': engine.is_control_active}
+        return rows
+
+    def format_status(self):
+        lines = [f"{'Döngü':<16}{'Mod':<26}{'Set':>8}{'Seviye':>9}{'Hata':>9}  Denetleyici"]
+        for name, row in self.status().items():
+            lines.append(f"{name:<16}{row['mode']:<26}{row['set_level']:>8.3f}{row['actual_level']:>9.3f}{row['error']:>9.3f}  {row['controller']}")
+        stats = self.controllers.stats(); lines.append(f"{len(self.loops)} döngü, {stats['controllers']} paylaşılan denetleyici, {len(self.endpoints)} PLC bağlantısı")
+        return "\n".join(lines)
+
+def load_supervisor_config(path):
+    # {"plc": {...}, "engine_params": {...}, "loops": [{"name", "config" | "settings", "plc", "engine_params", "set_level"}, ...]}
+    # Döngüdeki "config" yolu süpervizör dosyasına göredir; "settings" o dosyanın üzerine yazılır.
+    # plc ve engine_params önceliği: üst düzey varsayılan < döngünün config dosyası < döngü girdisi.
+    with open(path) as f: data = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path)); specs = []
+    for i, loop in enumerate(data.get('loops', [])):
+        config_path = os.path.join(base_dir, loop['config']) if loop.get('config') else None
+        settings = load_config_file(config_path) if config_path else {}
+        settings.update(copy.deepcopy(loop.get('settings', {})))
+        if 'points' not in settings: raise ValueError(f"{path}: '{loop.get('name', i)}' döngüsünde bulanık ayar yok (config veya settings)")
+        plc = dict(data.get('plc', {})); plc.update(settings.get('plc', {})); plc.update(loop.get('plc', {}))
+        params = dict(data.get('engine_params', {})); params.update(settings.get('engine_params', {})); params.update(loop.get('engine_params', {}))
+        specs.append({'name': loop.get('name', f"loop{i + 1}"), 'settings': settings, 'params': params, 'config_path': config_path, 'set_level': loop.get('set_level'),
+                      'endpoint': (plc.get('ip', "192.168.0.1"), int(plc.get('rack', 0)), int(plc.get('slot', 1)))})
+    return specs
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tek süreçte çok sayıda bağımsız bulanık kontrol döngüsü (GUI'siz)")
+    parser.add_argument('config', help="Süpervizör dosyası (JSON): döngü listesi, her biri kendi config.json'u ve adresleriyle")
+    parser.add_argument('--duration', type=float, default=0.0, help="Saniye cinsinden çalışma süresi (0 = süresiz)")
+    parser.add_argument('--no-learning', action='store_true', help="Tüm döngülerde otomatik ayarı (öğrenme) kapat")
+    parser.add_argument('--no-save', action='store_true', help="Çıkışta öğrenilen ayarları döngülerin config dosyalarına yazma")
+    parser.add_argument('--status-interval', type=float, default=30.0, help="Durum tablosu log aralığı, saniye (0 = kapalı)")
+    parser.add_argument('--log-level', default="INFO", help="DEBUG döngü başına özet satırlarını da yazar")
+    args = parser.parse_args(argv)
+    log_level = getattr(logging, args.log_level.upper(), logging.INFO)
+    logging.basicConfig(level=log_level, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    specs = load_supervisor_config(args.config)
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(args.config)), "controller_cache")
+    supervisor = LoopSupervisor(cache=CompiledSurfaceCache(directory=cache_dir))
+    for spec in specs:
+        engine = supervisor.add_loop(spec['name'], spec['settings'], spec['params'], endpoint=spec['endpoint'], log_level=log_level)
+        if args.no_learning: engine.params['learning_enabled'] = False
+
+    stop_event = threading.Event(); faults = []
+    supervisor.on_fault = lambda name, task, message: (faults.append((name, task, message)), logging.error(f"[{name}] döngüsü durdu: {message}"))
+    for sig in (signal.SIGINT, signal.SIGTERM): signal.signal(sig, lambda signum, frame: stop_event.set())
+
+    failures = supervisor.connect()
+    for endpoint, msg in failures: logging.error(f"Bağlantı başarısız {endpoint}: {msg}")
+    if failures: supervisor.disconnect(); return 1
+    # Paylaşılan bir şablon dosyası birden çok döngünün öğrenilmiş durumunu tutamaz; yalnızca tek döngüye ait dosyalar geri yazılır
+    owners = {}
+    for spec in specs: owners.setdefault(spec['config_path'], []).append(spec['name'])
+    try:
+        for spec in specs:
+            if spec['set_level'] is not None: supervisor.loops[spec['name']].write_set_level(spec['set_level'])
+        supervisor.start()
+        logging.info(f"{len(specs)} döngü başlatıldı. Paylaşılan denetleyiciler: {supervisor.controllers.stats()['controllers']}, PLC bağlantıları: {len(supervisor.endpoints)}")
+        deadline = time.monotonic() + args.duration if args.duration > 0 else None; next_status = time.monotonic() + args.status_interval
+        while not stop_event.wait(0.5):
+            now = time.monotonic()
+            if deadline is not None and now >= deadline: break
+            if args.status_interval > 0 and now >= next_status: logging.info("\n" + supervisor.format_status()); next_status = now + args.status_interval
+    finally:
+        supervisor.stop(); supervisor.disconnect()
+        if not args.no_save:
+            for spec in specs:
+                if spec['config_path'] is None: continue
+                if len(owners[spec['config_path']]) > 1: logging.info(f"[{spec['name']}] {spec['config_path']} başka döngülerle paylaşılıyor, kaydedilmedi."); continue
+                try: supervisor.loops[spec['name']].save_config(spec['config_path']); logging.info(f"[{spec['name']}] ayarlar {spec['config_path']} dosyasına kaydedildi.")
+                except Exception as e: logging.error(f"[{spec['name']}] ayarları kaydetme hatası: {e}")
+    return 1 if faults else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
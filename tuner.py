@@ -0,0 +1,177 @@
+import sys
+import os
+import copy
+import json
+import time
+import logging
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from fuzzy_engine import CompiledSurfaceCache, DEFAULT_OPT_RATIOS, DEFAULT_OPT_RULES, OPT_AGGR_RANGE, OPT_PREC_RANGE, atomic_write_json, load_config_file, get_default_fuzzy_settings, optimized_default_settings, validate_fuzzy_settings
+from plant_simulator import TankPlant, response_metrics
+import replay
+
+# Çevrimdışı otomatik ayar: "fabrika" ayarını belirleyen genler (opt_aggr, opt_prec, opt_ratios, opt_rules) aranır. Motor her kontrol
+# başlangıcında ve bozulmada noktaları/kuralları bu genlerden yeniden hesapladığı için kalıcı etkisi olan ayar yalnızca budur.
+# Her aday, tam ControlEngine ile (adaptasyon dahil) simüle saatte senaryolar üzerinde koşturulur (replay.run_replay); adaylar bir
+# süreç havuzuna dağıtılır. Sıralama IAE, aşım ve oturma süresinin ağırlıklı toplamıyladır; IAE başlangıç ayarına göre normalize edilir.
+# Arama basit bir evrim stratejisidir: en iyi `elite` aday korunur, geri kalanı onların log-normal/Gauss mutasyonlarıdır.
+
+RATIO_BOUNDS = {'z_width': (0.005, 0.2), 'l_peak': (0.1, 0.7), 'l_end': (0.3, 1.0), 'h_start': (0.3, 0.98)}
+_worker_cache = None
+
+def base_genes(settings):
+    ratios = dict(DEFAULT_OPT_RATIOS); ratios.update(settings.get('opt_ratios') or {})
+    rules = copy.deepcopy(DEFAULT_OPT_RULES); rules.update(copy.deepcopy(settings.get('opt_rules') or {}))
+    return {'opt_aggr': float(settings.get('opt_aggr', 4.0)), 'opt_prec': float(settings.get('opt_prec', 2.0)), 'opt_ratios': ratios, 'opt_rules': rules}
+
+def mutate(genes, rng, sigma):
+    # Ölçek genleri log-normal, kural değerleri Gauss ile oynatılır. Sıfır kural çıkışları (ters yöndeki vana) yapısaldır, dokunulmaz.
+    g = copy.deepcopy(genes)
+    # Ölçek genleri grafik penceresindeki kutuların çözünürlüğüne (3 ondalık) yuvarlanır; pencerede Uygula ayarlanmış değeri değiştirmez
+    g['opt_aggr'] = round(float(np.clip(g['opt_aggr'] * np.exp(rng.normal(0, sigma)), *OPT_AGGR_RANGE)), 3); g['opt_prec'] = round(float(np.clip(g['opt_prec'] * np.exp(rng.normal(0, sigma)), *OPT_PREC_RANGE)), 3)
+    for key, (lo, hi) in RATIO_BOUNDS.items(): g['opt_ratios'][key] = float(np.clip(g['opt_ratios'][key] * np.exp(rng.normal(0, sigma)), lo, hi))
+    r = g['opt_ratios']; r['l_end'] = max(r['l_end'], r['l_peak'] + 0.05)
+    for vals in g['opt_rules'].values():
+        for role in ('fill', 'drain'):
+            if vals[role] > 0: vals[role] = round(float(np.clip(vals[role] + rng.normal(0, sigma / 2), 0.01, 1.0)), 4)
+    return g
+
+def candidate_settings(base, genes, params):
+    # Genlerden yüklenebilir ayar: noktalar/kurallar motorun kendi hesabıyla üretilir, best_fuzzy_points de aynı noktalardır.
+    # Oranlar tek tek sınırlıdır ama birbirine göre değil (ör. geniş Z ve agresif L'de PL sırasız çıkar); motor kontrol başlangıcında
+    # noktaları yine bu genlerden hesapladığı için noktaları onarmak yetmez, böyle genler ValueError ile reddedilir.
+    s = copy.deepcopy(base); s.update(copy.deepcopy(genes))
+    points, outputs = optimized_default_settings(s, params.get('opt_min', 0.0), params.get('opt_max', 5.0), params.get('opt_set', 3.3))
+    s['points'] = points; s['outputs'] = outputs; s['best_fuzzy_points'] = copy.deepcopy(points); s.pop('gain_multipliers', None)
+    return validate_fuzzy_settings(s)
+
+def scenario_metrics(trace, scenario, tolerance):
+    # İz, set değerinin değiştiği anlarda parçalara bölünür; her parça kendi set değerine göre ölçülür.
+    # IAE toplanır, aşım ve oturma süresinin en kötüsü alınır. Oturmayan parça, oturma süresi olarak parça uzunluğunu alır.
+    t = np.array([row[0] for row in trace]); sp = np.array([row[2] for row in trace]); bounds = [0] + [i for i in range(1, len(sp)) if abs(sp[i] - sp[i - 1]) > 1e-6] + [len(sp)]
+    iae = 0.0; overshoot = 0.0; settling = 0.0; settled = True; final_error = 0.0
+    for a, b in zip(bounds[:-1], bounds[1:]):
+        if b - a < 2: continue
+        end = t[b] if b < len(t) else None; m = response_metrics(trace, float(sp[a]), tolerance, float(t[a]), end)
+        iae += m['iae']; overshoot = max(overshoot, m['overshoot_pct'] or 0.0); final_error = m['final_error']
+        if m['settling_time'] is None: settled = False; settling = max(settling, float(t[b - 1] - t[a]))
+        else: settling = max(settling, m['settling_time'])
+    return {'iae': iae, 'overshoot_pct': overshoot, 'settling_time': settling, 'settled': settled, 'final_error': final_error}
+
+def evaluate(task):
+    # Süreç havuzunda çalışır; her işçi kendi derlenmiş yüzey önbelleğini tutar. Kurulamayan veya simülasyonda hata veren aday
+    # None döner (skoru sonsuz); tek bir bozuk mutant pool.map üzerinden tüm ayar koşusunu durdurmaz.
+    global _worker_cache
+    if _worker_cache is None: _worker_cache = CompiledSurfaceCache()
+    base, genes, params, scenarios, tolerance = task
+    try: return run_scenarios(candidate_settings(base, genes, params), params, scenarios, tolerance)
+    except Exception as e:
+        logging.warning(f"Aday reddedildi (opt_aggr={genes['opt_aggr']:.3f}, opt_prec={genes['opt_prec']:.3f}): {e}")
+        return None
+
+def run_scenarios(settings, params, scenarios, tolerance):
+    results = []
+    for sc in scenarios:
+        plant = TankPlant(level=sc['level'], noise=sc.get('noise', 0.0), seed=sc.get('seed', 0))
+        for start, length, flow in sc.get('disturbances', []): plant.add_disturbance(start, length, flow)
+        engine, clock = replay.build_engine(copy.deepcopy(settings), plant, params=params, set_level=sc['set_level'], cache=_worker_cache)
+        events = [(t, lambda e, v=value: e.write_set_level(v)) for t, value in sc.get('set_steps', [])]
+        replay.run_replay(engine, clock, sc['duration'], sc.get('plant_dt', 0.05), events); engine.decision_trace = None
+        results.append(scenario_metrics(engine.plc_manager.bridge.trace, sc, tolerance))
+    return results
+
+def score(metrics, baseline, scenarios, weights):
+    if metrics is None: return float('inf')
+    w_iae, w_os, w_ts = weights; total = 0.0
+    for m, b, sc in zip(metrics, baseline, scenarios):
+        total += w_iae * m['iae'] / max(b['iae'], 1e-9) + w_os * m['overshoot_pct'] / 100.0 + w_ts * m['settling_time'] / sc['duration']
+    return total / len(scenarios)
+
+def build_scenarios(args, params):
+    set_level = args.set_level if args.set_level is not None else params.get('opt_set', 3.3)
+    if args.trace:
+        # Kayıtlı izin set değeri programı model üzerinde tekrarlanır (iz açık çevrimdir; aday çıkışlarının etkisi ancak modelde görülür)
+        trace = replay.load_trace(args.trace); changes = np.nonzero(np.abs(np.diff(trace.set_levels)) > 1e-6)[0] + 1
+        return [{'name': 'trace', 'level': float(trace.levels[0]), 'set_level': float(trace.set_levels[0]), 'duration': args.duration or trace.duration,
+                 'set_steps': [(float(trace.t[i]), float(trace.set_levels[i])) for i in changes], 'noise': args.noise, 'seed': args.seed}]
+    duration = args.duration or 600.0
+    scenarios = [{'name': 'step_up', 'level': set_level - args.step, 'set_level': set_level, 'duration': duration, 'noise': args.noise, 'seed': args.seed},
+                 {'name': 'step_down', 'level': set_level + args.step, 'set_level': set_level, 'duration': duration, 'noise': args.noise, 'seed': args.seed}]
+    disturbances = args.disturbance or [[duration * 0.1, duration * 0.6, 0.01]]
+    scenarios.append({'name': 'disturbance', 'level': set_level, 'set_level': set_level, 'duration': duration, 'disturbances': [tuple(d) for d in disturbances], 'noise': args.noise, 'seed': args.seed})
+    return scenarios
+
+def tune(base, params, scenarios, args, on_progress=None):
+    rng = np.random.default_rng(args.seed); sigma = args.sigma; weights = tuple(args.weights); tolerance = args.tolerance
+    genes0 = base_genes(base); population = [genes0] + [mutate(genes0, rng, sigma) for _ in range(max(args.population - 1, 0))]
+    evaluated = []; baseline = None; pool = ProcessPoolExecutor(max_workers=args.workers) if args.workers > 1 else None
+    try:
+        for generation in range(args.generations):
+            start = time.perf_counter(); new = [g for g in population if not any(g is e['genes'] for e in evaluated)]
+            tasks = [(base, g, params, scenarios, tolerance) for g in new]
+            results = list(pool.map(evaluate, tasks)) if pool else [evaluate(task) for task in tasks]
+            if baseline is None:
+                if results[0] is None: raise ValueError("Başlangıç ayarı simüle edilemedi; config'deki opt_aggr/opt_prec/opt_ratios noktaları sırasız üretiyor")
+                baseline = results[0]
+            for g, metrics in zip(new, results): evaluated.append({'genes': g, 'metrics': metrics, 'generation': generation})
+            for e in evaluated: e['score'] = score(e['metrics'], baseline, scenarios, weights)
+            evaluated.sort(key=lambda e: e['score']); elite = evaluated[:max(args.elite, 1)]
+            if on_progress: on_progress(generation, len(new), time.perf_counter() - start, evaluated[0], baseline)
+            sigma *= args.sigma_decay
+            population = [e['genes'] for e in elite] + [mutate(elite[int(rng.integers(len(elite)))]['genes'], rng, sigma) for _ in range(max(args.population - len(elite), 0))]
+    finally:
+        if pool: pool.shutdown()
+    return evaluated, baseline
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Üyelik fonksiyonu / kural tablosu otomatik ayarı: adaylar süreç havuzunda simüle tank üzerinde yarıştırılır")
+    parser.add_argument('--config', help="Başlangıç config.json (varsayılan: fabrika ayarları)"); parser.add_argument('--out', default="tuned_config.json", help="Kazanan ayarın yazılacağı config")
+    parser.add_argument('--engine', choices=['mamdani', 'sugeno'], help="config'deki çıkarım motorunu ezer"); parser.add_argument('--compiled', action='store_true')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Süreç sayısı (1 = havuzsuz)")
+    parser.add_argument('--generations', type=int, default=6); parser.add_argument('--population', type=int, default=24); parser.add_argument('--elite', type=int, default=4)
+    parser.add_argument('--sigma', type=float, default=0.25, help="Başlangıç mutasyon genliği"); parser.add_argument('--sigma-decay', type=float, default=0.8); parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--weights', type=float, nargs=3, default=[1.0, 1.0, 1.0], metavar=('IAE', 'OVERSHOOT', 'SETTLING'), help="Skor ağırlıkları")
+    parser.add_argument('--trace', help="Set değeri programı kayıtlı izden alınır (CSV/JSONL, replay.py biçimi)")
+    parser.add_argument('--duration', type=float, help="Senaryo süresi, model zamanı saniye (varsayılan 600 veya iz uzunluğu)")
+    parser.add_argument('--set-level', type=float, help="Senaryo set değeri (varsayılan: engine_params.opt_set)"); parser.add_argument('--step', type=float, default=0.3, help="Basamak senaryolarının büyüklüğü")
+    parser.add_argument('--disturbance', type=float, nargs=3, action='append', metavar=('START', 'DURATION', 'OUTFLOW'), help="Bozucu etken senaryosu (varsayılan: %%10'da, %%60 süre, 0.01)")
+    parser.add_argument('--noise', type=float, default=0.0); parser.add_argument('--tolerance', type=float, default=0.02, help="Oturma bandı")
+    parser.add_argument('--no-learning', action='store_true', help="Adaylar adaptasyon kapalı ölçülür")
+    parser.add_argument('--json', help="Sıralamayı JSON dosyasına yaz"); parser.add_argument('--top', type=int, default=5)
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    base = load_config_file(args.config) if args.config else get_default_fuzzy_settings()
+    if args.engine: base['engine'] = args.engine
+    if args.compiled: base['compiled'] = True
+    params = dict(base.get('engine_params', {}))
+    if args.set_level is not None: params['opt_set'] = args.set_level
+    if args.no_learning: params['learning_enabled'] = False
+    scenarios = build_scenarios(args, params)
+    logging.info(f"{len(scenarios)} senaryo ({', '.join(sc['name'] for sc in scenarios)}), {args.generations} nesil x {args.population} aday, {args.workers} işçi, motor: {base.get('engine', 'mamdani')}")
+
+    def progress(generation, count, elapsed, best, baseline):
+        worst_settling = max(m['settling_time'] for m in best['metrics'])
+        logging.info(f"Nesil {generation + 1}: {count} aday {elapsed:.1f}sn. En iyi skor {best['score']:.4f} (başlangıç {score(baseline, baseline, scenarios, args.weights):.4f}); "
+                     f"IAE {sum(m['iae'] for m in best['metrics']):.3f}, aşım %{max(m['overshoot_pct'] for m in best['metrics']):.1f}, oturma {worst_settling:.0f}sn")
+    start = time.perf_counter()
+    evaluated, baseline = tune(base, params, scenarios, args, progress)
+    elapsed = time.perf_counter() - start
+    winner = evaluated[0]; tuned = candidate_settings(base, winner['genes'], params)
+    tuned['engine_params'] = dict(base.get('engine_params', {}))
+    if args.set_level is not None: tuned['engine_params']['opt_set'] = args.set_level
+    tuned['tuning'] = {'score': winner['score'], 'baseline_score': score(baseline, baseline, scenarios, args.weights), 'weights': args.weights, 'scenarios': scenarios,
+                       'metrics': winner['metrics'], 'baseline_metrics': baseline, 'evaluated': len(evaluated), 'wall_time_s': round(elapsed, 1), 'seed': args.seed}
+    atomic_write_json(args.out, tuned)
+    ranking = [{'rank': i + 1, 'score': round(e['score'], 4), 'generation': e['generation'], 'iae': round(sum(m['iae'] for m in e['metrics']), 4),
+                'overshoot_pct': round(max(m['overshoot_pct'] for m in e['metrics']), 2), 'settling_time': round(max(m['settling_time'] for m in e['metrics']), 1),
+                'opt_aggr': round(e['genes']['opt_aggr'], 3), 'opt_prec': round(e['genes']['opt_prec'], 3)} for i, e in enumerate([e for e in evaluated if e['metrics'] is not None][:args.top])]
+    summary = {'evaluated': len(evaluated), 'rejected': sum(e['metrics'] is None for e in evaluated), 'wall_time_s': round(elapsed, 1), 'workers': args.workers, 'baseline_score': round(tuned['tuning']['baseline_score'], 4), 'ranking': ranking, 'out': args.out}
+    print(json.dumps(summary, indent=4, ensure_ascii=False))
+    if args.json:
+        with open(args.json, 'w') as f: json.dump(summary, f, indent=4, ensure_ascii=False)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())